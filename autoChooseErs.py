@@ -0,0 +1,166 @@
+# This script performs the same root finding as chooseErs.py, but it does so in a closed loop rather than requiring the user to run chooseErs.py repeatedly.
+# It watches the electric field subdirectories of every flux surface in <sfincsDir>, re-analyzes a flux surface only when one of its runs finishes, and
+# immediately submits runs for any new root guesses. It stops once every flux surface has a resolved set of roots, when no flux surface can make any more
+# progress without help from the user, or when <maxTime> is reached. The root information is written to the same files (in the same format) as chooseErs.py
+# writes, so chooseErs.py (with <filter>) and plot.py can be used afterwards as usual. This script does not make plots - if a flux surface gets stuck, run
+# chooseErs.py with <noRun> to look at the plots for that surface. Note that a flux surface is only re-analyzed once all of its existing output files are
+# marked as finished, so a crashed run must be fixed or deleted before its flux surface can make progress. Runs that fail before writing any output
+# will simply be waited on until <maxTime> is reached.
+
+# Load necessary modules
+from os.path import dirname, abspath, join, basename, isdir
+from inspect import getfile, currentframe
+from time import monotonic
+import asyncio
+import sys
+import numpy as np
+
+thisDir = dirname(abspath(getfile(currentframe())))
+sys.path.append(join(thisDir, 'src/'))
+from dataProc import relDiff, unitFactor
+from IO import getAutoChooseErsArgs, getFileInfo, makeDir, messagePrinter, saveTimeStampFile
+from jobControl import findRadialDirs, snapshotRuns, submitJob
+from resultCache import registerCampaign
+from rootFinding import analyzeRadius, determineLabels, loadRadius, rootFileNames
+from sfincsOutputLib import materializeRun
+
+# Get arguments
+args = getAutoChooseErsArgs()
+
+# Locally useful functions
+def setUpRuns(guesses, dataContainer, electricFieldVar, pendingErs, diffTol=0.01):
+    ErVals = getattr(dataContainer, electricFieldVar) # In SFINCS internal units
+    conversionFactor = unitFactor(electricFieldVar)
+    newDirs = []
+    newErs = []
+    for root in guesses: # In physical units
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if len(pendingErs) != 0 and np.any(relDiff(root, np.array(pendingErs)) <= diffTol): # This guess is effectively already waiting to run
+                continue
+        adjustedUnitsRoot = root / conversionFactor
+        newDir = dataContainer.mainDir + '/' + electricFieldVar + '{}'.format(adjustedUnitsRoot)
+        if isdir(newDir): # Never overwrite existing runs
+            continue
+        closestInd = np.argmin(np.abs(adjustedUnitsRoot - ErVals))
+        _ = materializeRun(dataContainer.planRun(electricFieldVar, adjustedUnitsRoot, closestInd, radLabel=radLabel))
+        newDirs.append(newDir)
+        newErs.append(root)
+
+    return newDirs, newErs
+
+def saveRootFiles(outDir, surfaces, radLabel, electricFieldLabel):
+    for name in rootFileNames():
+        np.savetxt(join(outDir, name + '.txt'), [surface['roots'][name] for surface in surfaces], header=electricFieldLabel)
+    np.savetxt(join(outDir, 'radii.txt'), [surface['radVal'] for surface in surfaces], header=radLabel)
+
+async def drive(inDir, outDir):
+    radLabel, electricFieldLabel = determineLabels(inDir)
+    radDirs, radVals = findRadialDirs(inDir, outDir)
+    surfaces = []
+    for radDir, radVal in zip(radDirs, radVals):
+        surfaces.append({'radDir':radDir, 'radVal':radVal, 'snapshot':None, 'status':'waiting', 'numLaunched':0, 'pending':{}, 'roots':{name:np.nan for name in rootFileNames()}})
+
+    startTime = monotonic()
+    while True:
+
+        # Find the flux surfaces with newly finished runs
+        snapshots = await asyncio.gather(*[asyncio.to_thread(snapshotRuns, surface['radDir'], surface['snapshot']) for surface in surfaces])
+        submissions = []
+        for surface, snapshot in zip(surfaces, snapshots):
+
+            if snapshot == surface['snapshot'] or surface['status'] == 'resolved':
+                continue
+            surface['snapshot'] = snapshot
+            surface['pending'] = {runDir:Er for runDir, Er in surface['pending'].items() if not snapshot.get(basename(runDir), (None, False))[1]}
+
+            outputs = [run for run in snapshot.values() if run[0] is not None]
+            pending = [run for run in snapshot.values() if not run[1]]
+            if len(outputs) == 0 or any([not run[1] for run in outputs]): # Runs are still in progress
+                surface['status'] = 'waiting'
+                continue
+
+            # Re-evaluate the flux surface with the existing root finding logic
+            dataContainer = await asyncio.to_thread(loadRadius, surface['radDir'])
+            if dataContainer is None:
+                messagePrinter('The data in {} could not be loaded. This flux surface will be checked again once more runs finish.'.format(surface['radDir']))
+                surface['status'] = 'waiting' if len(pending) != 0 else 'stuck'
+                continue
+            result = analyzeRadius(dataContainer, radLabel, electricFieldLabel, args.maxRootJr[0], args.zeroErTol[0], allowZeroJr=args.allowZeroJr)
+            surface['radVal'] = result['radVal']
+            surface['roots'] = result['roots']
+            for msg in result['messages']:
+                messagePrinter(msg)
+
+            if result['status'] in ('solo', 'triple'):
+                surface['status'] = 'resolved'
+                messagePrinter('The roots for {} = {} have been resolved.'.format(radLabel, result['radVal']))
+
+            elif result['status'] == 'launch' and surface['numLaunched'] < args.maxNewRuns[0]:
+                guesses = result['guesses'][:args.maxNewRuns[0] - surface['numLaunched']]
+                newDirs, newErs = setUpRuns(guesses, dataContainer, electricFieldLabel, list(surface['pending'].values()))
+                surface['numLaunched'] += len(newDirs)
+                surface['pending'].update(zip(newDirs, newErs))
+                if len(newDirs) != 0:
+                    messagePrinter('For {} = {}, runs were set up for {} = {}.'.format(radLabel, result['radVal'], electricFieldLabel, np.array(newErs)))
+                    if not args.noRun:
+                        submissions += [submitJob(newDir, launchCommand=args.launchCommand[0], cacheFile=args.resultCache[0]) for newDir in newDirs]
+                    surface['status'] = 'waiting'
+                else:
+                    surface['status'] = 'waiting' if len(pending) != 0 else 'stuck'
+
+            else:
+                if result['status'] == 'skip':
+                    messagePrinter(result['skipMessage'])
+                elif result['status'] == 'moreData':
+                    messagePrinter(result['moreDataMessage'])
+                else:
+                    messagePrinter('For {} = {}, the maximum number of new runs ({}) has been reached.'.format(radLabel, result['radVal'], args.maxNewRuns[0]))
+                surface['status'] = 'waiting' if len(pending) != 0 else 'stuck'
+
+        # Submit all the new runs at once
+        if len(submissions) != 0:
+            await asyncio.gather(*submissions)
+
+        saveRootFiles(outDir, surfaces, radLabel, electricFieldLabel)
+
+        # Decide whether or not to keep going
+        statuses = [surface['status'] for surface in surfaces]
+        if all([status == 'resolved' for status in statuses]):
+            messagePrinter('Every flux surface in {} has a resolved set of roots.'.format(inDir))
+            break
+
+        if 'waiting' not in statuses:
+            stuckVals = np.array([surface['radVal'] for surface in surfaces if surface['status'] == 'stuck'])
+            msg = 'No more progress can be made automatically for {} = {}. '.format(radLabel, stuckVals)
+            msg += 'Please run chooseErs.py with <noRun> and check the plots generated for these flux surfaces.'
+            messagePrinter(msg)
+            break
+
+        if (monotonic() - startTime) / 3600 > args.maxTime[0]:
+            messagePrinter('The maximum run time of {} hours was reached before every flux surface had a resolved set of roots.'.format(args.maxTime[0]))
+            break
+
+        await asyncio.sleep(args.pollInterval[0])
+
+# Sort out directories
+_, _, _, inDir, _ = getFileInfo('/arbitrary/path', args.sfincsDir[0], 'arbitrary')
+
+if args.saveLoc[0] is None:
+    outDir = join(inDir, 'determineEr')
+else:
+    _, _, _, outDir, _ = getFileInfo('/arbitrary/path', args.saveLoc[0], 'arbitrary')
+
+_ = makeDir(outDir)
+
+# Add the finished runs to the result cache
+registerCampaign(args.resultCache[0], inDir)
+
+# Do work
+asyncio.run(drive(inDir, outDir))
+
+# Write a log file
+logStr = 'This directory was last auto-analyzed (in a closed loop) to determine the correct values of the ambipolar radial electric field on:\n'
+saveTimeStampFile(outDir, 'automatedErDeterminationLog', logStr)
+
+# Closing message
+messagePrinter('Please check the outputs in {} to see the status of the calculations.'.format(outDir))
@@ -16,97 +16,43 @@
 # run time for SFINCS when includePhi1 is turned on. Again, you should NOT use ambipolarSolve with this script - doing so will create complications that can be unpleasant to deal with.
 # It is easier and more reliable to simply run this script repeatedly. As a final note, the internal units used in SFINCS and sfincsScan will almost certainly be different than those
 # this script uses when making plots.
+# The results for each flux surface are cached in <saveLoc>, so running this script again only reloads, reanalyzes, and replots the flux surfaces whose electric field runs have
+# changed since the last time it was run. Use <noCache> to redo everything.
+# To save computing time, the electric field scan can be run at reduced resolution first (see <coarseFactor> in run.py). Once the roots of a flux surface are bracketed,
+# <refine> sets up full-resolution runs near them in a separate directory, on which this script can then be run as usual.
 
 # Load necessary modules
-from os.path import dirname, abspath, join, basename
+from os.path import dirname, abspath, join, basename, isfile, isdir
 from inspect import getfile, currentframe
 import sys
-import matplotlib.pyplot as plt
 import numpy as np
-from scipy.interpolate import PchipInterpolator
-from collections import Counter
 from shutil import copy
-from warnings import warn
 
 thisDir = dirname(abspath(getfile(currentframe())))
 sys.path.append(join(thisDir, 'src/'))
-from dataProc import combineAndSort, constructBSpline, relDiff, fixOutputUnits
-from IO import getChooseErsArgs, getFileInfo, makeDir, findFiles, messagePrinter, prettyDataLabel, saveTimeStampFile
-from sfincsOutputLib import sfincsRadialAndErScan
+from dataProc import relDiff, fixOutputUnits, predictAlongRadius, unitFactor
+from IO import getChooseErsArgs, getFileInfo, loadCache, makeDir, messagePrinter, readFineResolution, saveCache, saveTimeStampFile
+from jobControl import findRadialDirs, outputStamps, pendingValues, snapshotRuns
+from rootFinding import analyzeRadii, determineLabels, loadRadius, prepareRadius, rootFileNames
+from resultCache import registerCampaign
+from rootPlots import plotJob, plotRadii
+from surrogate import fitSurrogate, proposeRootSamples, surfaceUncertainty
+from sfincsOutputLib import materializeRuns, sfincsRadialAndErScan, submitRuns
 
 # Get arguments
 args = getChooseErsArgs()
-        
-# Locally useful functions
-def findRoots(dataMat, xScan):
-    f = PchipInterpolator(dataMat[:,0], dataMat[:,1], extrapolate=False)
-    estRoots = f.roots(extrapolate=False)
-    yEst = f(xScan)
-    return f, estRoots, yEst
-
-def getErJrData(dataMat, negative=True, numInterpPoints=1000):
-
-    if negative:
-        ErsData = dataMat[np.where(dataMat[:,0] <= 0)]
-    else:
-        ErsData = dataMat[np.where(dataMat[:,0] >= 0)]
-        
-    ErScan = np.linspace(np.min(ErsData[:,0]), np.max(ErsData[:,0]), num=numInterpPoints)
-
-    f, estRoots, JrEst = findRoots(ErsData, ErScan)
-
-    return f, estRoots, ErScan, JrEst
-
-def getAllRootInfo(dataMat, knownRoots, ErQuantityHasSameSignAsEr):
-    negKnownRoots = np.array(knownRoots)[np.where(knownRoots < 0)]
-    posKnownRoots = np.array(knownRoots)[np.where(knownRoots > 0)]
 
-    # Negative roots first
-    negF, negEstRoots, negErScan, negJrEst = getErJrData(dataMat, negative=True)
-    negStableRoots = determineRootStability(negF, negKnownRoots, ErQuantityHasSameSignAsEr)
-
-    # Now positive roots
-    posF, posEstRoots, posErScan, posJrEst = getErJrData(dataMat, negative=False)
-    posStableRoots = determineRootStability(posF, posKnownRoots, ErQuantityHasSameSignAsEr)
-    
-    # Now combine everything
-    fs = [negF, posF]
-    estRoots = np.append(negEstRoots, posEstRoots)
-    stableRoots = np.append(negStableRoots, posStableRoots)
-    ErScan = [negErScan, posErScan]
-    JrScan = [negJrEst, posJrEst]
-
-    return fs, estRoots, stableRoots, ErScan, JrScan # Note that estRoots will contain any actual roots since there is no smoothing of the polynomials
-
-def findUniqueRoots(actualRoots, estRoots):
-    uniqueInds = np.isin(estRoots, actualRoots, invert=True)
-    uniqueGuesses = estRoots[uniqueInds]
-
-    return uniqueGuesses
-
-def determineRootStability(f, knownRoots, ErQuantityHasSameSignAsEr):
-    if len(knownRoots) != 0:
-        fDer = f.derivative()
-        ders = fDer(knownRoots)
-        if ErQuantityHasSameSignAsEr:
-            stableInds = np.where(ders > 0) # dJr/dEr > 0 -> stable root
-        else:
-            stableInds = np.where(ders < 0) # Using Er definition/representation with opposite sign -> root stability condition flips
-        stableRoots = knownRoots[stableInds]
-    else:
-        stableRoots = np.array([])
-    
-    return stableRoots
-
-def launchNewRuns(uniqueRootGuesses, sfincsScanInstance, electricFieldVar):
+# Locally useful functions
+def launchNewRuns(uniqueRootGuesses, sfincsScanInstance, electricFieldVar): # The runs are only planned here - they are all created and submitted at the end
     ErVals = getattr(sfincsScanInstance, electricFieldVar) # In SFINCS internal units
-    conversionFactor = fixOutputUnits(electricFieldVar, 1)
+    conversionFactor = unitFactor(electricFieldVar)
     for root in uniqueRootGuesses: # In physical units
         adjustedUnitsRoot = root / conversionFactor
         closestInd = np.argmin(np.abs(adjustedUnitsRoot - ErVals))
-        sfincsScanInstance.launchRun(electricFieldVar, adjustedUnitsRoot, 'nearest', closestInd, sendRunToScheduler=(not args.noRun), launchCommand='sbatch')
+        plannedRuns.append(sfincsScanInstance.planRun(electricFieldVar, adjustedUnitsRoot, closestInd, radLabel=radLabel))
 
-def printMoreRunsMessage(customString):
+def printMoreRunsMessage(customString, radInd):
+    needMoreDataInds.append(radInd) # These surfaces can be seeded by <continuation>
     standardLittleDataErrorMsg = ' This likely means not enough data was available.'
     standardLittleDataErrorMsg += ' Please check the plot generated for this flux surface,'
     standardLittleDataErrorMsg += ' generate data for more electric field values, and run this script again.'
@@ -114,99 +60,70 @@ def printMoreRunsMessage(customString):
     customString += standardLittleDataErrorMsg
     messagePrinter(customString)
 
-def recordNoEr(listOfLists):
-    for singleList in listOfLists:
-        singleList.append(np.nan)
-
-def determineLabels(sfincsDir):
-    # This will only work if the radial directories are named 'var_val', rather than just given an integer number.
-    # Directories created with stelloptPlusSfincs will always follow this naming convention.
-    # Note that if no electric field scan is present, this function will return nonsense. This behavior is caught another way later, though.
-    dataFiles = findFiles('sfincsOutput.h5', sfincsDir, raiseError=True) # Note that sfincsScan breaks if you use a different output file name, so the default is hard-coded in
-    subdirsFirst = [address.replace(sfincsDir, '') for address in dataFiles]
-    radSubdirTitles = [address.split('/')[1] for address in subdirsFirst]
-    elecSubdirTitles = [address.split('/')[2] for address in subdirsFirst]
-    radSubdirLabels = [title.split('_')[0] for title in radSubdirTitles]
-    elecSubdirLabels = [''.join(i for i in label if not i.isdigit()).replace('-','').replace('.','') for label in elecSubdirTitles]
-    countRadLabels = Counter(radSubdirLabels)
-    countElecLabels = Counter(elecSubdirLabels)
-    mostCommonRadLabel = max(countRadLabels, key=countRadLabels.get)
-    mostCommonElecLabel = max(countElecLabels, key=countElecLabels.get)
-
-    return mostCommonRadLabel, mostCommonElecLabel
-
-def filterActualRoots(rootErs, rootJrs, diffTol = 0.01):
-    
-    # This is not efficient, but for our (small) data sets it should be fine
-    rootErsToKeep = np.array([])
-    rootJrsToKeep = np.array([])
-    for ind1, rootEr1 in enumerate(rootErs):
-        with np.errstate(invalid='ignore'): # NumPy will throw a warning before evaluating frac, which makes output confusing
-            diffs = relDiff(rootEr1, rootErs) # Compare one root with all the others
-        tooSimilarInds = np.where(diffs < diffTol)
-        if tooSimilarInds[0].size == 0: # No similar roots -> no comparison needed
-            ErsToCompare = rootErs
-            JrsToCompare = rootJrs
-            bestJrInd = ind1
+def windowErs(centers, numErs, relWidth):
+    newErs = np.array([])
+    for center in centers:
+        halfWidth = max(relWidth * np.abs(center), args.zeroErTol[0])
+        if numErs == 1:
+            candidates = np.array([center])
         else:
-            ErsToCompare = rootErs[tooSimilarInds]
-            JrsToCompare = rootJrs[tooSimilarInds]
-            bestJrInd = np.argmin(np.abs(JrsToCompare))
-        rootErsToKeep = np.append(rootErsToKeep, ErsToCompare[bestJrInd])
-        rootJrsToKeep = np.append(rootJrsToKeep, JrsToCompare[bestJrInd])
-
-    sortMat = np.unique(combineAndSort(rootErsToKeep, rootJrsToKeep), axis=0)
-
-    ErsOut = sortMat[:,0]
-    JrsOut = sortMat[:,1]
-
-    return ErsOut, JrsOut
-
-def determineErQuantitySign(ErQuantity, Er):
-    if len(ErQuantity) != len(Er): # I/O problem
-        return np.nan
-    zeroInd = np.where(ErQuantity == 0)
-    if not np.all(Er[zeroInd] == 0): # Physics problem
-        return np.nan
-    newErQuantity = np.delete(ErQuantity, zeroInd)
-    newEr = np.delete(Er, zeroInd)
-    if len(newErQuantity) != len(newEr): # Physics problem
-        return np.nan
-    trueCount = np.count_nonzero(newErQuantity * newEr > 0) # All entries True if same sign, all entries False otherwise
-    if (trueCount != len(newErQuantity)) and (trueCount != 0): # Physics problem
-        return np.nan
-    if trueCount != 0:
-        return True # ErQuantity and Er have the same sign
-    else:
-        return False # ErQuantity and Er have different signs
+            candidates = np.linspace(center - halfWidth, center + halfWidth, num=numErs)
+        newErs = np.append(newErs, candidates)
 
-def evaluateIntegral(negF, posF, lowerBound, upperBound):
+    return newErs
 
-    if (lowerBound <= 0) and (upperBound <= 0):
-        return negF.integrate(lowerBound, upperBound, extrapolate=False)
+def continuationErs(predictedRoots, existingErs, diffTol=0.01):
+    newErs = windowErs(predictedRoots, args.contNumErs[0], args.contRelWidth[0])
 
-    elif (lowerBound >= 0) and (upperBound >= 0):
-        return posF.integrate(lowerBound, upperBound, extrapolate=False)
+    return np.unique(removeExisting(newErs, existingErs, diffTol=diffTol))
 
-    elif (lowerBound <= 0) and (upperBound >= 0):
-        return negF.integrate(lowerBound, 0, extrapolate=True) + posF.integrate(0, upperBound, extrapolate=True)
-        # Jr is forced to be evaluated very near Er = 0, so extrapolation should be fine here.
+def planFineRuns(newErs, sfincsScanInstance, electricFieldVar, fineRadDir): # Like launchNewRuns, but at full resolution in fineRadDir
+    ErVals = getattr(sfincsScanInstance, electricFieldVar) # In SFINCS internal units
+    conversionFactor = unitFactor(electricFieldVar)
+    for Er in newErs: # In physical units
+        adjustedUnitsEr = Er / conversionFactor
+        closestInd = np.argmin(np.abs(adjustedUnitsEr - ErVals))
+        plan = sfincsScanInstance.planRun(electricFieldVar, adjustedUnitsEr, closestInd, radLabel=radLabel)
+        plan['runDir'] = join(fineRadDir, basename(plan['runDir']))
+        plan['patch'] = {'resolutionParameters':readFineResolution(join(plan['templateDir'], 'input.namelist'))}
+        fineRuns.append(plan)
 
-    elif (lowerBound >= 0) and (upperBound <= 0):
-        return posF.integrate(lowerBound, 0, extrapolate=True) + negF.integrate(0, upperBound, extrapolate=True)
-        # Jr is forced to be evaluated very near Er = 0, so extrapolation should be fine here.
+def removeExisting(newErs, existingErs, diffTol=0.01):
+    newErs = np.array(newErs)
+    existingErs = np.array(existingErs)
+    if newErs.size == 0 or existingErs.size == 0:
+        return newErs
 
-    else:
-        return np.nan
+    # Do not repeat runs that (effectively) already exist
+    with np.errstate(invalid='ignore', divide='ignore'):
+        keep = [np.all(relDiff(Er, existingErs) > diffTol) for Er in newErs]
+
+    return newErs[keep]
+
+def resultToCache(result):
+    keys = ['radVal', 'status', 'messages', 'skipMessage', 'moreDataMessage', 'guesses', 'roots', 'ErJrVals']
+
+    return {key:result[key] for key in keys}
+
+def resultFromCache(cachedResult):
+    result = dict(cachedResult)
+    result['guesses'] = np.array(result['guesses'])
+    if result['ErJrVals'] is not None:
+        result['ErJrVals'] = np.array(result['ErJrVals'])
+
+    return result
+
+def getDataContainer(radInd): # Cached flux surfaces are only loaded if they are needed
+    radDir = surfaces[radInd]['radDir']
+    if radDir not in dataContainers:
+        dataContainers[radDir] = loadRadius(radDir)
+
+    return dataContainers[radDir]
 
-def findPlotMinMax(inData, margin):
-    dataMin = np.min(inData)
-    dataMax = np.max(inData)
-    dataRange = dataMax - dataMin
-    useMin = dataMin - margin * dataRange
-    useMax = dataMax + margin * dataRange
+def existingValues(radInd): # In physical units, including runs that have been set up but have not finished
+    pending = fixOutputUnits(electricFieldLabel, pendingValues(surfaces[radInd]['snapshot'], electricFieldLabel))
 
-    return useMin, useMax
+    return np.concatenate((ErJrData[radInd][:,0], pending, launchedErs.get(radInd, [])))
 
 # Sort out directories
 _, _, _, inDir, _ = getFileInfo('/arbitrary/path', args.sfincsDir[0], 'arbitrary')
@@ -221,92 +138,81 @@ else:
 
 _ = makeDir(outDir)
 
+# Add the finished runs to the result cache
+registerCampaign(args.resultCache[0], inDir)
+
 # Check how the input directory is organized
 radLabel, electricFieldLabel = determineLabels(inDir)
 
-# Load tools from external library
-ds = sfincsRadialAndErScan(inDir, verbose=0, ErDefForJr=electricFieldLabel)
-
-# Initial check
-if len(ds.Erscans) == 0:
-    msg = 'It appears that there are no electric field subdirectories in this SFINCS directory. '
-    msg += 'Therefore, this script cannot be used.'
-    raise IOError(msg)
-
 # Do work
 if not args.filter:
-    
-    # Determine where the satisfactory roots are for each radial subdirectory
-    rootsToUse = [] 
-    ionRoots = []
-    unstableRoots = []
-    electronRoots = []
-    integralVals = []
-    soloRoots = []
-    allRootsLists = [rootsToUse, ionRoots, unstableRoots, electronRoots, integralVals, soloRoots] # Also contains integral values... these are not 'roots', but closely related
-    for radInd in range(ds.Nradii):
-        
-        # Load and sort data from the given radial directory
-        dataContainer = ds.Erscans[radInd]
-        radVal = getattr(dataContainer, radLabel)[0]
-        if dataContainer.includePhi1:
-            distr = 'vd'
-        else:
-            distr = 'vm'
-        if electricFieldLabel == 'Er':
-            coord = 'rHat'
-        else:
-            coord = electricFieldLabel.split('d')[-1]
-        particleFluxVar = 'particleFlux_'+distr+'_'+coord
-        radialCurrentVar = 'radialCurrent_'+distr+'_'+coord
-        ErVals = fixOutputUnits(electricFieldLabel, getattr(dataContainer, electricFieldLabel)) # Note this doesn't literally have to be Er, it could be various derivatives of the electric potential
-        closeToZero = np.isclose(ErVals, 0, rtol=0, atol=args.zeroErTol[0])
-        if True not in closeToZero:
-            msg = 'No zero-electric-field case (or anything sufficiently close) was found in the {} = {} subdirectory, '.format(radLabel, radVal)
-            msg += 'so this subdirectory will be skipped.'
-            messagePrinter(msg)
-            recordNoEr(allRootsLists)
+
+    # Find the flux surfaces that have at least one output file
+    radDirs, _ = findRadialDirs(inDir, excludeDir=outDir)
+    snapshots = {radDir:snapshotRuns(radDir) for radDir in radDirs}
+    radDirs = [radDir for radDir in radDirs if len(outputStamps(snapshots[radDir])) != 0]
+
+    # Initial check
+    if len(radDirs) == 0:
+        msg = 'It appears that there are no electric field subdirectories in this SFINCS directory. '
+        msg += 'Therefore, this script cannot be used.'
+        raise IOError(msg)
+
+    # Flux surfaces whose output files have not changed since this script was last run are taken from the cache
+    cacheFile = join(outDir, 'chooseErsCache.json')
+    cacheSettings = {'radLabel':radLabel, 'electricFieldLabel':electricFieldLabel, 'maxRootJr':args.maxRootJr[0],
+                     'zeroErTol':args.zeroErTol[0], 'allowZeroJr':args.allowZeroJr, 'marg':args.marg[0]}
+    cache = {} if args.noCache else loadCache(cacheFile)
+    if cache.get('settings') != cacheSettings:
+        cache = {'settings':cacheSettings, 'surfaces':{}}
+
+    surfaces = []
+    dataContainers = {} # Keyed by flux surface directory
+    for radDir in radDirs:
+        stamps = outputStamps(snapshots[radDir])
+        entry = cache['surfaces'].get(basename(radDir))
+        plotsReady = entry is not None and (args.noPlots or (entry['plotted'] and all([isfile(join(outDir, fileName)) for fileName in entry['files']])))
+        if plotsReady and entry['stamps'] == stamps:
+            surfaces.append({'radDir':radDir, 'snapshot':snapshots[radDir], 'stamps':stamps, 'cached':True, 'plotted':entry['plotted'], 'files':entry['files'],
+                             'result':resultFromCache(entry['result'])})
             continue
-        if 0 in dataContainer.Zs:
-            msg = 'A zero-charge particle was found in the output of the {} = {} subdirectory, '.format(radLabel, radVal)
-            msg += 'so this subdirectory will be skipped.'
-            messagePrinter(msg)
-            recordNoEr(allRootsLists)
+        dataContainer = loadRadius(radDir)
+        if dataContainer is None: # As in sfincsRadialAndErScan, flux surfaces that cannot be loaded are left out
             continue
-        actualEr = fixOutputUnits('Er', getattr(dataContainer, 'Er')) # This is just for comparison purposes
-        ErQuantityHasSameSignAsEr = determineErQuantitySign(ErVals, actualEr)
-        if np.isnan(ErQuantityHasSameSignAsEr):
-            msg = 'For {} = {}, the radial electric field as represented by {} did not seem to be consistent '.format(radLabel, radVal, electricFieldLabel)
-            msg += 'with the standard definition. It may have been zero in odd places or not followed the proper sign convention. Please investigate. '
-            msg += 'In the meantime, this subdirectory will be skipped.'
+        dataContainers[radDir] = dataContainer
+        result = prepareRadius(dataContainer, radLabel, electricFieldLabel, args.zeroErTol[0], allowZeroJr=args.allowZeroJr)
+        surfaces.append({'radDir':radDir, 'snapshot':snapshots[radDir], 'stamps':stamps, 'cached':False, 'plotted':False, 'files':[], 'result':result})
+
+    # Analyze all the flux surfaces that changed at once
+    _ = analyzeRadii([surface['result'] for surface in surfaces if not surface['cached']], args.maxRootJr[0])
+    surfaces.sort(key=lambda surface: surface['result']['radVal'])
+
+    # Determine where the satisfactory roots are for each radial subdirectory
+    rootLists = {name:[] for name in rootFileNames()} # Also contains integral values... these are not 'roots', but closely related
+    radVals = []
+    needMoreDataInds = []
+    ErJrData = {} # Processed data, runs launched, and deferred root guesses for each radial index, used by <surrogate>
+    launchedErs = {}
+    rootGuesses = {}
+    plannedRuns = []
+
+    for radInd, surface in enumerate(surfaces):
+
+        result = surface['result']
+        radVal = result['radVal']
+        radVals.append(radVal)
+        for name in rootFileNames():
+            rootLists[name].append(result['roots'][name])
+
+        for msg in result['messages']:
             messagePrinter(msg)
-            recordNoEr(allRootsLists)
+
+        ErJrVals = result['ErJrVals']
+        if ErJrVals is None: # The data could not be processed
+            messagePrinter(result['skipMessage'])
             continue
-        JrVals = fixOutputUnits(radialCurrentVar, dataContainer.Jr)
-        exactlyZeroCurrentInds = np.where(np.array(JrVals) == 0)
-        exactlyZeroErVals = np.array(ErVals)[exactlyZeroCurrentInds]
-        if len(exactlyZeroErVals) != 0:
-            msg = 'For {} = {}, it appears that the following electric field subdirectories contained a run with zero radial current:\n'.format(radLabel, radVal)
-            msg += str(exactlyZeroErVals) + '\n'
-            msg += 'This indicates a SFINCS error. Please check and fix these run(s) to get reliable results.\n'
-            if not args.allowZeroJr:
-                msg += 'In the meantime, this subdirectory will be skipped because it will break the root finding algorithm.'
-                messagePrinter(msg)
-                recordNoEr(allRootsLists)
-                continue
-            else:
-                msg += 'Because <allowZeroJr> was used, calculations for this subdirectory will continue even though the results will likely be incorrect.'
-                messagePrinter(msg)
-        unsortedParticleFluxes = fixOutputUnits(particleFluxVar, getattr(dataContainer, particleFluxVar))
-        ErParticleFluxes = combineAndSort(ErVals, unsortedParticleFluxes)
-        
-        # Sort out roots
-        rootInds = np.where(np.abs(np.array(JrVals)) <= args.maxRootJr[0])
-        allRootErs = np.array(ErVals)[rootInds] # Could contain (effective) duplicates in rare cases
-        allRootJrs = np.array(JrVals)[rootInds]
-        rootErs, rootJrs = filterActualRoots(allRootErs, allRootJrs)
-        numActualRoots = len(rootErs)
-        ErJrVals = combineAndSort(ErVals, JrVals)
+        ErJrData[radInd] = ErJrVals
+
         if args.print:
             msg = 'For {} = {}, the radial electric field (or proxy) values are:\n'.format(radLabel, radVal)
             msg += str(ErJrVals[:,0])+'\n'
@@ -314,222 +220,183 @@ if not args.filter:
             msg += str(ErJrVals[:,1])
             messagePrinter(msg)
 
-        # Interpolate between the available data points to determine root stability and guess the position of as-yet-unfound roots
-        fs, allEstRoots, stableRoots, ErScan, JrScan = getAllRootInfo(ErJrVals, rootErs, ErQuantityHasSameSignAsEr)
-        numStableRoots = len(stableRoots)
-        estRoots, _ = filterActualRoots(np.append(rootErs, allEstRoots), np.append(rootJrs, [10 ** 9]*len(allEstRoots))) # Eliminate estimated roots if they are too close to real ones
-        uniqueRootGuesses = findUniqueRoots(rootErs, estRoots)
-        numUniqueRootGuesses = len(uniqueRootGuesses)
-
-        # Plot and save total current data for interpretation later
-        plt.figure()
-        plt.axhline(y=0, color='black', linestyle='-', zorder=0)
-        plt.scatter(ErJrVals[:,0], ErJrVals[:,1], zorder=5)
-        for ErPart, JrPart in zip(ErScan, JrScan):
-            plt.plot(ErPart, JrPart, color='tab:blue', zorder=10)
-        for root in estRoots:
-            if root in rootErs:
-                ls = '-'
-                if root in stableRoots:
-                    clr = 'green'
-                    lbl = 'Stable Root'
-                else:
-                    clr = 'red'
-                    lbl = 'Unstable Root'
+        # Launch new runs or report problems as needed
+        if result['status'] == 'launch':
+            guesses = result['guesses']
+            if surface['cached']: # Some of these runs may have been set up the last time this script was run
+                guesses = removeExisting(guesses, existingValues(radInd))
+            if guesses.size == 0:
+                msg = 'For {} = {}, runs for the root guesses {} = {} have already been set up, '.format(radLabel, radVal, electricFieldLabel, result['guesses'])
+                msg += 'but none of them have finished yet.'
+                messagePrinter(msg)
+            elif args.surrogate: # The surrogate decides whether or not these guesses are used
+                rootGuesses[radInd] = guesses
             else:
-                ls = ':'
-                clr = 'black'
-                lbl = 'Root Guess'
-            plt.axvline(x=root, color=clr, linestyle=ls, label=lbl, zorder=15)
-        useMin, useMax = findPlotMinMax(ErJrVals[:,1], args.marg[0])
-        plt.ylim(bottom=useMin, top=useMax)
-        plt.legend(loc='best')
-        plt.xlabel(prettyDataLabel(electricFieldLabel))
-        plt.ylabel(prettyDataLabel(radialCurrentVar))
-        nameBits = basename(inDir) + '-' + radLabel + '_' + str(radVal) + '-' + 'Jr-vs-' + electricFieldLabel
-        plotName = nameBits + '.pdf'
-        dataName = nameBits + '.dat'
-        plt.savefig(join(outDir, plotName), bbox_inches='tight', dpi=400)
-        np.savetxt(join(outDir, dataName), ErJrVals)
-        plt.close()
-
-        # Also plot individual species flux data
-        plt.figure()
-        plt.axhline(y=0, color='black', linestyle='-', zorder=0)
-        for i in range(1, ErParticleFluxes.shape[1]):
-            lbl = 'Spec. ' + str(i)
-            plt.plot(ErParticleFluxes[:,0], ErParticleFluxes[:,i], label=lbl, zorder=5)
-        useMin, useMax = findPlotMinMax(ErParticleFluxes[:,1:], args.marg[0])
-        plt.ylim(bottom=useMin, top=useMax)
-        plt.legend(loc='best')
-        plt.xlabel(prettyDataLabel(electricFieldLabel))
-        plt.ylabel(prettyDataLabel(particleFluxVar))
-        nameBits = basename(inDir) + '-' + radLabel + '_' + str(radVal) + '-' + 'particleFluxes-vs-' + electricFieldLabel
-        plotName = nameBits + '.pdf'
-        dataName = nameBits + '.dat'
-        plt.tight_layout()
-        plt.savefig(join(outDir, plotName), bbox_inches='tight', dpi=400)
-        np.savetxt(join(outDir, dataName), ErParticleFluxes)
-        plt.close()
-        
-        # Also plot grouped (ion and electron) flux data
-        plt.figure()
-        plt.axhline(y=0, color='black', linestyle='-', zorder=0)
-        eInds = np.where(dataContainer.Zs < 0)
-        iInds = np.where(dataContainer.Zs > 0)
-        if eInds[0].size > 1:
-            msg = 'Multiple negative-charge species were detected in the output of the {} = {} subdirectory. '.format(radLabel, radVal)
-            msg += 'This is unusual. They will all be labeled "electrons" in the grouped flux plots.'
-            warn(msg)
-        eFlux = np.sum(ErParticleFluxes[:,1:].T[eInds], axis=0)
-        iFlux = np.sum(ErParticleFluxes[:,1:].T[iInds], axis=0)
-        plt.plot(ErParticleFluxes[:,0], eFlux, label='Electrons', zorder=5)
-        plt.plot(ErParticleFluxes[:,0], iFlux, label='Ions', zorder=6)
-        eiFlux = np.column_stack((eFlux, iFlux))
-        useMin, useMax = findPlotMinMax(eiFlux, args.marg[0])
-        plt.ylim(bottom=useMin, top=useMax)
-        plt.legend(loc='best')
-        plt.xlabel(prettyDataLabel(electricFieldLabel))
-        plt.ylabel(prettyDataLabel(particleFluxVar))
-        nameBits = basename(inDir) + '-' + radLabel + '_' + str(radVal) + '-' + 'groupedParticleFluxes-vs-' + electricFieldLabel
-        plotName = nameBits + '.pdf'
-        dataName = nameBits + '.dat'
-        plt.tight_layout()
-        plt.savefig(join(outDir, plotName), bbox_inches='tight', dpi=400)
-        np.savetxt(join(outDir, dataName), np.column_stack((ErParticleFluxes[:,0], eiFlux)))
-        plt.close()
-
-        # Determine if new runs should be launched, or the data processed as-is
-        if numActualRoots == 0:
-            
-            if numUniqueRootGuesses == 0: # No root (real or estimated) can be identified - this is a problem
-                printMoreRunsMessage('No root could be identified for {} = {}.'.format(radLabel, radVal))
-                recordNoEr(allRootsLists)
-            
-            else: # A root guess has been identified - launch a run for it
-                launchNewRuns(uniqueRootGuesses, dataContainer, electricFieldLabel)
-                recordNoEr(allRootsLists)
-       
-        elif numActualRoots == 1:
-            
-            if numUniqueRootGuesses == 0: # The fit polynomials could not find any roots beyond the one already identified
-                
-                if numStableRoots == 0: # The only root that can be found or guessed is unstable - this is a problem
-                    printMoreRunsMessage('Only a single, unstable root could be identified for {} = {}.'.format(radLabel, radVal))
-                    recordNoEr(allRootsLists)
-
-                else: # The identified root is stable, and no other guesses are apparent - assume the identified root is the only one
-                    soloRoots.append(rootErs[0])
-                    rootsToUse.append(rootErs[0])
-                    ionRoots.append(np.nan)
-                    unstableRoots.append(np.nan)
-                    electronRoots.append(np.nan)
-                    integralVals.append(np.nan)
-
-            else: # If there are other guesses for roots, they should be investigated
-                launchNewRuns(uniqueRootGuesses, dataContainer, electricFieldLabel)
-                recordNoEr(allRootsLists)
-
-        elif numActualRoots == 2:
-
-            if numStableRoots == 0: # Impossible - something is wrong
-                printMoreRunsMessage('Two unstable roots were identified for {} = {}, which should not be possible.'.format(radLabel, radVal))
-                recordNoEr(allRootsLists)
-
-            elif numStableRoots == 1: # The other stable root has not been found yet
-
-                if numUniqueRootGuesses == 0: # This is a problem
-                    printMoreRunsMessage('Only one stable and one unstable root were identified for {} = {}.'.format(radLabel, radVal))
-                    recordNoEr(allRootsLists)
-
-                else: # Investigate the guesses, which will hopefully allow the other stable root to be identified
-                    launchNewRuns(uniqueRootGuesses, dataContainer, electricFieldLabel)
-                    recordNoEr(allRootsLists)
-
-            else: # Both roots are stable, which likely means the data is incomplete
-                
-                if numUniqueRootGuesses == 0: # This is a problem
-                    printMoreRunsMessage('Two stable roots and no unstable roots were identified for {} = {}.'.format(radLabel, radVal))
-                    recordNoEr(allRootsLists)
-
-                else: # Investigate the guesses, which will hopefully allow the unstable root to be identified
-                    launchNewRuns(uniqueRootGuesses, dataContainer, electricFieldLabel)
-                    recordNoEr(allRootsLists)
-                    
-        elif numActualRoots == 3:
-            
-            if numStableRoots in (0, 1, 3): # Does not make sense, something strange is going on
-                printMoreRunsMessage('Three roots were identified for {} = {}. {} of these appear to be stable, which should not be possible.'.format(radLabel, radVal, numStableRoots))
-                recordNoEr(allRootsLists)
-
-            else: # We have a valid number of total and stable roots
-               
-                if numUniqueRootGuesses != 0: # Probably a good idea to investigate these guesses just to get better data resolution (since we can only have 1 or 3 roots)
-                    launchNewRuns(uniqueRootGuesses, dataContainer, electricFieldLabel)
-                    recordNoEr(allRootsLists)
-
-                else: # So far, it looks like we have three roots with the right stability properties
-                   
-                    # We need to check that the unstable root is between the stable roots
-                    unstableRoot = list(set(rootErs) - set(stableRoots))[0]
-                    lowerRoot = np.min(stableRoots)
-                    upperRoot = np.max(stableRoots)
-                    
-                    if lowerRoot < unstableRoot < upperRoot: # Everything is in order, so we can choose the correct root using eq. (A2) of Turkin et al., PoP 18, 022505 (2011)
-                        
-                        negF = fs[0]
-                        posF = fs[1]
-                        intVal = evaluateIntegral(negF, posF, lowerRoot, upperRoot)
-                        # Note that the bounds of the integral in Turkin et al. would switch when Er is defined as a derivative of the potential without the negative sign,
-                        # so this ^ form of the integral should be correct.
-                        
-                        if np.isnan(intVal) or intVal == 0:
-                            msg = 'For {} = {}, the integral of Jr with respect to Er was {}. '.format(radLabel, radVal, intVal)
-                            msg += 'Something is wrong, so this subdirectory will be skipped.'
-                            messagePrinter(msg)
-                            recordNoEr(allRootsLists)
-                            continue
-
-                        if ErQuantityHasSameSignAsEr:
-                            ionRoot = lowerRoot
-                            electronRoot = upperRoot
-                        else:
-                            ionRoot = upperRoot
-                            electronRoot = lowerRoot
-                            
-                        ionRoots.append(ionRoot)
-                        unstableRoots.append(unstableRoot)
-                        electronRoots.append(electronRoot)
-                        integralVals.append(intVal)
-                        soloRoots.append(np.nan)
-                        
-                        if intVal > 0:
-                            rootsToUse.append(ionRoot)
-                        elif intVal < 0:
-                            rootsToUse.append(electronRoot)
-
-                    else:
-                        printMoreRunsMessage('For {} = {}, three roots were found and two were stable, but the unstable root was not between the stable ones.'.format(radLabel, radVal))
-                        recordNoEr(allRootsLists)
-
-        else: # More than three roots should not be possible
-            printMoreRunsMessage('More than three roots were identified for {} = {}, which should not be possible.'.format(radLabel, radVal))
-            recordNoEr(allRootsLists)
+                launchNewRuns(guesses, getDataContainer(radInd), electricFieldLabel)
+                launchedErs[radInd] = np.array(guesses)
+        elif result['status'] == 'moreData':
+            printMoreRunsMessage(result['moreDataMessage'], radInd)
+        elif result['status'] == 'skip': # The data could be plotted, but something went wrong afterwards
+            messagePrinter(result['skipMessage'])
 
     # Now perform some checks and save the Er information that was found
-    assert ds.Nradii == len(rootsToUse), 'The vector to be written in rootsToUse.txt was the wrong length. Something is wrong.'
-    assert ds.Nradii == len(ionRoots), 'The vector to be written in ionRoots.txt was the wrong length. Something is wrong.'
-    assert ds.Nradii == len(unstableRoots), 'The vector to be written in unstableRoots.txt was the wrong length. Something is wrong.'
-    assert ds.Nradii == len(electronRoots), 'The vector to be written in electronRoots.txt was the wrong length. Something is wrong.'
-    assert ds.Nradii == len(integralVals), 'The vector to be written in integralVals.txt was the wrong length. Something is wrong.'
-    assert ds.Nradii == len(soloRoots), 'The vector to be written in soloRoots.txt was the wrong length. Something is wrong.'
-
-    np.savetxt(join(outDir, 'rootsToUse.txt'), rootsToUse)
-    np.savetxt(join(outDir, 'ionRoots.txt'), ionRoots)
-    np.savetxt(join(outDir, 'unstableRoots.txt'), unstableRoots)
-    np.savetxt(join(outDir, 'electronRoots.txt'), electronRoots)
-    np.savetxt(join(outDir, 'integralVals.txt'), integralVals)
-    np.savetxt(join(outDir, 'soloRoots.txt'), soloRoots)
+    for name in rootFileNames():
+        assert len(surfaces) == len(rootLists[name]), 'The vector to be written in {}.txt was the wrong length. Something is wrong.'.format(name)
+        np.savetxt(join(outDir, name + '.txt'), rootLists[name], header=electricFieldLabel)
+    np.savetxt(join(outDir, 'radii.txt'), radVals, header=radLabel)
+
+    # Seed the surfaces that still lack data using the roots found on the neighboring surfaces
+    if args.continuation and len(needMoreDataInds) != 0:
+
+        radVals = np.array(radVals)
+        tripleInds = np.where(np.logical_not(np.isnan(rootLists['integralVals'])))[0]
+        soloInds = np.where(np.logical_not(np.isnan(rootLists['soloRoots'])))[0]
+        resolvedInds = np.union1d(tripleInds, soloInds)
+
+        if resolvedInds.size == 0:
+            messagePrinter('No flux surface has a resolved set of roots yet, so <continuation> cannot seed any new runs.')
+
+        for radInd in needMoreDataInds:
+
+            if resolvedInds.size == 0:
+                break
+
+            dataContainer = getDataContainer(radInd)
+            radVal = radVals[radInd]
+
+            # Only predict the kinds of roots that are present on the closest resolved surfaces on either side
+            lowerInds = resolvedInds[np.where(radVals[resolvedInds] < radVal)]
+            upperInds = resolvedInds[np.where(radVals[resolvedInds] > radVal)]
+            neighborInds = []
+            if lowerInds.size != 0:
+                neighborInds.append(lowerInds[np.argmax(radVals[lowerInds])])
+            if upperInds.size != 0:
+                neighborInds.append(upperInds[np.argmin(radVals[upperInds])])
+
+            predictedRoots = []
+            for neighborInd in neighborInds:
+                if neighborInd in tripleInds:
+                    rootNames = ['ionRoots', 'unstableRoots', 'electronRoots']
+                else:
+                    rootNames = ['soloRoots']
+                for rootName in rootNames:
+                    predictedRoots.append(float(predictAlongRadius(radVals, rootLists[rootName], radVal)))
+            predictedRoots = np.unique(predictedRoots)
+
+            newErs = continuationErs(predictedRoots, existingValues(radInd))
+
+            if newErs.size != 0:
+                launchNewRuns(newErs, dataContainer, electricFieldLabel)
+                launchedErs[radInd] = np.append(launchedErs.get(radInd, []), newErs)
+                msg = 'For {} = {}, the roots on the neighboring flux surfaces predict {} = {}. '.format(radLabel, radVal, electricFieldLabel, predictedRoots)
+                msg += 'Runs were set up for {} = {}.'.format(electricFieldLabel, newErs)
+                messagePrinter(msg)
+
+    # Use a surrogate model built from several flux surfaces at once to place runs on the surfaces that are not resolved yet
+    if args.surrogate:
+
+        unresolvedInds = [radInd for radInd in ErJrData if np.isnan(rootLists['rootsToUse'][radInd])]
+
+        if len(unresolvedInds) != 0:
+
+            # Only the unresolved flux surfaces and their neighbors are needed, and the fit gets expensive quickly with more data
+            dataInds = sorted(ErJrData) # The flux surfaces are sorted by radius
+            trainingInds = set()
+            for radInd in unresolvedInds:
+                position = dataInds.index(radInd)
+                trainingInds.update(dataInds[max(position - args.surrogateNeighbors[0], 0):position + args.surrogateNeighbors[0] + 1])
+            trainingInds = sorted(trainingInds)
+
+            allRadii = np.concatenate([[radVals[radInd]] * ErJrData[radInd].shape[0] for radInd in trainingInds])
+            allErJrVals = np.vstack([ErJrData[radInd] for radInd in trainingInds])
+            model = fitSurrogate(allRadii, allErJrVals[:,0], allErJrVals[:,1])
+
+            # Surfaces with no root guesses may search beyond their own scans, since their roots may lie outside of them
+            ErMin = min([np.min(ErJrData[radInd][:,0]) for radInd in ErJrData])
+            ErMax = max([np.max(ErJrData[radInd][:,0]) for radInd in ErJrData])
+            ErMargin = args.surrogateMargin[0] * (ErMax - ErMin)
+            ErRanges = {}
+            uncertainInds = []
+            for radInd in unresolvedInds:
+                ownRange = [np.min(ErJrData[radInd][:,0]), np.max(ErJrData[radInd][:,0])]
+                if radInd in needMoreDataInds:
+                    ErRanges[radInd] = [ErMin - ErMargin, ErMax + ErMargin]
+                    uncertainInds.append(radInd)
+                else:
+                    ErRanges[radInd] = ownRange
+                    if surfaceUncertainty(model, radVals[radInd], ownRange) > args.surrogateTol[0]:
+                        uncertainInds.append(radInd)
+
+            # The usual root guesses are better at pinning down roots once the surrogate knows roughly where they are
+            for radInd, guesses in rootGuesses.items():
+                if radInd not in uncertainInds:
+                    launchNewRuns(guesses, getDataContainer(radInd), electricFieldLabel)
+                    launchedErs[radInd] = np.append(launchedErs.get(radInd, []), guesses)
+
+            targetRadii = [radVals[radInd] for radInd in uncertainInds]
+            existingErs = [existingValues(radInd) for radInd in uncertainInds]
+            proposals = proposeRootSamples(model, targetRadii, [ErRanges[radInd] for radInd in uncertainInds], existingErs, args.surrogateBatch[0])
+
+            for radInd, newErs in zip(uncertainInds, proposals):
+                if newErs.size != 0:
+                    launchNewRuns(newErs, getDataContainer(radInd), electricFieldLabel)
+                    msg = 'For {} = {}, the surrogate model set up runs for {} = {}.'.format(radLabel, radVals[radInd], electricFieldLabel, newErs)
+                    messagePrinter(msg)
+
+    # Set up full-resolution runs near the roots that the (coarse) runs in <sfincsDir> have bracketed
+    fineRuns = []
+    if args.refine:
+
+        fineDir = inDir + '_fine'
+
+        for radInd, surface in enumerate(surfaces):
+
+            result = surface['result']
+            fineRadDir = join(fineDir, basename(surface['radDir']))
+            if result['status'] not in ['solo', 'triple'] or isdir(fineRadDir): # Not bracketed yet, or already refined
+                continue
+
+            if result['status'] == 'solo':
+                roots = [result['roots']['soloRoots']]
+            else:
+                roots = [result['roots'][name] for name in ['ionRoots', 'unstableRoots', 'electronRoots']]
+
+            # The zero-electric-field run is needed to resolve the spike in the fine scan too, as is at least one run on each side of it
+            coarseErs = ErJrData[radInd][:,0]
+            zeroEr = coarseErs[np.argmin(np.abs(coarseErs))]
+            fineErs = np.unique(np.append(zeroEr, windowErs(roots, args.refineNumErs[0], args.refineRelWidth[0])))
+            for side in [-1, 1]:
+                if not np.any(side * (fineErs - zeroEr) > 0):
+                    sideErs = coarseErs[side * (coarseErs - zeroEr) > 0]
+                    if sideErs.size != 0:
+                        fineErs = np.append(fineErs, sideErs[np.argmin(np.abs(sideErs - zeroEr))])
+            fineErs = np.sort(fineErs)
+            planFineRuns(fineErs, getDataContainer(radInd), electricFieldLabel, fineRadDir)
+            messagePrinter('For {} = {}, full-resolution runs were set up in {} for {} = {}.'.format(radLabel, radVals[radInd], fineRadDir, electricFieldLabel, fineErs))
+
+        newFineDirs = materializeRuns(fineRuns)
+        if not args.noRun:
+            _ = submitRuns(newFineDirs, launchCommand='sbatch', arrayDir=fineDir, cacheFile=args.resultCache[0])
+
+    # Create all the new runs at once and submit them with a single scheduler call (existing runs are never overwritten)
+    newRunDirs = materializeRuns(plannedRuns)
+    if len(newRunDirs) != len(plannedRuns):
+        skippedDirs = [run['runDir'] for run in plannedRuns if run['runDir'] not in newRunDirs]
+        messagePrinter('The following run directories already existed, so they were left alone: {}'.format(skippedDirs))
+    if not args.noRun:
+        _ = submitRuns(newRunDirs, launchCommand='sbatch', arrayDir=outDir, cacheFile=args.resultCache[0])
+
+    # Plot and save data for interpretation later, now that the analysis (and any launching of runs) is finished
+    if not args.noPlots:
+        toPlot = [surface for surface in surfaces if not surface['cached'] and surface['result']['ErJrVals'] is not None]
+        jobs = [plotJob(surface['result'], basename(inDir), outDir, electricFieldLabel, args.marg[0]) for surface in toPlot]
+        for surface, files in zip(toPlot, plotRadii(jobs, numWorkers=args.plotWorkers[0])):
+            surface['files'] = files
+            surface['plotted'] = True
+
+    # Save the results for every flux surface so that unchanged ones can be skipped next time
+    cache['surfaces'] = {basename(surface['radDir']):{'stamps':surface['stamps'], 'plotted':surface['plotted'], 'files':surface['files'], 'result':resultToCache(surface['result'])} for surface in surfaces}
+    saveCache(cacheFile, cache)
 
     # Write a log file
     logStr = 'This directory was last auto-analyzed to determine the correct values of the ambipolar radial electric field on:\n'
@@ -540,6 +407,15 @@ if not args.filter:
     messagePrinter('Please check the outputs in {} to see the status of the calculations.'.format(outDir))
 
 else:
+
+    # Load tools from external library
+    ds = sfincsRadialAndErScan(inDir, verbose=0, ErDefForJr=electricFieldLabel)
+
+    # Initial check
+    if len(ds.Erscans) == 0:
+        msg = 'It appears that there are no electric field subdirectories in this SFINCS directory. '
+        msg += 'Therefore, this script cannot be used.'
+        raise IOError(msg)
     
     # Load correct electric field quantities
     loadedErQuantities = np.loadtxt(join(inDir, 'determineEr/rootsToUse.txt'), ndmin=1)
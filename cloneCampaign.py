@@ -0,0 +1,124 @@
+# This script clones the converged runs of a SFINCS campaign into a new directory with some namelist parameters changed, and (optionally) submits the new runs.
+# This makes it easy to set up variants of a campaign, such as runs with a different collision operator, drift scheme, or resolution, or runs with Phi1.
+# The changes are given declaratively, either as namelist patch files (see the <patch> option) or on the command line (see the <set> option), and they are
+# applied to every selected run with the same structured namelist engine. By default, only the run with the smallest radial current on each flux surface
+# is cloned, so a campaign whose electric field has been determined by chooseErs.py can be cloned directly.
+
+# Load necessary modules
+from os.path import dirname, abspath, join, relpath, isfile
+from shutil import copy
+from inspect import getfile, currentframe
+import sys
+
+thisFile = abspath(getfile(currentframe()))
+thisDir = dirname(thisFile)
+sys.path.append(join(thisDir, 'src/'))
+from dataProc import convertRadDer, summarizeRuns
+from IO import getCloneCampaignArgs, getFileInfo, findFiles, makeDir, writeFile, messagePrinter, saveTimeStampFile, radialVarDict
+from IO import parseNamelist, readNamelistPatch, patchParsedNamelist, namelistText, namelistValue
+from jobControl import groupRunsByRadius
+from resultCache import registerCampaign
+from sfincsOutputLib import submitRuns
+_, thisFileName, _, _, _ = getFileInfo(thisFile, 'arbitrary/path', 'arbitrary')
+
+# Get arguments
+args = getCloneCampaignArgs()
+
+# Locally useful functions
+def ErDefs():
+    radialVars = radialVarDict()
+    l = ['dPhiHatd{}'.format(radialVars[i]) for i in range(4)]
+    l.append('Er')
+    return l
+
+def outputErPatch(parsed, summary):
+    # Replaces the electric field definition(s) in parsed by the value of Er in the output of the original run
+    inputRadialCoordinateForGradients = int(namelistValue(parsed, 'inputRadialCoordinateForGradients') or 4) # 4 is the SFINCS default
+    generalizedErVal = convertRadDer(ErDefs().index('Er'), summary['Er'], inputRadialCoordinateForGradients, summary['aHat'], summary['psiAHat'], summary['psiN'], XisPhi=True)
+    patch = {'physicsParameters':{ErDef:None for ErDef in ErDefs()}}
+    patch['physicsParameters'][ErDefs()[inputRadialCoordinateForGradients]] = str(generalizedErVal)
+    return patch
+
+# Sort out directories
+_, _, _, inDir, _ = getFileInfo('/arbitrary/path', args.sfincsDir[0], 'arbitrary')
+
+if args.saveLoc[0] is None:
+    outDir = inDir + '_clone'
+else:
+    _, _, _, outDir, _ = getFileInfo('/arbitrary/path', args.saveLoc[0], 'arbitrary')
+
+if outDir == inDir:
+    raise IOError('<saveLoc> must be different from <sfincsDir>.')
+
+# Collect the patches
+patches = [readNamelistPatch(patchFile) for patchFile in args.patch]
+setPatch = {}
+for item in args.set:
+    groupAndName, value = item.split('=', 1)
+    group, name = groupAndName.split('.', 1)
+    setPatch.setdefault(group.strip(), {})[name.strip()] = value.strip()
+if len(setPatch) != 0:
+    patches.append(setPatch)
+
+# Select the runs to clone
+dataFiles = findFiles('sfincsOutput.h5', inDir, raiseError=True)
+groups = groupRunsByRadius(dataFiles, inDir)
+summaries = dict(zip(dataFiles, summarizeRuns(dataFiles, numWorkers=args.numWorkers[0])))
+
+toClone = []
+numFailed = 0
+for radDir, group in groups.items():
+    converged = [dataFile for dataFile in group if summaries[dataFile] is not None]
+    numFailed += len(group) - len(converged)
+    if len(converged) == 0:
+        messagePrinter('None of the runs in {} appear to have converged, so this flux surface will be skipped.'.format(radDir))
+    elif args.select[0] == 'bestEr':
+        toClone.append(min(converged, key=lambda item: summaries[item]['absJr']))
+    else:
+        toClone += converged
+
+if numFailed != 0:
+    messagePrinter('{} run(s) that did not converge will not be cloned.'.format(numFailed))
+
+# Write the new runs
+newDirs = []
+for dataFile in toClone:
+
+    copyDir = dirname(dataFile)
+    outSubDir = join(outDir, relpath(copyDir, inDir))
+    if isfile(join(outSubDir, 'input.namelist')) and not args.overwrite:
+        continue
+
+    try:
+        parsed = parseNamelist(join(copyDir, 'input.namelist'))
+    except FileNotFoundError:
+        raise IOError('Every run in <sfincsDir> must have the "input.namelist" file that was used as its SFINCS input. This is not the case for {}.'.format(copyDir))
+
+    runPatches = ([outputErPatch(parsed, summaries[dataFile])] if args.useOutputEr else []) + patches
+    for patch in runPatches:
+        parsed = patchParsedNamelist(parsed, patch, comment='Set by {}'.format(thisFileName))
+
+    _ = makeDir(outSubDir)
+    writeFile(join(outSubDir, 'input.namelist'), namelistText(parsed), silent=True)
+    copy(join(copyDir, 'job.sfincsScan'), outSubDir)
+    newDirs.append(outSubDir)
+
+if isfile(join(inDir, 'profiles')) and not isfile(join(outDir, 'profiles')): # Keeps the runs identifiable by the result cache
+    _ = makeDir(outDir)
+    copy(join(inDir, 'profiles'), outDir)
+
+messagePrinter('{} run(s) were written in {}.'.format(len(newDirs), outDir))
+
+# Add the finished runs to the result cache
+registerCampaign(args.resultCache[0], inDir)
+
+if not args.noRun and len(newDirs) != 0:
+    _ = submitRuns(newDirs, launchCommand=args.launchCommand[0], arrayDir=outDir, cacheFile=args.resultCache[0])
+    messagePrinter('The new runs have been submitted.')
+
+# Write a log file
+logStr = 'Runs were cloned from {} into this directory (selecting "{}" runs) with the patch file(s) {} and the settings {} on:\n'.format(inDir, args.select[0], args.patch, args.set)
+saveTimeStampFile(outDir, 'automatedCloneLog', logStr)
+
+# Closing message
+messagePrinter('Please check the input.namelist files in {} before relying on the new runs.'.format(outDir))
@@ -0,0 +1,159 @@
+# This script finds the minimal converged resolution of a single SFINCS run adaptively, as a cheaper alternative to the <resScan> option of run.py. Instead of
+# running a fixed grid of values for every resolution parameter, each parameter in <params> is increased step by step (starting at <startFactor> times its
+# value in <baseDir> and growing by <stepFactor> each step, with the other parameters kept at their base values). A step is only set up and submitted once the
+# previous two have finished. As soon as the fluxes and flows of two consecutive steps agree within <tol>, the lower of the two values is reported as the
+# converged resolution for that parameter and nothing more is run for it. The parameters are handled concurrently, in a closed loop like autoChooseErs.py.
+# The results are written to convergedResolution.txt in <saveLoc>. Runs that already exist in <saveLoc> (from an earlier call to this script, for instance)
+# are reused rather than overwritten. Runs that fail before writing any output will simply be waited on until <maxTime> is reached.
+
+# Load necessary modules
+from os.path import dirname, abspath, join, isdir
+from os import makedirs
+from shutil import copyfile
+from inspect import getfile, currentframe
+from time import monotonic
+import asyncio
+import sys
+import numpy as np
+
+thisDir = dirname(abspath(getfile(currentframe())))
+sys.path.append(join(thisDir, 'src/'))
+from dataProc import checkConvergence, convergedValue, resolutionLadder
+from IO import getConvergeResolutionArgs, getFileInfo, makeDir, messagePrinter, namelistText, namelistValue, parseNamelist, patchParsedNamelist, saveTimeStampFile, writeFile
+from jobControl import runIsFinished, submitJob
+from resultCache import registerCampaign
+
+# Get arguments
+args = getConvergeResolutionArgs()
+
+# Locally useful functions
+def readBaseValues(namelistFile, params):
+    parsed = parseNamelist(namelistFile)
+    values = {param:namelistValue(parsed, param, group='resolutionParameters') for param in params}
+    missing = [param for param in params if values[param] is None]
+    if len(missing) != 0:
+        raise IOError('The parameters {} were not found in {}.'.format(missing, namelistFile))
+    return {param:int(float(value.lower().replace('d', 'e'))) for param, value in values.items()}
+
+def loadQuantities(runDir):
+    f = checkConvergence(join(runDir, 'sfincsOutput.h5'))
+    fluxTerm = '_vd_rHat' if f['includePhi1'][()] == f['integerToRepresentTrue'][()] else '_vm_rHat'
+    quantities = np.concatenate([np.atleast_2d(f[name][()].T)[-1] for name in ['particleFlux' + fluxTerm, 'heatFlux' + fluxTerm, 'FSABFlow']]) # Final iteration only
+    f.close()
+    return quantities
+
+def setUpStep(ladder, ind):
+    runDir = join(outDir, '{}{}'.format(ladder['param'], ladder['values'][ind]))
+    ladder['runDirs'].append(runDir)
+    ladder['results'].append(None)
+    if isdir(runDir): # Never overwrite existing runs
+        return None
+    makedirs(runDir)
+    copyfile(join(inDir, 'job.sfincsScan'), join(runDir, 'job.sfincsScan'))
+    parsed = patchParsedNamelist(parseNamelist(join(inDir, 'input.namelist')), {'resolutionParameters':{ladder['param']:ladder['values'][ind]}})
+    writeFile(join(runDir, 'input.namelist'), namelistText(parsed))
+    if args.noRun:
+        return None
+    return submitJob(runDir, launchCommand=args.launchCommand[0], cacheFile=args.resultCache[0])
+
+def saveResults(ladders):
+    stringToWrite = '# param convergedValue status valuesRun\n'
+    for ladder in ladders:
+        stringToWrite += '{} {} {} {}\n'.format(ladder['param'], ladder['converged'], ladder['status'], ladder['values'][:len(ladder['runDirs'])])
+    writeFile(join(outDir, 'convergedResolution.txt'), stringToWrite, silent=True)
+
+async def drive():
+    baseValues = readBaseValues(join(inDir, 'input.namelist'), args.params)
+    ladders = []
+    submissions = []
+    for param in args.params:
+        values = resolutionLadder(baseValues[param], args.startFactor[0], args.stepFactor[0], args.maxFactor[0], odd=(param in ['Ntheta', 'Nzeta']))
+        ladder = {'param':param, 'values':values, 'runDirs':[], 'results':[], 'status':'waiting', 'converged':None}
+        if len(values) < 2:
+            messagePrinter('Fewer than two distinct values of {} were found between <startFactor> and <maxFactor>, so it will not be checked.'.format(param))
+            ladder['status'] = 'exhausted'
+        else:
+            submissions += [setUpStep(ladder, ind) for ind in range(2)]
+            messagePrinter('The convergence of {} will be checked using the values {} (as needed).'.format(param, values))
+        ladders.append(ladder)
+    submissions = [submission for submission in submissions if submission is not None]
+
+    startTime = monotonic()
+    while True:
+
+        # Submit any new runs at once
+        if len(submissions) != 0:
+            await asyncio.gather(*submissions)
+        submissions = []
+        saveResults(ladders)
+
+        # Decide whether or not to keep going
+        if 'waiting' not in [ladder['status'] for ladder in ladders]:
+            break
+
+        if (monotonic() - startTime) / 3600 > args.maxTime[0]:
+            messagePrinter('The maximum run time of {} hours was reached before every parameter had converged.'.format(args.maxTime[0]))
+            break
+
+        await asyncio.sleep(args.pollInterval[0])
+
+        # Check the newest steps of each parameter
+        for ladder in ladders:
+
+            if ladder['status'] != 'waiting':
+                continue
+
+            newInds = [ind for ind in range(len(ladder['runDirs']) - 2, len(ladder['runDirs'])) if ladder['results'][ind] is None]
+            finished = await asyncio.gather(*[asyncio.to_thread(runIsFinished, ladder['runDirs'][ind]) for ind in newInds])
+            if not all(finished):
+                continue
+
+            try:
+                for ind in newInds:
+                    ladder['results'][ind] = await asyncio.to_thread(loadQuantities, ladder['runDirs'][ind])
+            except (IOError, KeyError, ValueError):
+                messagePrinter('The output in {} did not pass the basic convergence checks, so {} will not be checked any further.'.format(ladder['runDirs'][ind], ladder['param']))
+                ladder['status'] = 'failed'
+                continue
+
+            # Compare the last two steps
+            lastVals = ladder['values'][len(ladder['runDirs']) - 2:len(ladder['runDirs'])]
+            if convergedValue(lastVals, np.array(ladder['results'][-2:]), args.tol[0]) == lastVals[0]:
+                ladder['status'] = 'converged'
+                ladder['converged'] = lastVals[0]
+                messagePrinter('{} has converged at {} (compared with {}).'.format(ladder['param'], lastVals[0], lastVals[1]))
+            elif len(ladder['runDirs']) < len(ladder['values']):
+                submission = setUpStep(ladder, len(ladder['runDirs']))
+                if submission is not None:
+                    submissions.append(submission)
+                messagePrinter('{} has not converged at {}, so a run was set up for {} = {}.'.format(ladder['param'], lastVals[0], ladder['param'], ladder['values'][len(ladder['runDirs']) - 1]))
+            else:
+                ladder['status'] = 'exhausted'
+                messagePrinter('{} had not converged by {}. Consider increasing <maxFactor>.'.format(ladder['param'], lastVals[1]))
+
+    return ladders
+
+# Sort out directories
+_, _, _, inDir, _ = getFileInfo('/arbitrary/path', args.baseDir[0], 'arbitrary')
+
+if args.saveLoc[0] is None:
+    outDir = join(inDir, 'convergence')
+else:
+    _, _, _, outDir, _ = getFileInfo('/arbitrary/path', args.saveLoc[0], 'arbitrary')
+
+_ = makeDir(outDir)
+
+# Add the finished runs to the result cache
+registerCampaign(args.resultCache[0], inDir)
+
+# Do work
+ladders = asyncio.run(drive())
+converged = {ladder['param']:ladder['converged'] for ladder in ladders if ladder['status'] == 'converged'}
+numRuns = sum([len(ladder['runDirs']) for ladder in ladders])
+
+# Write a log file
+logStr = 'The resolution of the run in {} was last checked adaptively by convergeResolution.py on:\n'.format(inDir)
+saveTimeStampFile(outDir, 'automatedConvergenceLog', logStr)
+
+# Closing message
+messagePrinter('The minimal converged resolution is {} ({} runs were used). Please check {} for the status of every parameter.'.format(converged, numRuns, join(outDir, 'convergedResolution.txt')))
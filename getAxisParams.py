@@ -5,18 +5,20 @@
 from os.path import dirname, abspath, join
 from inspect import getfile, currentframe
 import sys
-from scipy.io import netcdf_file
 import numpy as np
 
 thisDir = dirname(abspath(getfile(currentframe())))
 sys.path.append(join(thisDir, 'src/'))
 from IO import getAxisParamsArgs, makeStringForStellopt, messagePrinter
+from equilibrium import isNetcdfFile, openWout
 
 # Load argument
 args = getAxisParamsArgs()
 
 # Read wout file
-f = netcdf_file(args.wout[0], mode='r', mmap=False)
+if not isNetcdfFile(args.wout[0]): # The magnetic axis is not kept when ASCII wout files are converted
+    raise IOError('{} is not in netCDF format. Please use the netCDF wout file written by VMEC.'.format(args.wout[0]))
+f = openWout(args.wout[0])
 
 # Get the axis variables
 rax = f.variables['raxis_cc'][()]
@@ -16,7 +16,6 @@ from os.path import dirname, abspath, join, basename
 from inspect import getfile, currentframe
 import sys
 from scipy.interpolate import PchipInterpolator
-from scipy.io import netcdf_file
 from scipy.constants import mu_0
 from scipy.integrate import odeint
 from numpy import linspace, pi
@@ -26,6 +25,7 @@ sys.path.append(join(thisDir, 'src/'))
 from sfincsOutputLib import sfincsRadialAndErScan, sfincsScan
 from dataProc import fixOutputUnits, createVMECGrids
 from IO import getBootstrapArgs, getFileInfo, makeStringForStellopt, messagePrinter
+from equilibrium import openWout
 
 # Sort out inputs
 args = getBootstrapArgs()
@@ -51,7 +51,7 @@ f_jB = PchipInterpolator(psiN, FSABjHat) #NOTE: extrapolation is allowed since S
 f_B2 = PchipInterpolator(psiN, FSABHat2)
 
 # Load VMEC information
-woutFile = netcdf_file(woutFile, mmap=False)
+woutFile = openWout(woutFile, cacheDir=sfincsDir if args.eqCache[0] is None else abspath(args.eqCache[0]))
 
 signgs = woutFile.variables['signgs'][()]
 ns = woutFile.variables['ns'][()]
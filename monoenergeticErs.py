@@ -0,0 +1,93 @@
+# This script finds the ambipolar radial electric field on every flux surface of a set of monoenergetic SFINCS runs (set up by scanMonoenergetic.py) for the
+# profiles and species in <profilesIn>, without running SFINCS again. The monoenergetic transport coefficients are first collected into a compact database
+# (saved in <saveLoc>, so it only has to be built once). The fluxes of every species are then found from an energy convolution of the database, which is
+# cheap enough that the radial current can be evaluated on a dense grid of electric fields. The roots are found and classified with the same logic as
+# chooseErs.py, and they are saved in the same format. Since the monoenergetic approximation is less accurate than the full calculation, these roots are
+# best used to set up full SFINCS runs for confirmation: the output directory can be given to the <prevErDir> option of run.py or the <prevRoots> option
+# of scanErs.py. Different profiles or species (such as those of a different scenario) only need this script to be run again.
+
+# Load necessary modules
+from os.path import dirname, abspath, join, isfile
+from inspect import getfile, currentframe
+import sys
+import numpy as np
+
+thisDir = dirname(abspath(getfile(currentframe())))
+sys.path.append(join(thisDir, 'src/'))
+from dataProc import combineAndSort, fixOutputUnits
+from IO import getFileInfo, getMonoenergeticErsArgs, makeDir, messagePrinter, saveTimeStampFile
+from jobControl import findRadialDirs
+from monoenergetic import buildDatabase, convolveFluxes, loadDatabase, loadSpecies, saveDatabase
+from rootFinding import analyzeRadii, findRoots, rootFileNames
+
+# Get arguments
+args = getMonoenergeticErsArgs()
+
+# Sort out directories
+_, _, _, inDir, _ = getFileInfo('/arbitrary/path', args.sfincsDir[0], 'arbitrary')
+
+if args.saveLoc[0] is None:
+    outDir = join(inDir, 'determineErMono')
+else:
+    _, _, _, outDir, _ = getFileInfo('/arbitrary/path', args.saveLoc[0], 'arbitrary')
+
+_ = makeDir(outDir)
+
+# Build or load the database
+databaseFile = join(outDir, 'monoenergeticDatabase.npz')
+if isfile(databaseFile) and not args.rebuild:
+    database = loadDatabase(databaseFile)
+    messagePrinter('The database in {} will be used.'.format(databaseFile))
+else:
+    radDirs, radVals = findRadialDirs(inDir, excludeDir=outDir)
+    radDirs = [radDir for radDir, radVal in zip(radDirs, radVals) if not np.isnan(radVal)]
+    if len(radDirs) == 0:
+        raise IOError('No flux surface subdirectories were found in {}.'.format(inDir))
+    database = buildDatabase(radDirs)
+    saveDatabase(databaseFile, database)
+    messagePrinter('A database of the monoenergetic coefficients was saved in {}.'.format(databaseFile))
+
+# Evaluate the radial current on each flux surface
+allSpecies = loadSpecies(args.profilesIn[0], database['psiN'], database['psiAHat'], args.assumedSpeciesMass[0], args.assumedSpeciesCharge[0])
+Ers = np.linspace(args.minEr[0], args.maxEr[0], num=args.numErs[0])
+surfaces = []
+for radInd, species in enumerate(allSpecies):
+
+    surface = {'radLabel':'psiN', 'radVal':database['psiN'][radInd], 'status':None, 'skipMessage':None, 'moreDataMessage':None, 'guesses':np.array([]),
+               'roots':{name:np.nan for name in rootFileNames()}, 'ErQuantityHasSameSignAsEr':True}
+    surfaces.append(surface)
+    try:
+        _, _, Jr = convolveFluxes(database, radInd, species, Ers, numEnergies=args.numEnergies[0])
+    except IOError as err:
+        surface['status'] = 'skip'
+        surface['skipMessage'] = 'For psiN = {}, the fluxes could not be evaluated ({}), so this flux surface will be skipped.'.format(surface['radVal'], err)
+        continue
+
+    # The overall scale of Jr is arbitrary (see convolveFluxes), so it is normalized. The roots themselves are added as data points with Jr = 0.
+    Jr = Jr / np.max(np.abs(Jr))
+    ErVals = fixOutputUnits('Er', Ers)
+    _, roots, _ = findRoots(np.column_stack((ErVals, Jr)), ErVals)
+    surface['ErJrVals'] = combineAndSort(np.append(ErVals, roots), np.append(Jr, np.zeros(roots.size)))
+
+surfaces = analyzeRadii(surfaces, maxRootJr=1e-12)
+
+# Report and save the results
+for surface in surfaces:
+    if surface['status'] == 'skip':
+        messagePrinter(surface['skipMessage'])
+    elif surface['status'] in ('solo', 'triple'):
+        messagePrinter('For psiN = {}, the root(s) {} were found, and {} should be used.'.format(surface['radVal'], surface['rootErs'], surface['roots']['rootsToUse']))
+    else:
+        msg = surface['moreDataMessage'] if surface['status'] == 'moreData' else 'The roots for psiN = {} could not be classified.'.format(surface['radVal'])
+        messagePrinter(msg + ' Consider changing <minEr> and <maxEr>.')
+
+for name in rootFileNames():
+    np.savetxt(join(outDir, name + '.txt'), [surface['roots'][name] for surface in surfaces], header='Er')
+np.savetxt(join(outDir, 'radii.txt'), database['psiN'], header='psiN')
+
+# Write a log file
+logStr = 'This directory was last used to find the ambipolar radial electric field from a monoenergetic database (for the profiles in {}) on:\n'.format(args.profilesIn[0])
+saveTimeStampFile(outDir, 'automatedMonoenergeticErLog', logStr)
+
+# Closing message
+messagePrinter('Please check the outputs in {} to see the roots that were found.'.format(outDir))
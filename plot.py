@@ -12,7 +12,7 @@ import matplotlib.pyplot as plt
 thisDir = dirname(abspath(getfile(currentframe())))
 sys.path.append(join(thisDir, 'src/'))
 from IO import getPlotArgs, radialVarDict, adjustInputLengths, getFileInfo, makeDir, findFiles, writeFile, prettyRadialVar, prettyDataLabel, messagePrinter, now, saveTimeStampFile
-from dataProc import checkConvergence, fixOutputUnits, combineAndSort
+from dataProc import checkConvergence, convertToPhysicalUnits, combineAndSort
 
 # Get command line arguments and radial variables
 args = getPlotArgs()
@@ -134,8 +134,8 @@ for i,unRegDirectory in enumerate(IOlists['sfincsDir']):
 
             for varName in nonCalcDVs:
                 temp = f[varName][()]
-                if varName == 'Er': # This is stored as a scalar
-                    loadedData[varName] = temp
+                if varName == 'Er': # This is stored as a scalar (or once per iteration by some ambipolarSolve runs)
+                    loadedData[varName] = np.ravel(temp)[-1]
                 else: # These are stored as 1D or 2D arrays
                     loadedData[varName] = temp[..., -1]
 
@@ -161,6 +161,9 @@ for i,unRegDirectory in enumerate(IOlists['sfincsDir']):
                 loadedData[radialCurrent] = np.dot(loadedData['Zs'], loadedData[neoclassicalParticleFluxes[radInd]])
             loadedData['extensiveRadialCurrent'] = normalizedAreaFactor * loadedData['radialCurrent'+distFunc+'psiHat']
 
+            # Store the data in SI units from here on
+            loadedData = convertToPhysicalUnits(loadedData, names=DVs)
+
             # Put the data in the appropriate place
             if radDirName != subdictNames[0]: # You are in a different radial directory from the last iteration over dataFiles
                 if appendedSuccessfulData != 0: # We shouldn't try to append data before we've loaded it (not all variables are instantiated correctly yet)
@@ -245,7 +248,7 @@ for i,unRegDirectory in enumerate(IOlists['sfincsDir']):
                         ErChoices.append(join(radKey, minJrKey) + '\n')
                    
                     IVvec.append(dataToUse[IV])
-                    DVvec.append(fixOutputUnits(DV, dataToUse[DV]))
+                    DVvec.append(dataToUse[DV])
 
                 combined = combineAndSort(IVvec, DVvec)
 
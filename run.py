@@ -2,15 +2,18 @@
 # To see the capabilities of this script, run it with the --help flag.
 
 # Import necessary modules
-from os.path import dirname, abspath, join
+from os.path import dirname, abspath, basename, join, isfile
+from shutil import copytree
 from inspect import getfile, currentframe
 import sys
 from os import environ
 from subprocess import run
+import numpy as np
 
 thisDir = dirname(abspath(getfile(currentframe())))
 sys.path.append(join(thisDir, 'src/'))
-from IO import getRunArgs, adjustInputLengths, makeDir, messagePrinter, saveTimeStampFile
+from IO import getRunArgs, adjustInputLengths, makeDir, messagePrinter, saveTimeStampFile, radialVarDict, setRadialScan, writeFile
+from equilibrium import compareSurfaces, netcdfWout, reduceWout, reducedWoutError
 import writeProfiles
 import writeNamelist
 import writeBatch
@@ -54,6 +57,33 @@ for i in range(maxLen):
         writeProfiles.run(profilesInUse, outDir)
         logString += '\tprofiles' + appendor
 
+    if not eqInUse.endswith('.bc'): # SFINCS and the Python scripts read VMEC wout files in netCDF format much faster than in ASCII format
+        eqCacheDir = outDir if args.eqCache[0] is None else abspath(args.eqCache[0])
+        try:
+            netcdfFile = netcdfWout(eqInUse, eqCacheDir)
+        except IOError as err:
+            messagePrinter('{} The original file will be used.'.format(err))
+        else:
+            if netcdfFile != eqInUse:
+                messagePrinter('The netCDF version of {} in {} will be used.'.format(eqInUse, netcdfFile))
+                logString += '\tnetCDF version of {} is in {}\n'.format(eqInUse, netcdfFile)
+                eqInUse = netcdfFile
+
+    if args.reduceEq and not eqInUse.endswith('.bc'): # SFINCS only loads the modes that reach <minBmn>, so the others can be left out of the file
+        reducedFile = join(outDir, 'reduced_' + basename(eqInUse))
+        psiNRange = [args.minRad[0], args.maxRad[0]] if args.radialVar[0] == 1 else ([args.minRad[0] ** 2, args.maxRad[0] ** 2] if args.radialVar[0] == 3 else [0, 1])
+        try:
+            numKept, numModes = reduceWout(eqInUse, reducedFile, psiNRange, minBmn=args.minBmn[0], Nyquist=args.Nyquist[0])
+        except IOError as err:
+            messagePrinter('{} The original file will be used.'.format(err))
+        else:
+            testPsiN = np.mean(psiNRange)
+            if reducedWoutError(eqInUse, reducedFile, testPsiN, minBmn=args.minBmn[0], Nyquist=args.Nyquist[0]) != 0:
+                raise IOError('The reduced equilibrium file {} does not match {} at psiN = {}.'.format(reducedFile, eqInUse, testPsiN))
+            messagePrinter('{} of {} Fourier modes were kept in the reduced equilibrium file {}.'.format(numKept, numModes, reducedFile))
+            logString += '\t{} (with {} of {} Fourier modes)'.format(basename(reducedFile), numKept, numModes) + appendor
+            eqInUse = reducedFile
+
     if not args.noNamelist:
         writeNamelist.run(profilesInUse, outDir, eqInUse, bcSymUse)
         logString += '\tinput.namelist' + appendor
@@ -71,8 +101,46 @@ for i in range(maxLen):
             cmd.append('arbitraryCommandLineArg')
             userConf = 'without'
 
-        run(cmd, cwd=outDir)
-        logString += '\tsfincsScan attempted to run {} user confirmation\n'.format(userConf)
+        radialVarName = radialVarDict()[args.radialVar[0]]
+        if args.adaptiveSurf:
+            surfFile = join(outDir, 'calcSurfaces.txt')
+            if not isfile(surfFile):
+                raise IOError('No calcSurfaces.txt file was found in {}. Please run this script again without <noProfiles>.'.format(outDir))
+            calcSurfs = np.loadtxt(surfFile, ndmin=1)
+        else:
+            calcSurfs = np.linspace(args.minRad[0], args.maxRad[0], num=args.numCalcSurf[0])
+
+        if args.prevCampaign[0] is not None: # Only the flux surfaces whose inputs have changed are run again
+            prevDir = abspath(args.prevCampaign[0])
+            try:
+                surfaces = compareSurfaces(prevDir, outDir, eqInUse, calcSurfs, radialVarName, args.changeTol[0], minBmn=args.minBmn[0], Nyquist=args.Nyquist[0])
+            except IOError as err:
+                messagePrinter('The inputs could not be compared with those in {} ({}), so every flux surface will be run.'.format(prevDir, err))
+                surfaces = [{'radVal':calcSurf, 'prevRadDir':None, 'geometryChange':np.nan, 'profilesChange':np.nan, 'changed':True} for calcSurf in calcSurfs]
+            reportLines = []
+            for surface in surfaces:
+                if not surface['changed']:
+                    copytree(surface['prevRadDir'], join(outDir, basename(surface['prevRadDir'])), symlinks=True, dirs_exist_ok=True)
+                reportLines.append('{} {} {} {}'.format(surface['radVal'], surface['geometryChange'], surface['profilesChange'], int(surface['changed'])))
+            writeFile(join(outDir, 'rerunSurfaces.txt'), '# {} geometryChange profilesChange rerun\n'.format(radialVarName) + '\n'.join(reportLines) + '\n', silent=True)
+            calcSurfs = np.array([surface['radVal'] for surface in surfaces if surface['changed']])
+            messagePrinter('{} of {} flux surfaces will be run again. The results for the others were copied from {}.'.format(len(calcSurfs), len(surfaces), prevDir))
+            logString += '\tthe results for {} unchanged flux surfaces were copied from {}\n'.format(len(surfaces) - len(calcSurfs), prevDir)
+
+        if not args.adaptiveSurf and args.prevCampaign[0] is None:
+            run(cmd, cwd=outDir)
+            logString += '\tsfincsScan attempted to run {} user confirmation\n'.format(userConf)
+        else: # sfincsScan can only space the flux surfaces evenly, so give it one surface at a time
+            namelistFile = join(outDir, 'input.namelist')
+            with open(namelistFile, 'r') as f:
+                origNamelist = f.read()
+            try:
+                for calcSurf in calcSurfs:
+                    setRadialScan(namelistFile, radialVarName, calcSurf, calcSurf, 1)
+                    run(cmd, cwd=outDir)
+            finally:
+                writeFile(namelistFile, origNamelist)
+            logString += '\tsfincsScan attempted to run {} user confirmation for each of {} individually placed flux surfaces\n'.format(userConf, len(calcSurfs))
     
     # Save a timestamp file if appropriate
     logString += 'at this time:\n\t'
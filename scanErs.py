@@ -0,0 +1,119 @@
+# This script creates electric field scans on every flux surface of a SFINCS directory, like the <numErSubscan> option of run.py, except that the electric field values
+# are not equally spaced. Instead, they are clustered around zero electric field (where the radial current has a thin spike that needs dense sampling) and around the
+# roots that are expected on each flux surface. The expected roots can be taken from the results of chooseErs.py for a previous campaign (on a similar configuration,
+# for instance) with <prevRoots>, or they can be given directly with <priorRoots>. Some runs are always spread uniformly over the whole range, so nothing is missed if
+# the expectations are wrong. The flux surface subdirectories should be set up beforehand (by run.py, typically with <numErSubscan> = 0). Each one must contain an
+# input.namelist and a job.sfincsScan file, either directly or in an existing electric field subdirectory. These are used as templates for the new runs. Existing
+# runs are never overwritten. Once the runs have finished, chooseErs.py can be used as usual.
+
+# Load necessary modules
+from os.path import dirname, abspath, join, basename, isfile
+from os import scandir
+from inspect import getfile, currentframe
+import sys
+import numpy as np
+
+thisDir = dirname(abspath(getfile(currentframe())))
+sys.path.append(join(thisDir, 'src/'))
+from dataProc import clusteredPoints, unitFactor
+from IO import getFileInfo, getScanErsArgs, messagePrinter, parseNamelist, saveTimeStampFile
+from jobControl import findRadialDirs
+from resultCache import registerCampaign
+from rootFinding import predictRoots
+from sfincsOutputLib import materializeRuns, submitRuns
+
+# Get arguments
+args = getScanErsArgs()
+
+# Locally useful functions
+def findTemplate(radDir):
+    if isfile(join(radDir, 'input.namelist')) and isfile(join(radDir, 'job.sfincsScan')):
+        return radDir
+    for entry in sorted(scandir(radDir), key=lambda entry: entry.name):
+        if entry.is_dir() and isfile(join(entry.path, 'input.namelist')) and isfile(join(entry.path, 'job.sfincsScan')):
+            return entry.path
+    return None
+
+def findErQuantity(namelistFile):
+    ErQuantities = {name.lower():name for name in ['Er', 'dPhiHatdpsiHat', 'dPhiHatdpsiN', 'dPhiHatdrHat', 'dPhiHatdrN']}
+    for entry in parseNamelist(namelistFile):
+        if entry['group'] == 'physicsparameters' and entry['name'] is not None and entry['name'].lower() in ErQuantities:
+            return ErQuantities[entry['name'].lower()]
+    raise IOError('The electric field variable could not be found in {}.'.format(namelistFile))
+
+# Sort out directories
+_, _, _, inDir, _ = getFileInfo('/arbitrary/path', args.sfincsDir[0], 'arbitrary')
+radDirs, radVals = findRadialDirs(inDir, excludeDir=join(inDir, 'determineEr'))
+radDirs = [radDir for radDir, radVal in zip(radDirs, radVals) if not np.isnan(radVal)]
+radVals = [radVal for radVal in radVals if not np.isnan(radVal)]
+
+if len(radDirs) == 0:
+    raise IOError('No flux surface subdirectories were found in {}.'.format(inDir))
+
+# Find the template run and the electric field variable of each flux surface
+templateDirs = [findTemplate(radDir) for radDir in radDirs]
+ErQuantities = [findErQuantity(join(templateDir, 'input.namelist')) if templateDir is not None else None for templateDir in templateDirs]
+
+# Find the roots expected on each flux surface. They are in the physical units of the electric field variable, so it must match the one used for them.
+radLabel = basename(radDirs[0]).split('_')[0]
+expectedRoots = [np.array([]) for _ in radDirs]
+if args.prevRoots[0] is not None:
+    _, _, _, prevDir, _ = getFileInfo('/arbitrary/path', args.prevRoots[0], 'arbitrary')
+    for ErQuantity in sorted(set(ErQuantities) - {None}):
+        inds = [ind for ind, quantity in enumerate(ErQuantities) if quantity == ErQuantity]
+        predictions = predictRoots(prevDir, [radVals[ind] for ind in inds], radLabel=radLabel, ErLabel=ErQuantity) # In physical units
+        for ind, prediction in zip(inds, predictions):
+            expectedRoots[ind] = prediction
+
+# Place the runs
+span = args.maxEr[0] - args.minEr[0]
+plans = []
+for radDir, radVal, prevRoots, templateDir, ErQuantity in zip(radDirs, radVals, expectedRoots, templateDirs, ErQuantities):
+
+    if templateDir is None:
+        messagePrinter('No input.namelist and job.sfincsScan files were found in {}, so this flux surface will be skipped.'.format(radDir))
+        continue
+
+    roots = np.append(prevRoots / unitFactor(ErQuantity), args.priorRoots)
+    roots = np.unique(roots[np.logical_and(roots > args.minEr[0], roots < args.maxEr[0])])
+
+    centers = list(roots)
+    widths = [args.rootWidth[0] * span] * roots.size
+    weights = [args.rootWeight[0] / max(roots.size, 1)] * roots.size # With no expected roots, their share goes to the uniform runs
+    zeroInRange = args.minEr[0] <= 0 <= args.maxEr[0]
+    if zeroInRange:
+        centers.append(0)
+        widths.append(args.zeroWidth[0] * span)
+        weights.append(args.zeroWeight[0])
+
+    Ers = clusteredPoints(args.numErs[0], args.minEr[0], args.maxEr[0], centers, widths, weights)
+    if zeroInRange: # chooseErs.py needs a run at zero electric field
+        Ers[np.argmin(np.abs(Ers))] = 0.0
+    Ers = np.unique([float('{:.4g}'.format(Er)) for Er in Ers]) # Keeps the directory names readable
+
+    for Er in Ers:
+        plans.append({'radius':radVal, 'radLabel':radLabel, 'ErQuantity':ErQuantity, 'Er':Er, 'templateDir':templateDir,
+                      'jobFile':join(templateDir, 'job.sfincsScan'), 'runDir':join(radDir, ErQuantity + '{}'.format(Er))})
+
+    msg = 'For {} = {}, runs will be placed at {} = {}'.format(radLabel, radVal, ErQuantity, Ers)
+    if roots.size != 0:
+        msg += ', clustered around the expected roots at {}'.format(roots)
+    messagePrinter(msg + '.')
+
+# Create the runs and submit them together
+runDirs = materializeRuns(plans)
+if len(runDirs) != len(plans):
+    messagePrinter('{} of the planned runs already existed, so they were left alone.'.format(len(plans) - len(runDirs)))
+
+# Add the finished runs to the result cache
+registerCampaign(args.resultCache[0], inDir)
+
+if not args.noRun:
+    _ = submitRuns(runDirs, launchCommand=args.launchCommand[0], arrayDir=inDir, cacheFile=args.resultCache[0])
+
+# Write a log file
+logStr = 'Non-uniform electric field scans were set up in this directory by scanErs.py on:\n'
+saveTimeStampFile(inDir, 'automatedErScanLog', logStr)
+
+# Closing message
+messagePrinter('{} electric field runs were set up in {}.'.format(len(runDirs), inDir))
@@ -0,0 +1,73 @@
+# This script sets up monoenergetic SFINCS runs (RHSMode = 3) on every flux surface of a SFINCS directory, on a grid of normalized collisionality (nuPrime)
+# and normalized radial electric field (EStar). The flux surface subdirectories should be set up beforehand by run.py with <RHSMode> = 3. Each one must contain
+# an input.namelist and a job.sfincsScan file, which are used as templates for the new runs. Existing runs are never overwritten. Once the runs have finished,
+# monoenergeticErs.py can turn them into a database and use it to find the ambipolar electric field for any set of profiles.
+
+# Load necessary modules
+from os.path import dirname, abspath, join, isdir, isfile
+from os import makedirs
+from shutil import copyfile
+from inspect import getfile, currentframe
+import sys
+import numpy as np
+
+thisDir = dirname(abspath(getfile(currentframe())))
+sys.path.append(join(thisDir, 'src/'))
+from IO import getFileInfo, getScanMonoenergeticArgs, messagePrinter, namelistText, namelistValue, parseNamelist, patchParsedNamelist, saveTimeStampFile, writeFile
+from jobControl import findRadialDirs
+from resultCache import registerCampaign
+from sfincsOutputLib import submitRuns
+
+# Get arguments
+args = getScanMonoenergeticArgs()
+
+# Locally useful functions
+def findRHSMode(parsed):
+    RHSMode = namelistValue(parsed, 'RHSMode', group='general')
+    return 1 if RHSMode is None else int(RHSMode) # 1 is the SFINCS default
+
+# Sort out directories
+_, _, _, inDir, _ = getFileInfo('/arbitrary/path', args.sfincsDir[0], 'arbitrary')
+radDirs, radVals = findRadialDirs(inDir, excludeDir=join(inDir, 'determineErMono'))
+radDirs = [radDir for radDir, radVal in zip(radDirs, radVals) if not np.isnan(radVal)]
+
+if len(radDirs) == 0:
+    raise IOError('No flux surface subdirectories were found in {}.'.format(inDir))
+
+# Create the runs
+nuPrimes = np.unique([float('{:.4g}'.format(nuPrime)) for nuPrime in np.geomspace(args.nuPrimes[0], args.nuPrimes[1], num=args.numNuPrimes[0])]) # Keeps the directory names readable
+EStars = np.unique(args.EStars)
+runDirs = []
+for radDir in radDirs:
+
+    if not isfile(join(radDir, 'input.namelist')) or not isfile(join(radDir, 'job.sfincsScan')):
+        messagePrinter('No input.namelist and job.sfincsScan files were found in {}, so this flux surface will be skipped.'.format(radDir))
+        continue
+    parsed = parseNamelist(join(radDir, 'input.namelist'))
+    if findRHSMode(parsed) != 3:
+        raise IOError('The input.namelist file in {} does not use RHSMode = 3. Please set up {} with the <RHSMode> option of run.py.'.format(radDir, inDir))
+
+    for nuPrime in nuPrimes:
+        for EStar in EStars:
+            runDir = join(radDir, 'nuPrime{}_EStar{}'.format(nuPrime, EStar))
+            if isdir(runDir): # Never overwrite existing runs
+                continue
+            makedirs(runDir)
+            copyfile(join(radDir, 'job.sfincsScan'), join(runDir, 'job.sfincsScan'))
+            newParsed = patchParsedNamelist(parsed, {'physicsParameters':{'nuPrime':nuPrime, 'EStar':EStar}})
+            writeFile(join(runDir, 'input.namelist'), namelistText(newParsed), silent=True)
+            runDirs.append(runDir)
+
+messagePrinter('Runs were set up at nuPrime = {} and EStar = {} on each flux surface (where they did not exist already).'.format(nuPrimes, EStars))
+# Add the finished runs to the result cache
+registerCampaign(args.resultCache[0], inDir)
+
+if not args.noRun and len(runDirs) != 0:
+    _ = submitRuns(runDirs, launchCommand=args.launchCommand[0], arrayDir=inDir, cacheFile=args.resultCache[0])
+
+# Write a log file
+logStr = 'Monoenergetic runs were set up in this directory by scanMonoenergetic.py on:\n'
+saveTimeStampFile(inDir, 'automatedMonoenergeticScanLog', logStr)
+
+# Closing message
+messagePrinter('{} monoenergetic runs were set up in {}.'.format(len(runDirs), inDir))
@@ -10,6 +10,7 @@ def getRunArgs():
     '''
 
     import argparse
+    from os.path import isfile, isdir
     
     parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
     parser.add_argument('--profilesIn', type=str, nargs='*', required=True, help='File(s) with relevant profiles written as in STELLOPT, with path(s) if necessary. This script currently reads the BEAMS3D section of STELLOPT namelist files. Note that you must specify densities rather than Zeff. If you input multiple files, order matters!')
@@ -17,14 +18,21 @@ def getRunArgs():
     parser.add_argument('--bcSymmetry', type=str, nargs='*', required=False, default=['sym'], help='If one or more *.bc files are input via <eqIn>, this setting will control whether SFINCS assumes them to be stellarator-symmetric ("sym") or stellarator-asymmetric ("asym"). If one argument is specified, it will be used for all the <eqIn> files. Note that the length of this argument must be either 1 or equivalent to the length of <eqIn>, even if <eqIn> contains a mix of *.bc and VMEC wout files.')
     parser.add_argument('--minBmn', type=float, nargs=1, required=False, default=[0.0], help='Only Fourier modes of at least this size will be loaded from the <eqIn> file(s).')
     parser.add_argument('--Nyquist', type=int, nargs=1, required=False, default=[2], help='This parameter is only relevant if you are loading VMEC equilibria: include the larger poloidal and toroidal mode numbers in the xm_nyq and xn_nyq arrays, where available, if this parameter is set to 2, and exclude these mode numbers if this parameter is set to 1.')
+    parser.add_argument('--eqCache', type=str, nargs=1, required=False, default=[None], help='Directory in which VMEC wout files in ASCII format from <eqIn> are stored after they are converted to netCDF format, which SFINCS and the Python scripts can read much faster. SFINCS is then given the converted file. The converted files are named after a hash of the contents of the original files, so each file is only converted once, and the same directory can be shared between campaigns. Defaults to the save location.')
+    parser.add_argument('--reduceEq', action='store_true', default=False, help='Write a reduced copy of each VMEC wout file (in netCDF format) from <eqIn> to the save location, and have SFINCS load it instead of the original. The reduced file only contains the Fourier modes of the magnetic field strength (and of the other quantities expanded in the xm_nyq and xn_nyq modes) that reach <minBmn> on some flux surface between <minRad> and <maxRad>, which can make it much smaller, so that every SFINCS job reads less from the shared filesystem. The reduced file is checked against the original on a test flux surface before it is used. The original file is used if it is not a VMEC wout file.')
     parser.add_argument('--numInterpSurf', type=int, nargs=1, required=False, default=[1000], help='Number of radial surfaces on which to calculate and write interpolated profile data. This number should be quite large.')
     parser.add_argument('--radialVar', type=int, nargs=1, required=False, default=[3], help='ID of the radial coordinate used in the input.namelist file to specify which surfaces should be scanned over. Valid entries are: 0 = psiHat, 1 = psiN (which is the STELLOPT "s"), 2 = rHat, and 3 = rN (which is the STELLOPT "rho")')
     parser.add_argument('--radialGradientVar', type=int, nargs=1, required=False, default=[4], help='ID of the radial coordinate used to take derivatives. Relevant for the generalEr_* parameters in the profiles file and specifying the density and temperature derivatives on a single flux suface. Valid entries are: 0 = psiHat, 1 = psiN (which is the STELLOPT "s"), 2 = rHat, 3 = rN (which is the STELLOPT "rho"), and 4 = rHat (like option 2, except that Er is used in place of dPhiHatdrHat). The default is recommended.')
     parser.add_argument('--numCalcSurf', type=int, nargs=1, required=False, default=[16], help='Number of radial surfaces on which to perform full SFINCS calculations.')
+    parser.add_argument('--adaptiveSurf', action='store_true', default=False, help='Instead of spacing the <numCalcSurf> flux surfaces evenly between <minRad> and <maxRad>, place them where the (interpolated) profiles change the fastest, using their gradients and curvatures with respect to <radialVar>. The chosen surfaces are saved in calcSurfaces.txt next to the profiles file, and sfincsScan is called once for each of them. This only works if <radialVar> is 1 (psiN) or 3 (rN), and it cannot be used with <resScan>.')
+    parser.add_argument('--adaptiveUniformFrac', type=float, nargs=1, required=False, default=[0.3], help='If <adaptiveSurf> is used, fraction of the flux surfaces that are spread evenly regardless of the profiles. This keeps flat regions from being left out entirely.')
+    parser.add_argument('--adaptiveCurvWeight', type=float, nargs=1, required=False, default=[0.5], help='If <adaptiveSurf> is used, importance of the curvature of the profiles relative to their gradients when placing the flux surfaces.')
     parser.add_argument('--minRad', type=float, nargs=1, required=False, default=[0.15], help='Lower bound for the radial scan. If <resScan> is used, the flux surface specified by this parameter will be used for the convergence scan. Note that VMEC has resolution issues near the magnetic axis and SFINCS often converges much slower there due to the relatively low collisionality, so setting <minRad> to be very small may cause problems. If the innermost surface of a loaded equilibrium is outside <minRad>, SFINCS will give nonphysical (usually divergent) answers.')
     parser.add_argument('--maxRad', type=float, nargs=1, required=False, default=[0.95], help='Upper bound for the radial scan.')
     parser.add_argument('--driftScheme', type=int, nargs=1, required=False, default=[0], help='Specifies the scheme with which to calculate the poloidal and toroidal magnetic drifts. Valid inputs are the integers 0-9. With the default, no angular drifts are calculated. Any other setting is incompatible with <includePhi1> and <ambiSolve>. For explanations of the physical models used by the other settings, see the SFINCS documentation.')
     parser.add_argument('--includePhi1', action='store_true', default=False, help='Have SFINCS calculate the angular variation of the electric potential within flux surfaces. Note that this is incompatible with <driftScheme> > 0 and <ambiSolve>.')
+    parser.add_argument('--RHSMode', type=int, nargs=1, required=False, default=[1], help='Type of SFINCS calculation. With 1, the fluxes are calculated for the given gradients. With 2, SFINCS calculates the transport matrix of a single species (see <matrixSpecies>), which transportMatrix.py (in src/) can use afterwards to evaluate the fluxes and flows for any density and temperature gradients without new runs. Note that the transport matrix still depends on the electric field, so an electric field scan (<numErSubscan>) is usually still needed. With 3, SFINCS calculates monoenergetic transport coefficients. These runs are meant to be set up with <numErSubscan> = 0 and then spread over a grid of collisionality and electric field by scanMonoenergetic.py. Values other than 1 are incompatible with <includePhi1> and <ambiSolve>.')
+    parser.add_argument('--matrixSpecies', type=int, nargs=1, required=False, default=[1], help='Species (counting from 1, where species 1 is the species set by <assumedSpeciesMass> and <assumedSpeciesCharge>, and the others follow the order in <profilesIn>) whose transport matrix is calculated if <RHSMode> is 2. The other species are left out of the calculation, as SFINCS requires.')
     parser.add_argument('--ambiSolve', action='store_true', default=False, help='Enable ambipolarSolve. SFINCS will start from a "seed" value of Er specified using other commands and attempt to modify it such that the radial current is driven to zero (which is what we would expect in a real device). Note that ambipolarSolve searches for *a* root, but it might not find the *correct* root. The script chooseErs.py can help with that.')
     parser.add_argument('--maxRootJr', type=float, nargs=1, required=False, default=[1.0e-12], help='Maximum radial current (defined as in SFINCS) that may be present for a given electric field value to be considered a "root". The default is recommended.')
     parser.add_argument('--loadPot', action='store_true', default=False, help='Load a potential from <profilesIn>. This will overwrite <seedEr>. If you use this option, you must set <numErSubscan> >=1 and <radialGradientVar> = 1. The former requirement ensures the software knows whether or not you wish to use the given potential alone or a range around it, and the latter requirement is required because STELLOPT always specifies the potential profile in terms of "s".')
@@ -32,6 +40,10 @@ def getRunArgs():
     parser.add_argument('--numErSubscan', type=int, nargs=1, required=False, default=[0], help='Number of radial electric field scans to perform within each radial directory. This parameter generates equidistant radial electric field seed values between <minSeedEr> and <maxSeedEr>. This parameter will be overwritten if <resScan> is activated.')
     parser.add_argument('--minSeedEr', type=float, nargs=1, required=False, default=[-5], help='If <loadPot> is used, this value will be added to the values of the loaded potential to determine the minimum seed value of the radial electric field on each flux surface in units of <radialGradientVar>. (Note that for typicaly usage, this value should probably be negative.) If <loadPot> is not used, this parameter gives the mimimum seed value of the radial electric field in units of <radialGradientVar>. You may need to change this parameter to get good results.')
     parser.add_argument('--maxSeedEr', type=float, nargs=1, required=False, default=[5], help='If <loadPot> is used, this value will be added to the values of the loaded potential to determine the maximum seed value of the radial electric field on each flux surface in units of <radialGradientVar>. (Note that for typicaly usage, this value should probably be positive.) If <loadPot> is not used, this parameter gives the maximum seed value of the radial electric field in units of <radialGradientVar>. You may need to change this parameter to get good results.')
+    parser.add_argument('--prevErDir', type=str, nargs=1, required=False, default=[None], help='Output directory of chooseErs.py (typically determineEr/) from a previous campaign on a similar configuration, with path if necessary. If this is given, the roots found in that campaign are interpolated to the new flux surfaces, and the electric field scan (see <numErSubscan>) on each surface only covers the predicted roots plus <prevErWidth> on either side, instead of the range from <minSeedEr> to <maxSeedEr>. With <ambiSolve>, the runs in these windows act as seeds close to the expected roots. The <*SeedEr> range is still used on surfaces for which no roots could be predicted. The previous campaign must have used psiN or rN for its radial subdirectories and the same <radialGradientVar>. Because chooseErs.py needs a run near zero electric field on every flux surface, this option is mainly intended for use with <ambiSolve> (or with a <prevErWidth> large enough to include zero).')
+    parser.add_argument('--prevErWidth', type=float, nargs=1, required=False, default=[1.0], help='If <prevErDir> is used, distance (in units of <radialGradientVar>) that the electric field window extends beyond the outermost predicted roots on each flux surface.')
+    parser.add_argument('--prevCampaign', type=str, nargs=1, required=False, default=[None], help='Top directory of a previous campaign (set up by this script and already run), with path if necessary. If this is given, the magnetic geometry (the Fourier modes of the magnetic field strength of at least <minBmn>, and the rotational transform) and the local densities, temperatures, and their gradients on each flux surface are compared with those of the previous campaign. Only the flux surfaces whose inputs changed by more than <changeTol> are run again. The flux surface directories of the previous campaign are copied into the new one for the other surfaces. Every flux surface is run again if the other namelist parameters differ, or if either equilibrium is not a VMEC wout file. This only works if <radialVar> is 1 (psiN) or 3 (rN), and it cannot be used with <resScan>.')
+    parser.add_argument('--changeTol', type=float, nargs=1, required=False, default=[0.01], help='If <prevCampaign> is used, largest relative change in the inputs of a flux surface for which the results of the previous campaign are kept. The changes in the Fourier modes of the magnetic field strength are measured relative to the (0,0) mode, and the changes in the gradients relative to the new densities and temperatures.')
     parser.add_argument('--minSolverEr', type=float, nargs=1, required=False, default=[-100], help='Explicitly set the minimum Er (=-dPhiHatdrHat, regardless of <radialGradientVar>) available to ambipolarSolve. This will seldom need to be modified. It is included because the Newton method used by ambipolarSolve can sometimes "get lost" if it is seeded poorly and specify progressively larger |Er| values during the root search. Setting this parameter and <maxSolverEr> closer to the electric field seed value would make the runs fail faster in such situations and therefore save time.')
     parser.add_argument('--maxSolverEr', type=float, nargs=1, required=False, default=[100], help='Explicitly set the maximum Er (=-dPhiHatdrHat, regardless of <radialGradientVar>) available to ambipolarSolve. This will seldom need to be modified. It is included because the Newton method used by ambipolarSolve can sometimes "get lost" if it is seeded poorly and specify progressively larger |Er| values during the root search. Setting this parameter and <minSolverEr> closer to the electric field seed value would make the runs fail faster in such situations and therefore save time.')
     parser.add_argument('--resScan', action='store_true', default=False, help='Triggers a SFINCS resolution scan run.')
@@ -49,6 +61,7 @@ def getRunArgs():
     parser.add_argument('--NxiScan', type=float, nargs=2, required=False, default=[0.5, 1.5], help='Two floats, which are (in order) the minimum and maximum multipliers on the value of Nxi that will be used if a resolution scan is run. Set both values to zero to not scan this parameter.')
     parser.add_argument('--Nx', type=int, nargs=1, required=False, default=[7], help='Number of grid points in energy used to represent the distribution function.')
     parser.add_argument('--NxScan', type=float, nargs=2, required=False, default=[0.5, 1.5], help='Two floats, which are (in order) the minimum and maximum multipliers on the value of Nx that will be used if a resolution scan is run. Set both values to zero to not scan this parameter.')
+    parser.add_argument('--coarseFactor', type=float, nargs=1, required=False, default=[1.0], help='Multiplier (at most 1) applied to <Ntheta>, <Nzeta>, <Nxi>, and <Nx> for every run in this campaign. The full resolution is recorded in comments ("!fine" lines) in the input.namelist file. This is intended for electric field scans in which most runs only need to bracket the roots of the radial current: once chooseErs.py has bracketed the roots of a flux surface in the coarse campaign, its <refine> option sets up full-resolution runs only near those roots. Ntheta and Nzeta are kept odd.')
     parser.add_argument('--NL', type=int, nargs=1, required=False, default=[4], help='Number of Legendre polynomials used to represent the Rosenbluth potentials. Increasing this hardly changes the results, so it can almost certainly be left alone.')
     parser.add_argument('--NLScan', type=float, nargs=2, required=False, default=[0.5, 1.5], help='Two floats, which are (in order) the minimum and maximum multipliers on the value of NL that will be used if a resolution scan is run. Set both values to zero to not scan this parameter.')
     parser.add_argument('--solverTol', type=float, nargs=1, required=False, default=[1e-6], help='Tolerance used to define convergence of the iterative (Krylov) solver.')
@@ -57,8 +70,11 @@ def getRunArgs():
     parser.add_argument('--nNodes', type=int, nargs=1, required=False, default=[None], help='Total number of nodes to use for each SFINCS run. If you do not use <noRun>, you must specify at least one of <nNodes> and <nTasks>.')
     parser.add_argument('--nTasksPerNode', type=int, nargs=1, required=False, default=[None], help='Number of MPI tasks to use on each node for each SFINCS run. This parameter should only be used if <nNodes> is specified and should not be used with <nTasks>.')
     parser.add_argument('--nTasks', type=int, nargs=1, required=False, default=[None], help='Total number of MPI tasks to use for each SFINCS run. If you do not use <noRun>, you must specify at least one of <nNodes> and <nTasks>.')
-    parser.add_argument('--mem', type=int, nargs=1, required=False, default=[None], help='Total amount of memory (MB) allocated for each SFINCS run.')
-    parser.add_argument('--time', type=str, nargs=1, required=False, default=['00-06:00:00'], help='Wall clock time limit for the batch runs. Format is DD-HH:MM:SS. Note that SFINCS typically has the most trouble converging near the magnetic axis (due to the lower collisionality there cause by peaked temperature profiles), so you may need to increase <time> for runs near the axis.')
+    parser.add_argument('--mem', type=int, nargs=1, required=False, default=[None], help='Total amount of memory (MB) allocated for each SFINCS run. This will be split evenly between the nodes used for the run, and it may increase the number of nodes requested if one node of the machine (see <machine>) cannot hold it.')
+    parser.add_argument('--machine', type=str, nargs=1, required=False, default=[None], help='Name of the cluster on which SFINCS will be run. This must be an entry in <machineFile>, which specifies the modules to load, the number of cores and amount of memory per node, the partition limits, and the launcher command. Defaults to the value of the "MACHINE" environment variable.')
+    parser.add_argument('--machineFile', type=str, nargs=1, required=False, default=[None], help='JSON file containing the machine registry. Defaults to src/machines.json in this repository. Copy and modify that file to add new clusters.')
+    parser.add_argument('--stageInputs', type=str, nargs=1, required=False, default=['none'], choices=['none', 'copy', 'sbcast'], help='How each SFINCS job reads the equilibrium file, which is the only file that every job in a campaign reads at run time. With "none", it is read from where it is. With "copy", it is copied once per node into $TMPDIR/sfincsStage (or /tmp/sfincsStage), and a lock makes jobs that share a node wait for the first copy instead of copying it again. The last job on a node to finish removes the copy. A job that is killed without cleaning up (after a node failure, for instance) leaves a hard link to the copy there, so $TMPDIR should be cleaned by the system or be specific to each job. With "sbcast", Slurm broadcasts it to every node of the job, and it is removed at the end. With either of the latter, the equilibriumFile path in input.namelist is pointed at the node-local copy while SFINCS runs and restored afterwards (or at the start of the next job in that directory, if the job was killed first). SFINCS only writes to its own run directory, so nothing needs to be copied back. The array jobs that the other scripts submit use the same job file, so they stage the file in the same way.')
+    parser.add_argument('--time', type=str, nargs=1, required=False, default=['00-06:00:00'], help='Wall clock time limit for the batch runs. Format is DD-HH:MM:SS (other formats accepted by Slurm, such as HH:MM:SS, also work). Note that SFINCS typically has the most trouble converging near the magnetic axis (due to the lower collisionality there cause by peaked temperature profiles), so you may need to increase <time> for runs near the axis.')
     parser.add_argument('--noProfiles', action='store_true', default=False, help='Do not write a profiles file.')
     parser.add_argument('--noNamelist', action='store_true', default=False, help='Do not write an input.namelist file.')
     parser.add_argument('--noBatch', action='store_true', default=False, help='Do not write a job.sfincsScan file.')
@@ -82,12 +98,54 @@ def getRunArgs():
     if [args.driftScheme[0] > 0, args.includePhi1, args.ambiSolve].count(True) > 1:
         raise IOError('You may do at most one of the following things for a given SFINCS run: set <driftScheme> > 0, turn on <includePhi1>, or turn on <ambiSolve>.')
 
+    if args.RHSMode[0] not in [1,2,3]:
+        raise IOError('<RHSMode> must be 1, 2, or 3.')
+
+    if args.RHSMode[0] == 3 and (args.numErSubscan[0] != 0 or args.resScan):
+        raise IOError('<RHSMode> = 3 is incompatible with <numErSubscan> and <resScan>. Please use scanMonoenergetic.py to set up the monoenergetic runs.')
+
+    if args.RHSMode[0] != 1 and (args.includePhi1 or args.ambiSolve):
+        raise IOError('<RHSMode> = {} is incompatible with <includePhi1> and <ambiSolve>.'.format(args.RHSMode[0]))
+
+    if args.matrixSpecies[0] < 1:
+        raise IOError('<matrixSpecies> must be at least 1.')
+
     if args.loadPot:
         if args.numErSubscan[0] < 1:
             raise IOError('If you activate <loadPot>, you must have <numErSubscan> >= 1.')
         if args.radialGradientVar[0] != 1:
             raise IOError('If you activate <loadPot>, you must specify <radialGradientVar> = 1.')
 
+    if args.adaptiveSurf:
+        if args.radialVar[0] not in [1,3]:
+            raise IOError('<adaptiveSurf> can only be used if <radialVar> is 1 (psiN) or 3 (rN).')
+        if args.resScan:
+            raise IOError('<adaptiveSurf> cannot be used with <resScan>.')
+        if not 0 <= args.adaptiveUniformFrac[0] <= 1:
+            raise IOError('<adaptiveUniformFrac> must be between 0 and 1.')
+        if args.adaptiveCurvWeight[0] < 0:
+            raise IOError('<adaptiveCurvWeight> cannot be negative.')
+
+    if args.prevErDir[0] is not None:
+        if not isdir(args.prevErDir[0]):
+            raise IOError('The <prevErDir> directory {} does not exist.'.format(args.prevErDir[0]))
+        if args.numErSubscan[0] < 1:
+            raise IOError('If you use <prevErDir>, you must have <numErSubscan> >= 1.')
+        if args.loadPot:
+            raise IOError('<prevErDir> and <loadPot> cannot be used together.')
+        if args.prevErWidth[0] < 0:
+            raise IOError('<prevErWidth> cannot be negative.')
+
+    if args.prevCampaign[0] is not None:
+        if not isdir(args.prevCampaign[0]):
+            raise IOError('The <prevCampaign> directory {} does not exist.'.format(args.prevCampaign[0]))
+        if args.radialVar[0] not in [1,3]:
+            raise IOError('<prevCampaign> can only be used if <radialVar> is 1 (psiN) or 3 (rN).')
+        if args.resScan:
+            raise IOError('<prevCampaign> cannot be used with <resScan>.')
+        if args.changeTol[0] < 0:
+            raise IOError('<changeTol> cannot be negative.')
+
     if args.minSeedEr[0] > args.maxSeedEr[0]:
         raise IOError('<minSeedEr> must be less than or equal to <maxSeedEr>.')
 
@@ -118,6 +176,12 @@ def getRunArgs():
 
     if args.Nzeta[0]%2 == 0:
         raise IOError('<Nzeta> should be odd.')
+
+    if not 0 < args.coarseFactor[0] <= 1:
+        raise IOError('<coarseFactor> must be greater than 0 and at most 1.')
+
+    if args.resScan and args.coarseFactor[0] != 1:
+        raise IOError('<coarseFactor> cannot be used with <resScan>.')
     
     if args.Ntheta[0]%2 == 0:
         raise IOError('<Ntheta> should be odd.')
@@ -139,26 +203,14 @@ def getRunArgs():
         if args.nTasks[0] is not None and args.nTasksPerNode[0] is not None:
             raise IOError('You cannot specify both <nTasks> and <nTasksPerNode>.')
 
-    strippedTime = args.time[0].strip()
-    timeDaySplit = strippedTime.split('-')
-    
-    assert len(timeDaySplit) == 2, 'There appears to be more than one "-" character in the <time> input.'
-
-    try:
-        int(timeDaySplit[0])
-    except ValueError:
-        raise IOError('It appears that the "days" portion of the <time> input is incorrect.')
-
-    timeHourSplit = timeDaySplit[-1].split(':')
-
-    try:
-        _ = [int(elem) for elem in timeHourSplit]
-    except ValueError:
-        raise IOError('It appears that at least one of the "hours", "minutes", or "seconds" portions of the <time> input is incorrect.')
+    _ = timeToSeconds(args.time[0]) # Raises an IOError if <time> is not in a format that Slurm accepts
 
     if args.notifs[0].lower() not in ['bad', 'all', 'none']:
         raise IOError('Invalid option specified for <notifs>. Valid options are "bad", "all", and "none".')
 
+    if args.machineFile[0] is not None and not isfile(args.machineFile[0]):
+        raise IOError('The input given in <machineFile> must be a file.')
+
     return args
 
 def getPlotArgs():
@@ -210,10 +262,14 @@ def getPhi1SetupArgs():
     parser.add_argument('--sfincsDir', type=str, nargs='*', required=True, help='Top directory(ies) for SFINCS run(s), with path(s) if necessary. Each directory must contain radial (or radial and electric field) subdirectories, each with an "input.namelist" file, "job.sfincsScan" file, and "sfincsOutput.h5" file. These files will simply be copied and modified as necessary to include Phi1 calculations. If you input multiple directories, order matters!')
     parser.add_argument('--saveLoc', type=str, nargs='*', required=False, default=[None], help='Top-level directory(ies) in which to save modified files and informational *.txt files. The directory structure will be copied from <sfincsDir>. Defaults to <sfincsDir>+"_Phi1". If you input multiple directories, order matters!')
     parser.add_argument('--noRun', action='store_true', default=False, help='Copy/write files, but do not launch SFINCS.')
+    parser.add_argument('--numWorkers', type=int, nargs=1, required=False, default=[None], help='Number of processes used to read the SFINCS output files. The default is the number of processors.')
     args = parser.parse_args()
 
     if not all([isdir(item) for item in args.sfincsDir]):
         raise IOError('The inputs given in <sfincsDir> must be directories.')
+
+    if args.numWorkers[0] is not None and args.numWorkers[0] < 1:
+        raise IOError('<numWorkers> must be at least 1.')
     
     lens = [len(args.sfincsDir), len(args.saveLoc)]
     maxLen = max(lens)
@@ -235,7 +291,7 @@ def getAxisParamsArgs():
     from os.path import isdir
 
     parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
-    parser.add_argument('--wout', type=str, nargs=1, required=True, help='wout file from which to pull axis information. Note that stellarator symmetry is assumed!')
+    parser.add_argument('--wout', type=str, nargs=1, required=True, help='wout file (in netCDF format) from which to pull axis information. Note that stellarator symmetry is assumed!')
     args = parser.parse_args()
 
     if isdir(args.wout[0]):
@@ -292,6 +348,19 @@ def getCompoundPlotArgs():
 
     return args
     
+def addResultCacheArg(parser):
+
+    '''
+    Inputs:
+        parser: argparse.ArgumentParser of a script that sets up
+                or submits SFINCS runs.
+    Outputs:
+        [The <resultCache> option, which is shared by those
+        scripts, is added to parser.]
+    '''
+
+    parser.add_argument('--resultCache', type=str, nargs=1, required=False, default=[None], help='JSON file of a result cache that can be shared between campaigns (it is created if it does not exist). The finished runs of this campaign are added to it, and new runs whose effective inputs (the normalized input.namelist, the contents of the equilibrium file, and the profiles on their flux surface) match a finished run in the cache get a link to its output instead of being submitted.')
+
 def getChooseErsArgs():
 
     '''
@@ -310,15 +379,339 @@ def getChooseErsArgs():
     parser.add_argument('--print', action='store_true', default=False, help='Print values of the radial electric field and corresponding radial currents for each flux surface. This is useful if the program gets caught in a loop of repeatedly choosing the wrong guess for a root rather than converging to an answer. (Such a situation is rare but possible.) The user can delete all the electric field subdirectories near a given root except the one with the lowest radial current. This should help the program converge.')
     parser.add_argument('--filter', action='store_true', default=False, help='Once all the roots for all flux surfaces of interest in a given <sfincsDir> are determined, this option can be used to copy only the subdirectories that contain the "correct" electric field information from <sfincsDir> to <saveLoc>. If plot.py is then run on <saveLoc>, the "true" behavior of the system will be seen. Note that <sfincsDir> must contain a determineEr/ subdirectory with a rootsToUse.txt file for this option to work. Note also that this command will not delete anything from <saveLoc>, so pointing to a fresh directory every time is best practice.')
     parser.add_argument('--noRun', action='store_true', default=False, help='Perform all normal tasks except launching new SFINCS runs.')
+    addResultCacheArg(parser)
     parser.add_argument('--allowZeroJr', action='store_true', default=False, help='Do not abort calculations for a given flux surface if an (erroneous) run with exactly zero radial current is found. This may be useful for creating preliminary/diagnostic plots, but it will also break the root finding algorithms. If you use this option, it may be appropriate to use <noRun> as well.')
     parser.add_argument('--maxRootJr', type=float, nargs=1, required=False, default=[7.0e-6], help='Maximum radial current that may be present for a given electric field value to be considered a "root". The definition of the radial current is based on the coordinate with respect to which the derivative of the electric potential is taken in the given <sfincsDir>. The default is recommended. Note that setting <maxRootJr> too low may make it impossible to find any satisfactory roots.')
     parser.add_argument('--zeroErTol', type=float, nargs=1, required=False, default=[1.1], help='Absolute tolerance used to determine if a given electric field value is close enough to zero to be considered "zero electric field". SFINCS runs at or near zero electric field are necessary to resolve the "spike" in the Jr vs Er plots, but SFINCS often has roundoff troubles at exactly Er = 0. The default value for this parameter is recommended. If you change it, keep in mind that this script uses SI units whereas SFINCS does not.')
+    parser.add_argument('--continuation', action='store_true', default=False, help='Use the roots that have already been identified on some flux surfaces to seed new electric field runs on the surfaces that do not have enough data yet. The ion, unstable, electron, and solo roots are interpolated along the radius from the nearest resolved surfaces, and <contNumErs> runs are placed tightly around each predicted root. This typically needs far fewer runs than refining a broad, uniform electric field scan.')
+    parser.add_argument('--contNumErs', type=int, nargs=1, required=False, default=[3], help='If <continuation> is used, the number of electric field runs placed around each predicted root.')
+    parser.add_argument('--contRelWidth', type=float, nargs=1, required=False, default=[0.1], help='If <continuation> is used, the half-width of the window around each predicted root, relative to the size of the predicted root. The half-width is never smaller than <zeroErTol>.')
+    parser.add_argument('--surrogate', action='store_true', default=False, help='Fit a Gaussian process surrogate of the radial current as a function of both the radius and the electric field to the data from all flux surfaces at once, and use it to choose additional electric field runs on the flux surfaces that are not resolved yet. The runs are placed where the surrogate is least sure of the sign of the radial current, which is where they most reduce the uncertainty in the roots. Since the surrogate shares information between neighboring flux surfaces, this typically allows much coarser electric field scans to be used. See also <surrogateTol>.')
+    parser.add_argument('--surrogateBatch', type=int, nargs=1, required=False, default=[6], help='If <surrogate> is used, the total number of electric field runs (summed over all flux surfaces) chosen by the surrogate each time this script is run.')
+    parser.add_argument('--surrogateTol', type=float, nargs=1, required=False, default=[0.8], help='If <surrogate> is used, flux surfaces on which the (normalized) uncertainty of the surrogate about the sign of the radial current is above this value get runs chosen by the surrogate. The other flux surfaces with root guesses get the usual root guesses, which are better at pinning down roots that have already been roughly located. Larger values hand the flux surfaces over to the usual root guesses sooner.')
+    parser.add_argument('--surrogateMargin', type=float, nargs=1, required=False, default=[0.5], help='If <surrogate> is used, the surrogate may choose electric field values outside the range covered by the existing runs (on all flux surfaces) by up to this fraction of that range. This is only done for flux surfaces on which the usual root guesses cannot be made, and it allows roots outside the original scan to be found.')
+    parser.add_argument('--surrogateNeighbors', type=int, nargs=1, required=False, default=[2], help='If <surrogate> is used, the surrogate is fit to the flux surfaces that are not resolved yet and to this many flux surfaces (with data) on either side of each of them, instead of to every flux surface. This keeps the surrogate fast for campaigns with many flux surfaces.')
+    parser.add_argument('--refine', action='store_true', default=False, help='Treat <sfincsDir> as a coarse campaign (see the <coarseFactor> option of run.py) and, for every flux surface whose roots have been bracketed, set up full-resolution runs near those roots (and at zero electric field) in <sfincsDir>+"_fine". The full resolution is read from the "!fine" lines of the input.namelist files. Each flux surface is only refined once. This script can then be run on <sfincsDir>+"_fine" as usual to pin down the roots at full resolution.')
+    parser.add_argument('--refineNumErs', type=int, nargs=1, required=False, default=[3], help='If <refine> is used, the number of full-resolution electric field runs placed around each bracketed root. Use at least 2 so that each root is bracketed at full resolution too.')
+    parser.add_argument('--refineRelWidth', type=float, nargs=1, required=False, default=[0.05], help='If <refine> is used, the half-width of the window around each bracketed root, relative to the size of the root. The half-width is never smaller than <zeroErTol>.')
     parser.add_argument('--marg', type=float, nargs=1, required=False, default=[0.02], help='Margin argument for plots produced by the script - this is included simply because MatPlotLib was being stubborn and not auto-formatting properly. The default should be fine.')
+    parser.add_argument('--noCache', action='store_true', default=False, help='Reload, reanalyze, and replot every flux surface. By default, the results for each flux surface are cached in <saveLoc>/chooseErsCache.json together with the modification times of its output files, and only the flux surfaces whose electric field runs have changed since the last time this script was run are reanalyzed and replotted. The cache is ignored automatically if <maxRootJr>, <zeroErTol>, <allowZeroJr>, or <marg> change.')
+    parser.add_argument('--noPlots', action='store_true', default=False, help='Do not make any plots (or write the *.dat files with the plotted data). This is useful when this script is run repeatedly in an automated loop, since making the plots usually takes much longer than finding the roots. Flux surfaces that were not plotted will be plotted the next time this script is run without <noPlots>.')
+    parser.add_argument('--plotWorkers', type=int, nargs=1, required=False, default=[None], help='Number of processes used to make the plots. The plots are made after all the roots have been found and any new runs have been set up. The default is the number of processors.')
     args = parser.parse_args()
 
     if not isdir(args.sfincsDir[0]):
         raise IOError('The input given in <sfincsDir> must be a directory.')
-    
+
+    if args.contNumErs[0] < 1:
+        raise IOError('<contNumErs> must be at least 1.')
+
+    if args.contRelWidth[0] < 0:
+        raise IOError('<contRelWidth> cannot be negative.')
+
+    if args.surrogateBatch[0] < 1:
+        raise IOError('<surrogateBatch> must be at least 1.')
+
+    if args.surrogateMargin[0] < 0:
+        raise IOError('<surrogateMargin> cannot be negative.')
+
+    if args.surrogateNeighbors[0] < 0:
+        raise IOError('<surrogateNeighbors> cannot be negative.')
+
+    if args.refineNumErs[0] < 1:
+        raise IOError('<refineNumErs> must be at least 1.')
+
+    if args.refineRelWidth[0] < 0:
+        raise IOError('<refineRelWidth> cannot be negative.')
+
+    if args.plotWorkers[0] is not None and args.plotWorkers[0] < 1:
+        raise IOError('<plotWorkers> must be at least 1.')
+
+    return args
+
+def getAutoChooseErsArgs():
+
+    '''
+    Inputs:
+        [No direct inputs. See below for command line inputs.]
+    Outputs:
+        Arguments that can be passed to other scripts for automatically choosing the right radial electric field on every flux surface.
+    '''
+
+    import argparse
+    from os.path import isdir
+
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--sfincsDir', type=str, nargs=1, required=True, help='Top directory for SFINCS run, with path if necessary. This directory must be organized as described in chooseErs.py.')
+    parser.add_argument('--saveLoc', type=str, nargs=1, required=False, default=[None], help='Location in which to save the informational *.txt files (with the same names and formats as in chooseErs.py). The default is <sfincsDir>/determineEr/.')
+    parser.add_argument('--pollInterval', type=float, nargs=1, required=False, default=[60.0], help='Number of seconds to wait between checks for newly finished SFINCS runs.')
+    parser.add_argument('--maxTime', type=float, nargs=1, required=False, default=[48.0], help='Maximum number of hours for which the script will run. Any runs that are still pending when this time is reached will not be examined.')
+    parser.add_argument('--maxNewRuns', type=int, nargs=1, required=False, default=[20], help='Maximum number of electric field runs that the script may launch for a single flux surface. This prevents the script from launching runs forever if the root finding algorithms get stuck.')
+    parser.add_argument('--launchCommand', type=str, nargs=1, required=False, default=['sbatch'], help='Command used to submit the job.sfincsScan file in each new electric field subdirectory.')
+    addResultCacheArg(parser)
+    parser.add_argument('--noRun', action='store_true', default=False, help='Set up new electric field subdirectories but do not submit them. The script will keep waiting for the corresponding output files, so this is mainly useful if the runs are started some other way.')
+    parser.add_argument('--allowZeroJr', action='store_true', default=False, help='See the corresponding option in chooseErs.py.')
+    parser.add_argument('--maxRootJr', type=float, nargs=1, required=False, default=[7.0e-6], help='See the corresponding option in chooseErs.py.')
+    parser.add_argument('--zeroErTol', type=float, nargs=1, required=False, default=[1.1], help='See the corresponding option in chooseErs.py.')
+    args = parser.parse_args()
+
+    if not isdir(args.sfincsDir[0]):
+        raise IOError('The input given in <sfincsDir> must be a directory.')
+
+    if args.pollInterval[0] <= 0:
+        raise IOError('<pollInterval> must be positive.')
+
+    if args.maxNewRuns[0] < 0:
+        raise IOError('<maxNewRuns> cannot be negative.')
+
+    return args
+
+def getScanErsArgs():
+
+    '''
+    Inputs:
+        [No direct inputs. See below for command line inputs.]
+    Outputs:
+        Arguments that can be passed to other scripts for placing electric field runs non-uniformly.
+    '''
+
+    import argparse
+    from os.path import isdir
+
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--sfincsDir', type=str, nargs=1, required=True, help='Top directory for SFINCS run, with path if necessary. This directory must contain one subdirectory for each flux surface (as created by run.py), each of which must contain an input.namelist file and a job.sfincsScan file (either directly or in an existing electric field subdirectory). The new electric field subdirectories are created inside the flux surface subdirectories.')
+    parser.add_argument('--numErs', type=int, nargs=1, required=False, default=[11], help='Number of electric field runs to create on each flux surface. One of them is always placed at zero electric field (if zero is within the range), since chooseErs.py needs that run.')
+    parser.add_argument('--minEr', type=float, nargs=1, required=False, default=[-5], help='Minimum value of the radial electric field (or proxy). The units and variable are the same as those used for the electric field in the input.namelist files in <sfincsDir>, as with the <minSeedEr> option of run.py.')
+    parser.add_argument('--maxEr', type=float, nargs=1, required=False, default=[5], help='Maximum value of the radial electric field (or proxy), in the same units as <minEr>.')
+    parser.add_argument('--zeroWeight', type=float, nargs=1, required=False, default=[0.3], help='Fraction of the runs clustered around zero electric field, where the spike in the radial current is.')
+    parser.add_argument('--zeroWidth', type=float, nargs=1, required=False, default=[0.02], help='Width of the cluster of runs around zero electric field, as a fraction of <maxEr> - <minEr>. The spike is often very thin, so this should be small.')
+    parser.add_argument('--rootWeight', type=float, nargs=1, required=False, default=[0.4], help='Fraction of the runs clustered around the expected roots (see <prevRoots> and <priorRoots>), shared equally between the roots. If no roots are expected on a flux surface, these runs are spread uniformly instead.')
+    parser.add_argument('--rootWidth', type=float, nargs=1, required=False, default=[0.05], help='Width of the cluster of runs around each expected root, as a fraction of <maxEr> - <minEr>.')
+    parser.add_argument('--prevRoots', type=str, nargs=1, required=False, default=[None], help='Directory in which chooseErs.py saved the results of a previous campaign (such as <oldSfincsDir>/determineEr). The roots found there are interpolated to the flux surfaces in <sfincsDir> and used as the expected roots. The flux surface subdirectories must use the same radial coordinate as that campaign.')
+    parser.add_argument('--priorRoots', type=float, nargs='*', required=False, default=[], help='Expected root(s), in the same units as <minEr>, used on every flux surface. These are used in addition to <prevRoots>.')
+    parser.add_argument('--noRun', action='store_true', default=False, help='Create the electric field subdirectories without submitting any jobs.')
+    addResultCacheArg(parser)
+    parser.add_argument('--launchCommand', type=str, nargs=1, required=False, default=['sbatch'], help='Command used to submit the jobs. All the new runs are submitted together as a Slurm array job.')
+    args = parser.parse_args()
+
+    if not isdir(args.sfincsDir[0]):
+        raise IOError('The input given in <sfincsDir> must be a directory.')
+
+    if args.prevRoots[0] is not None and not isdir(args.prevRoots[0]):
+        raise IOError('The input given in <prevRoots> must be a directory.')
+
+    if args.numErs[0] < 3:
+        raise IOError('<numErs> must be at least 3.')
+
+    if args.minEr[0] >= args.maxEr[0]:
+        raise IOError('<minEr> must be less than <maxEr>.')
+
+    if args.zeroWeight[0] < 0 or args.rootWeight[0] < 0 or args.zeroWeight[0] + args.rootWeight[0] >= 1:
+        raise IOError('<zeroWeight> and <rootWeight> cannot be negative, and their sum must be less than 1.')
+
+    if args.zeroWidth[0] <= 0 or args.rootWidth[0] <= 0:
+        raise IOError('<zeroWidth> and <rootWidth> must be positive.')
+
+    return args
+
+def getScanMonoenergeticArgs():
+
+    '''
+    Inputs:
+        [No direct inputs. See below for command line inputs.]
+    Outputs:
+        Arguments that can be passed to other scripts for setting up monoenergetic SFINCS runs.
+    '''
+
+    import argparse
+    from os.path import isdir
+
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--sfincsDir', type=str, nargs=1, required=True, help='Top directory for SFINCS run, with path if necessary. This directory must contain one subdirectory for each flux surface, as created by run.py with <RHSMode> = 3 (and without <noNamelist> or <noBatch>). The monoenergetic runs are created inside the flux surface subdirectories.')
+    parser.add_argument('--nuPrimes', type=float, nargs=2, required=False, default=[1e-5, 1e2], help='Smallest and largest values of the normalized collisionality nuPrime. The values in between are spaced logarithmically. The range should cover the collisionalities of every species at every energy that matters, so it is usually wide.')
+    parser.add_argument('--numNuPrimes', type=int, nargs=1, required=False, default=[15], help='Number of values of nuPrime on each flux surface.')
+    parser.add_argument('--EStars', type=float, nargs='*', required=False, default=[0.0, 1e-4, 3e-4, 1e-3, 3e-3, 1e-2, 3e-2, 1e-1], help='Values of the normalized radial electric field EStar on each flux surface. If they are all non-negative, the radial transport coefficient is assumed to be even in EStar when the database is used.')
+    parser.add_argument('--noRun', action='store_true', default=False, help='Create the monoenergetic subdirectories without submitting any jobs.')
+    addResultCacheArg(parser)
+    parser.add_argument('--launchCommand', type=str, nargs=1, required=False, default=['sbatch'], help='Command used to submit the jobs. All the new runs are submitted together as a Slurm array job.')
+    args = parser.parse_args()
+
+    if not isdir(args.sfincsDir[0]):
+        raise IOError('The input given in <sfincsDir> must be a directory.')
+
+    if args.nuPrimes[0] <= 0 or args.nuPrimes[0] >= args.nuPrimes[1]:
+        raise IOError('The values in <nuPrimes> must be positive and increasing.')
+
+    if args.numNuPrimes[0] < 2 or len(set(args.EStars)) < 2:
+        raise IOError('At least two values of both nuPrime and EStar are needed.')
+
+    return args
+
+def getMonoenergeticErsArgs():
+
+    '''
+    Inputs:
+        [No direct inputs. See below for command line inputs.]
+    Outputs:
+        Arguments that can be passed to other scripts for finding the ambipolar electric field with a monoenergetic database.
+    '''
+
+    import argparse
+    from os.path import isdir, isfile
+
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--sfincsDir', type=str, nargs=1, required=True, help='Top directory of the monoenergetic SFINCS runs (set up by scanMonoenergetic.py), with path if necessary.')
+    parser.add_argument('--profilesIn', type=str, nargs=1, required=True, help='BEAMS3D input file (as for run.py) with the profiles and species for which to find the ambipolar electric field. The profiles must cover the flux surfaces in <sfincsDir>.')
+    parser.add_argument('--saveLoc', type=str, nargs=1, required=False, default=[None], help='Location in which to save the database and the roots. The default is <sfincsDir>/determineErMono/. The root files have the same format as those of chooseErs.py, so this directory can be given to the <prevErDir> option of run.py or the <prevRoots> option of scanErs.py to set up full SFINCS runs around the roots.')
+    parser.add_argument('--minEr', type=float, nargs=1, required=False, default=[-30.0], help='Minimum value of Er (= -dPhiHatdrHat, in SFINCS units) to consider.')
+    parser.add_argument('--maxEr', type=float, nargs=1, required=False, default=[30.0], help='Maximum value of Er (= -dPhiHatdrHat, in SFINCS units) to consider.')
+    parser.add_argument('--numErs', type=int, nargs=1, required=False, default=[2001], help='Number of Er values at which the radial current is evaluated on each flux surface.')
+    parser.add_argument('--numEnergies', type=int, nargs=1, required=False, default=[32], help='Number of quadrature points used for the energy convolution.')
+    parser.add_argument('--assumedSpeciesMass', type=float, nargs=1, required=False, default=[9.109383701528e-31], help='Mass in kg of the species that is added to the species in <profilesIn>, as for run.py.')
+    parser.add_argument('--assumedSpeciesCharge', type=float, nargs=1, required=False, default=[-1.0], help='Charge in units of the proton charge of the species that is added to the species in <profilesIn>, as for run.py.')
+    parser.add_argument('--rebuild', action='store_true', default=False, help='Build the database from the SFINCS outputs again, even if it was already saved in <saveLoc>. This is needed if runs were added or changed.')
+    args = parser.parse_args()
+
+    if not isdir(args.sfincsDir[0]):
+        raise IOError('The input given in <sfincsDir> must be a directory.')
+
+    if not isfile(args.profilesIn[0]):
+        raise IOError('The input given in <profilesIn> must be a file.')
+
+    if args.minEr[0] >= args.maxEr[0]:
+        raise IOError('<minEr> must be less than <maxEr>.')
+
+    if args.numErs[0] < 3 or args.numEnergies[0] < 1:
+        raise IOError('<numErs> must be at least 3 and <numEnergies> must be at least 1.')
+
+    return args
+
+def getTailorResolutionArgs():
+
+    '''
+    Inputs:
+        [No direct inputs. See below for command line inputs.]
+    Outputs:
+        Arguments that can be passed to other scripts for tailoring the resolution of each flux surface.
+    '''
+
+    import argparse
+    from os.path import isdir
+
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--resScans', type=str, nargs='+', required=True, help='Directories of resolution scans (made with the <resScan> option of run.py), with paths if necessary. Each one should be on a different flux surface. The more flux surfaces are covered (especially near the magnetic axis), the better the resolution can be tailored.')
+    parser.add_argument('--sfincsDir', type=str, nargs=1, required=True, help='Top directory of the SFINCS campaign whose runs should be given tailored resolutions, with path if necessary. Every run in this directory that does not have an output file yet is modified.')
+    parser.add_argument('--params', type=str, nargs='*', required=False, default=['Ntheta', 'Nzeta', 'Nxi', 'Nx'], help='Resolution parameters to tailor. Parameters that were not scanned in a resolution scan keep the value of its base case on that flux surface.')
+    parser.add_argument('--tol', type=float, nargs=1, required=False, default=[0.05], help='Largest relative difference in the fluxes and flows (with respect to the highest resolution in each scan) for which a resolution is considered to be converged.')
+    parser.add_argument('--noRun', action='store_true', default=False, help='Modify the input.namelist files without submitting any jobs.')
+    addResultCacheArg(parser)
+    parser.add_argument('--launchCommand', type=str, nargs=1, required=False, default=['sbatch'], help='Command used to submit the jobs. All the modified runs are submitted together as a Slurm array job.')
+    args = parser.parse_args()
+
+    for resScan in args.resScans:
+        if not isdir(resScan):
+            raise IOError('The resolution scan {} is not a directory.'.format(resScan))
+
+    if not isdir(args.sfincsDir[0]):
+        raise IOError('The input given in <sfincsDir> must be a directory.')
+
+    if not all([param in ['Ntheta', 'Nzeta', 'Nxi', 'Nx', 'NL'] for param in args.params]):
+        raise IOError('Each element of <params> must be one of Ntheta, Nzeta, Nxi, Nx, and NL.')
+
+    if args.tol[0] <= 0:
+        raise IOError('<tol> must be positive.')
+
+    return args
+
+def getCloneCampaignArgs():
+
+    '''
+    Inputs:
+        [No direct inputs. See below for command line inputs.]
+    Outputs:
+        Arguments that can be passed to other scripts for cloning the runs of a SFINCS campaign with modified settings.
+    '''
+
+    import argparse
+    from os.path import isdir, isfile
+
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--sfincsDir', type=str, nargs=1, required=True, help='Top directory of the SFINCS campaign to clone, with path if necessary. This directory must contain radial (or radial and electric field) subdirectories, each with an "input.namelist" file, "job.sfincsScan" file, and "sfincsOutput.h5" file.')
+    parser.add_argument('--saveLoc', type=str, nargs=1, required=False, default=[None], help='Top directory in which to write the new runs. The directory structure of <sfincsDir> is copied. Defaults to <sfincsDir>+"_clone".')
+    parser.add_argument('--patch', type=str, nargs='*', required=False, default=[], help='File(s) with the namelist parameters to change, in the same format as an input.namelist file (for example, "&physicsParameters" followed by "  collisionOperator = 1" and "/"). Only the parameters to change need to be given. Parameters that are not in the original input.namelist files are added, and a parameter written as "name = !unset" is removed. If several files are given, they are applied in order.')
+    parser.add_argument('--set', type=str, nargs='*', required=False, default=[], help='Namelist parameters to change, each written as "group.name=value" (for example, "physicsParameters.magneticDriftScheme=1"). These are applied after the <patch> files.')
+    parser.add_argument('--select', type=str, nargs=1, required=False, default=['bestEr'], choices=['bestEr', 'all'], help='Which converged runs to clone. With "bestEr", only the run with the smallest radial current is cloned on each flux surface that has electric field subdirectories. With "all", every converged run is cloned. Runs that did not converge are never cloned.')
+    parser.add_argument('--useOutputEr', action='store_true', default=False, help='Set the electric field of each new run to the one in the output of the original run (as setUpPhi1.py does), rather than keeping the value in its input.namelist file. This is useful if the original runs used ambipolarSolve.')
+    parser.add_argument('--overwrite', action='store_true', default=False, help='Rewrite runs that already exist in <saveLoc>. By default, they are left alone.')
+    parser.add_argument('--noRun', action='store_true', default=False, help='Write the new runs without submitting any jobs.')
+    addResultCacheArg(parser)
+    parser.add_argument('--launchCommand', type=str, nargs=1, required=False, default=['sbatch'], help='Command used to submit the jobs. All the new runs are submitted together as Slurm array jobs.')
+    parser.add_argument('--numWorkers', type=int, nargs=1, required=False, default=[None], help='Number of processes used to read the SFINCS output files. The default is the number of processors.')
+    args = parser.parse_args()
+
+    if not isdir(args.sfincsDir[0]):
+        raise IOError('The input given in <sfincsDir> must be a directory.')
+
+    if not all([isfile(patchFile) for patchFile in args.patch]):
+        raise IOError('The files given in <patch> must exist.')
+
+    if len(args.patch) == 0 and len(args.set) == 0 and not args.useOutputEr:
+        raise IOError('At least one of <patch>, <set>, and <useOutputEr> must be used, otherwise the new runs would be identical to the original ones.')
+
+    for item in args.set:
+        if '=' not in item or '.' not in item.split('=')[0]:
+            raise IOError('Each element of <set> must be written as "group.name=value". This is not the case for {}.'.format(item))
+
+    if args.numWorkers[0] is not None and args.numWorkers[0] < 1:
+        raise IOError('<numWorkers> must be at least 1.')
+
+    return args
+
+def getConvergeResolutionArgs():
+
+    '''
+    Inputs:
+        [No direct inputs. See below for command line inputs.]
+    Outputs:
+        Arguments that can be passed to other scripts for running an adaptive convergence study.
+    '''
+
+    import argparse
+    from os.path import isfile, join
+
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--baseDir', type=str, nargs=1, required=True, help='Directory containing the input.namelist and job.sfincsScan files of the base case, with path if necessary. The directory written by run.py (without <noNamelist> or <noBatch>) works, in which case the flux surface given by <minRad> is used, just as for <resScan>.')
+    parser.add_argument('--saveLoc', type=str, nargs=1, required=False, default=[None], help='Directory in which to create the runs of the convergence study and save its results. The default is <baseDir>/convergence/.')
+    parser.add_argument('--params', type=str, nargs='*', required=False, default=['Ntheta', 'Nzeta', 'Nxi', 'Nx'], help='Resolution parameters to check. Each one is increased step by step (with the others kept at their base values) until the fluxes and flows stop changing.')
+    parser.add_argument('--tol', type=float, nargs=1, required=False, default=[0.05], help='Largest relative difference in the fluxes and flows between two consecutive steps for which a parameter is considered to be converged.')
+    parser.add_argument('--startFactor', type=float, nargs=1, required=False, default=[0.5], help='Multiplier on the base value of each parameter for the first step.')
+    parser.add_argument('--stepFactor', type=float, nargs=1, required=False, default=[1.25], help='Multiplier on the value of each parameter from one step to the next. Steps that round to the same integer are skipped.')
+    parser.add_argument('--maxFactor', type=float, nargs=1, required=False, default=[3.0], help='Multiplier on the base value of each parameter beyond which no more steps are taken.')
+    parser.add_argument('--pollInterval', type=float, nargs=1, required=False, default=[60.0], help='Number of seconds to wait between checks for newly finished SFINCS runs.')
+    parser.add_argument('--maxTime', type=float, nargs=1, required=False, default=[48.0], help='Maximum number of hours for which the script will run.')
+    parser.add_argument('--launchCommand', type=str, nargs=1, required=False, default=['sbatch'], help='Command used to submit the job.sfincsScan file of each new run.')
+    addResultCacheArg(parser)
+    parser.add_argument('--noRun', action='store_true', default=False, help='Set up the runs but do not submit them. The script will keep waiting for the corresponding output files, so this is mainly useful if the runs are started some other way.')
+    args = parser.parse_args()
+
+    if not isfile(join(args.baseDir[0], 'input.namelist')) or not isfile(join(args.baseDir[0], 'job.sfincsScan')):
+        raise IOError('<baseDir> must contain an input.namelist file and a job.sfincsScan file.')
+
+    if args.saveLoc[0] is not None and isfile(args.saveLoc[0]):
+        raise IOError('<saveLoc> must be a directory.')
+
+    if not all([param in ['Ntheta', 'Nzeta', 'Nxi', 'Nx', 'NL'] for param in args.params]) or len(args.params) == 0:
+        raise IOError('<params> must contain at least one of Ntheta, Nzeta, Nxi, Nx, and NL (and nothing else).')
+
+    if args.tol[0] <= 0:
+        raise IOError('<tol> must be positive.')
+
+    if args.startFactor[0] <= 0 or args.stepFactor[0] <= 1 or args.maxFactor[0] <= args.startFactor[0]:
+        raise IOError('<startFactor> must be positive, <stepFactor> must be greater than 1, and <maxFactor> must be greater than <startFactor>.')
+
+    if args.pollInterval[0] <= 0:
+        raise IOError('<pollInterval> must be positive.')
+
     return args
 
 def getCollisionalityArgs():
@@ -392,8 +785,9 @@ def getBootstrapArgs():
     from os.path import isdir
     
     parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
-    parser.add_argument('--eqIn', type=str, nargs=1, required=True, help='VMEC wout file from which to load the magnetic equilibrium.')
+    parser.add_argument('--eqIn', type=str, nargs=1, required=True, help='VMEC wout file (in netCDF or ASCII format) from which to load the magnetic equilibrium.')
     parser.add_argument('--sfincsDir', type=str, nargs=1, required=True, help='Top directory for SFINCS run, with path if necessary. This directory must contain flux surface subdirectories, each of which contain SFINCS output files (*.h5). Directories with an electric field scan CANNOT be used.')
+    parser.add_argument('--eqCache', type=str, nargs=1, required=False, default=[None], help='If <eqIn> is in ASCII format, directory in which its netCDF version is stored (see the <eqCache> option of run.py). Defaults to <sfincsDir>, which is where run.py stores it by default, so a file that run.py has already converted is not converted again.')
     args = parser.parse_args()
 
     if isdir(args.eqIn[0]):
@@ -846,6 +1240,293 @@ def adjustInputLengths(inListDict):
 
     return outListDict, longLists, maxLen
 
+def readFineResolution(namelistFile):
+
+    '''
+    Inputs:
+        namelistFile: input.namelist file written by run.py.
+    Outputs:
+        Dictionary with the full-resolution value of each
+        resolution parameter recorded in the "!fine" lines of
+        namelistFile. These lines are only written when the
+        <coarseFactor> option of run.py is used.
+    '''
+
+    out = {name:int(value) for name, value in namelistDirectives(parseNamelist(namelistFile), 'fine').items()}
+
+    if len(out) == 0:
+        raise IOError('No full-resolution ("!fine") parameters were found in {}. Was the <coarseFactor> option of run.py used?'.format(namelistFile))
+
+    return out
+
+def parseNamelist(namelistFile):
+
+    '''
+    Inputs:
+        namelistFile: input.namelist file (or a file with the same
+                      format, such as a patch file for cloneCampaign.py).
+    Outputs:
+        List with one dictionary per line of namelistFile. Each
+        dictionary contains the original line ('text'), the namelist
+        group that the line belongs to ('group', None outside of a
+        group), and, for lines that set a parameter, its name ('name')
+        and value ('value') as strings. Both are None for other lines.
+        Group names are converted to lowercase, as Fortran does not
+        distinguish them. The "!ss" lines read by sfincsScan and the
+        "!fine" lines written by run.py are comments to Fortran, so
+        their name is None, but their kind ("ss" or "fine"), name, and
+        value are stored in a dictionary ('directive', None for other
+        lines). Nothing else is changed, so namelistText can reproduce
+        namelistFile exactly.
+    '''
+
+    with open(namelistFile, 'r') as f:
+        lines = f.readlines()
+
+    parsed = []
+    group = None
+    for line in lines:
+        content = _stripNamelistComment(line).strip()
+        entry = {'text':line, 'group':group, 'name':None, 'value':None, 'directive':_namelistDirective(line)}
+        if content.startswith('&'):
+            group = content[1:].split()[0].lower()
+            entry['group'] = group
+        elif content == '/':
+            group = None
+        elif '=' in content and group is not None:
+            nameAndVal = content.split('=', 1)
+            entry['name'] = nameAndVal[0].strip()
+            entry['value'] = nameAndVal[1].strip()
+        parsed.append(entry)
+
+    if group is not None:
+        raise IOError('The namelist group {} is not closed in {}.'.format(group, namelistFile))
+
+    return parsed
+
+def _stripNamelistComment(line):
+
+    # Returns line without its comment, ignoring any exclamation marks inside of strings
+
+    quote = None
+    for ind, char in enumerate(line):
+        if quote is not None:
+            if char == quote:
+                quote = None
+        elif char in ['"', "'"]:
+            quote = char
+        elif char == '!':
+            return line[:ind]
+
+    return line
+
+def _namelistDirective(line):
+
+    # Returns the kind, name, and value of a line such as "!ss Nradius = 5 ! Comment", or None for other lines
+
+    for kind in ['ss', 'fine']:
+        prefix = '!{} '.format(kind)
+        if line.startswith(prefix):
+            nameAndVal = _stripNamelistComment(line[len(prefix):]).split('=', 1)
+            if len(nameAndVal) == 2:
+                return {'kind':kind, 'name':nameAndVal[0].strip(), 'value':nameAndVal[1].strip()}
+
+    return None
+
+def readNamelistPatch(patchFile):
+
+    '''
+    Inputs:
+        patchFile: file with namelist groups that only contain the
+                   parameters to change, in the same format as an
+                   input.namelist file. For instance,
+                       &physicsParameters
+                         includePhi1 = .true.
+                       /
+                   A parameter whose value is "!unset" (the value is
+                   empty and the comment is "unset") is removed.
+    Outputs:
+        Dictionary, as for patchParsedNamelist.
+    '''
+
+    patch = {}
+    for entry in parseNamelist(patchFile):
+        if entry['name'] is None:
+            continue
+        if entry['value'] == '' and entry['text'].split('!', 1)[-1].strip() == 'unset':
+            value = None
+        else:
+            value = entry['value']
+        patch.setdefault(entry['group'], {})[entry['name']] = value
+
+    if len(patch) == 0:
+        raise IOError('No namelist parameters were found in {}.'.format(patchFile))
+
+    return patch
+
+def formatNamelistValue(value):
+
+    '''
+    Inputs:
+        value: bool, int, float, or string (which is used as-is).
+    Outputs:
+        String with value written as a Fortran namelist value.
+    '''
+
+    if isinstance(value, bool):
+        return '.true.' if value else '.false.'
+
+    return str(value)
+
+def patchParsedNamelist(parsed, patch, comment=None):
+
+    '''
+    Inputs:
+        parsed: list, as from parseNamelist.
+        patch: dictionary with namelist group names as keys. Each
+               value is a dictionary with parameter names as keys
+               and their new values (see formatNamelistValue) as
+               values. A value of None removes the parameter.
+        comment: if not None, this comment is added to every line
+                 that is written or rewritten.
+    Outputs:
+        New list, as from parseNamelist, with the patch applied.
+        Group and parameter names are matched regardless of case.
+        Parameters are changed in place. New parameters are added
+        at the start of their group, and missing groups are added
+        at the end. The other lines are left alone.
+    '''
+
+    def makeEntry(group, name, value, indent='\t'):
+        text = indent + '{} = {}'.format(name, formatNamelistValue(value)) + (' ! {}'.format(comment) if comment is not None else '') + '\n'
+        return {'text':text, 'group':group.lower(), 'name':name, 'value':formatNamelistValue(value), 'directive':None}
+
+    groupNames = {group.lower():group for group in patch}
+    changes = {group.lower():{name.lower():(name, value) for name, value in params.items()} for group, params in patch.items()}
+    existing = set([(entry['group'], entry['name'].lower()) for entry in parsed if entry['name'] is not None])
+    additions = {group:{key:item for key, item in params.items() if (group, key) not in existing} for group, params in changes.items()}
+
+    out = []
+    for entry in parsed:
+        group = entry['group']
+        if entry['name'] is not None and group in changes and entry['name'].lower() in changes[group]:
+            name, value = changes[group][entry['name'].lower()]
+            if value is not None:
+                text = entry['text']
+                out.append(makeEntry(group, name, value, indent=text[:len(text) - len(text.lstrip())]))
+            continue
+        out.append(entry)
+        if entry['name'] is None and group in additions and _stripNamelistComment(entry['text']).strip().startswith('&'): # Group header
+            for name, value in additions.pop(group).values():
+                if value is not None:
+                    out.append(makeEntry(group, name, value))
+
+    for group, params in additions.items():
+        newEntries = [makeEntry(group, name, value) for name, value in params.values() if value is not None]
+        if len(newEntries) != 0:
+            out.append({'text':'\n', 'group':None, 'name':None, 'value':None, 'directive':None})
+            out.append({'text':'&{}\n'.format(groupNames[group]), 'group':group, 'name':None, 'value':None, 'directive':None})
+            out += newEntries
+            out.append({'text':'/\n', 'group':None, 'name':None, 'value':None, 'directive':None})
+
+    return out
+
+def namelistText(parsed):
+
+    '''
+    Inputs:
+        parsed: list, as from parseNamelist.
+    Outputs:
+        String with the contents of the corresponding namelist file.
+    '''
+
+    return ''.join([entry['text'] for entry in parsed])
+
+def namelistValue(parsed, name, group=None):
+
+    '''
+    Inputs:
+        parsed: list, as from parseNamelist.
+        name: name of a namelist parameter.
+        group: if not None, only this namelist group is searched.
+    Outputs:
+        The value (string) of name in parsed, or None if it is not set.
+    '''
+
+    for entry in parsed:
+        if entry['name'] is not None and entry['name'].lower() == name.lower() and (group is None or entry['group'] == group.lower()):
+            return entry['value']
+
+    return None
+
+def namelistDirectives(parsed, kind):
+
+    '''
+    Inputs:
+        parsed: list, as from parseNamelist.
+        kind: "ss" for the lines read by sfincsScan or "fine" for
+              the full-resolution lines written by run.py.
+    Outputs:
+        Dictionary with the names of the parameters set by the lines
+        of that kind as keys and their values (strings) as values.
+    '''
+
+    return {entry['directive']['name']:entry['directive']['value'] for entry in parsed if entry['directive'] is not None and entry['directive']['kind'] == kind}
+
+def patchNamelistDirectives(parsed, kind, values):
+
+    '''
+    Inputs:
+        parsed: list, as from parseNamelist.
+        kind: "ss" or "fine", as for namelistDirectives.
+        values: dictionary with the names of parameters set by lines
+                of that kind as keys and their new values (see
+                formatNamelistValue) as values.
+    Outputs:
+        New list, as from parseNamelist, in which those lines set the
+        new values. Their comments are kept. Since these lines are not
+        part of any namelist group, parameters that are not already
+        set are not added.
+    '''
+
+    out = []
+    for entry in parsed:
+        directive = entry['directive']
+        if directive is not None and directive['kind'] == kind and directive['name'] in values:
+            prefix = '!{} '.format(kind)
+            rest = entry['text'][len(prefix):]
+            comment = rest[len(_stripNamelistComment(rest)):].rstrip('\n')
+            value = formatNamelistValue(values[directive['name']])
+            text = prefix + '{} = {}'.format(directive['name'], value) + (' ' + comment if comment != '' else '') + '\n'
+            entry = dict(entry, text=text, directive=dict(directive, value=value))
+        out.append(entry)
+
+    return out
+
+def setRadialScan(namelistFile, radialVarName, minRad, maxRad, numSurf):
+
+    '''
+    Inputs:
+        namelistFile: input.namelist file written by run.py.
+        radialVarName: written-out name of the radial coordinate
+                       used for the radial scan (as in radialVarDict).
+        minRad: lower bound of the radial scan.
+        maxRad: upper bound of the radial scan.
+        numSurf: number of flux surfaces in the radial scan.
+    Outputs:
+        [The "!ss" lines that sfincsScan reads to set up the radial
+        scan are overwritten in namelistFile.]
+    '''
+
+    newValues = {'Nradius':numSurf, radialVarName + '_min':minRad, radialVarName + '_max':maxRad}
+
+    parsed = parseNamelist(namelistFile)
+    missing = [name for name in newValues if name not in namelistDirectives(parsed, 'ss')]
+    if len(missing) != 0:
+        raise IOError('The radial scan parameters {} were not found in {}.'.format(missing, namelistFile))
+
+    writeFile(namelistFile, namelistText(patchNamelistDirectives(parsed, 'ss', newValues)))
+
 def makeDir(saveLoc):
 
     '''
@@ -863,6 +1544,52 @@ def makeDir(saveLoc):
 
     return outDir
 
+def loadCache(cacheFile):
+
+    '''
+    Inputs:
+        cacheFile: JSON file written by saveCache.
+    Outputs:
+        Dictionary stored in cacheFile. If the file does not
+        exist or cannot be read, an empty dictionary is output
+        so that everything is simply recomputed.
+    '''
+
+    import json
+
+    try:
+        with open(cacheFile, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def saveCache(cacheFile, cache):
+
+    '''
+    Inputs:
+        cacheFile: JSON file in which to save cache.
+        cache: dictionary to save. NumPy arrays and scalars are
+               converted to lists and Python scalars.
+    Outputs:
+        [cacheFile is written. A temporary file (unique to this
+        process) is written first so that an interrupted write
+        cannot corrupt the cache.]
+    '''
+
+    import json
+    import numpy as np
+    from os import getpid, replace
+
+    def convert(obj):
+        if isinstance(obj, (np.ndarray, np.generic)):
+            return obj.tolist()
+        raise TypeError('Object of type {} cannot be saved in the cache.'.format(type(obj).__name__))
+
+    tempFile = '{}.{}.tmp'.format(cacheFile, getpid())
+    with open(tempFile, 'w') as f:
+        json.dump(cache, f, default=convert)
+    replace(tempFile, cacheFile)
+
 def radialVarDict():
 
     '''
@@ -875,6 +1602,185 @@ def radialVarDict():
 
     return {0:'psiHat', 1:'psiN', 2:'rHat', 3:'rN', 4:'rHat'}
 
+def timeToSeconds(timeString):
+
+    '''
+    Inputs:
+        A string with a wall clock time in one of the
+        formats accepted by Slurm: MM, MM:SS, HH:MM:SS,
+        DD-HH, DD-HH:MM, or DD-HH:MM:SS.
+    Outputs:
+        The number of seconds (integer) represented
+        by timeString.
+    '''
+
+    errString = 'The wall clock time "{}" is not valid. The expected format is DD-HH:MM:SS (or another format accepted by Slurm, such as HH:MM:SS).'.format(timeString)
+
+    strippedTime = timeString.strip()
+    daySplit = strippedTime.split('-')
+    if len(daySplit) > 2:
+        raise IOError(errString)
+
+    try:
+        fields = [int(item) for item in daySplit[-1].split(':')]
+        days = int(daySplit[0]) if len(daySplit) == 2 else 0
+    except ValueError:
+        raise IOError(errString)
+
+    if any([item < 0 for item in fields]) or days < 0 or len(fields) > 3:
+        raise IOError(errString)
+
+    if len(daySplit) == 2: # DD-HH, DD-HH:MM, or DD-HH:MM:SS
+        hours, minutes, seconds = fields + [0] * (3 - len(fields))
+    elif len(fields) == 3: # HH:MM:SS
+        hours, minutes, seconds = fields
+    else: # MM or MM:SS
+        hours = 0
+        minutes, seconds = fields + [0] * (2 - len(fields))
+
+    return ((days * 24 + hours) * 60 + minutes) * 60 + seconds
+
+def loadMachineProfile(machine=None, registryFile=None):
+
+    '''
+    Inputs:
+        machine: String with the name of the cluster whose
+                 profile should be loaded. If None, the
+                 "MACHINE" environment variable is used.
+        registryFile: String with the (relative or absolute)
+                      path to a JSON machine registry. If None,
+                      the machines.json file that lives next to
+                      this file is used.
+    Outputs:
+        A dictionary describing the cluster. It contains the
+        modules to load (key 'modules'), the number of cores
+        on each node (key 'coresPerNode'), the usable memory
+        in MB on each node (key 'memPerNode'), the command used
+        to launch MPI programs (key 'launcher'), and a list of
+        partitions (key 'partitions'). Each partition is a
+        dictionary with a name (key 'name', None if Slurm should
+        choose), the maximum number of nodes per job (key
+        'maxNodes'), and the maximum wall clock time (key
+        'maxTime', formatted as DD-HH:MM:SS).
+    '''
+
+    import json
+    from os import environ
+    from os.path import abspath, dirname, join
+    from inspect import getfile, currentframe
+
+    if registryFile is None:
+        registryFile = join(dirname(abspath(getfile(currentframe()))), 'machines.json')
+
+    machineVar = 'MACHINE'
+    if machine is None:
+        try:
+            machine = environ[machineVar]
+        except KeyError:
+            raise IOError('No machine was specified, and the "{}" environment variable is not set.'.format(machineVar))
+
+    with open(registryFile, 'r') as f:
+        registry = json.load(f)
+
+    try:
+        profile = registry[machine]
+    except KeyError:
+        errString = 'The machine "{}" is not recognized.'.format(machine)
+        errString += ' Please add its modules, node sizes, partition limits, and launcher command to {}.'.format(registryFile)
+        raise IOError(errString)
+
+    for key in ['modules', 'coresPerNode', 'memPerNode', 'launcher', 'partitions']:
+        if key not in profile:
+            raise IOError('The entry for "{}" in {} does not specify "{}".'.format(machine, registryFile, key))
+
+    return profile
+
+def packTasks(machineProfile, timeLimit, nNodes=None, nTasksPerNode=None, nTasks=None, mem=None):
+
+    '''
+    Inputs:
+        machineProfile: Dictionary describing a cluster, as from the
+                        loadMachineProfile function.
+        timeLimit: String with the wall clock limit of the job, in a
+                   format accepted by timeToSeconds.
+        nNodes: Integer number of nodes requested by the user, or None.
+        nTasksPerNode: Integer number of MPI tasks per node requested by
+                       the user, or None.
+        nTasks: Integer total number of MPI tasks requested by the user,
+                or None.
+        mem: Integer total amount of memory (MB) requested by the user,
+             or None.
+    Outputs:
+        A dictionary with the number of nodes (key 'nodes'), the number
+        of MPI tasks on each node (key 'tasksPerNode'), the total number
+        of MPI tasks (key 'tasks', None if it was not requested), the
+        memory (MB) to request on each node (key 'memPerNode', None if
+        <mem> was not specified), and the name of the partition to use
+        (key 'partition', None if Slurm should choose). Values given by
+        the user are used as they are. The others are chosen so that the
+        tasks are spread as evenly as possible over the smallest number
+        of nodes that can hold both the tasks and the memory. An IOError
+        is raised if the requested values cannot fit on the machine.
+    '''
+
+    import numpy as np
+
+    coresPerNode = machineProfile['coresPerNode']
+    memPerNode = machineProfile['memPerNode']
+
+    if mem is not None:
+        nodesForMem = int(np.ceil(mem / memPerNode))
+    else:
+        nodesForMem = 1
+
+    if nTasksPerNode is not None:
+        tasksPerNode = nTasksPerNode
+        if nNodes is not None:
+            nodes = nNodes
+        elif nTasks is not None:
+            nodes = max(int(np.ceil(nTasks / tasksPerNode)), nodesForMem)
+        else:
+            nodes = nodesForMem
+    elif nNodes is not None:
+        nodes = nNodes
+        if nTasks is not None:
+            tasksPerNode = int(np.ceil(nTasks / nodes))
+        else:
+            tasksPerNode = coresPerNode
+    elif nTasks is not None:
+        nodesForCores = int(np.ceil(nTasks / coresPerNode))
+        nodes = max(nodesForCores, nodesForMem)
+        tasksPerNode = int(np.ceil(nTasks / nodes))
+    else:
+        nodes = nodesForMem
+        tasksPerNode = coresPerNode
+
+    if tasksPerNode > coresPerNode:
+        raise IOError('{} MPI tasks per node were requested, but each node only has {} cores.'.format(tasksPerNode, coresPerNode))
+
+    if nTasks is not None and nTasks > nodes * tasksPerNode:
+        raise IOError('{} MPI tasks were requested, but only {} fit on {} node(s) with {} tasks each.'.format(nTasks, nodes * tasksPerNode, nodes, tasksPerNode))
+
+    if nodes < nodesForMem:
+        raise IOError('The requested memory ({} MB) does not fit on {} node(s) with {} MB each.'.format(mem, nodes, memPerNode))
+
+    if mem is not None:
+        memUse = int(np.ceil(mem / nodes))
+    else:
+        memUse = None
+
+    seconds = timeToSeconds(timeLimit)
+    partition = None
+    for candidate in machineProfile['partitions']:
+        if nodes <= candidate['maxNodes'] and seconds <= timeToSeconds(candidate['maxTime']):
+            partition = candidate
+            break
+
+    if partition is None:
+        raise IOError('No partition on this machine allows {} node(s) for a wall clock time of {}.'.format(nodes, timeLimit))
+
+    return {'nodes':nodes, 'tasksPerNode':tasksPerNode, 'tasks':nTasks, 'memPerNode':memUse, 'partition':partition['name']}
+
 def prettyRadialVar(inString, unNormalize=False, innerOnly=False):
     
     '''
@@ -187,13 +187,86 @@ def nonlinearInterp(inputData, ders, k=3, s=0, pchip=False):
 
     return outputData
 
+def unitRegistry(mBar=1.67262192369e-27, BBar=1, RBar=1, nBar=1e20, TBar=1.602176634e-16, phiBar=1000):
+
+    '''
+    Inputs:
+        Reference quantities, as for fixOutputUnits.
+    Outputs:
+        Dictionary whose keys are the names of SFINCS variables
+        (without any suffix such as _vm_rHat) and whose values are
+        the factors that convert them to SI units. The registry is
+        only built once for each set of reference quantities.
+    '''
+
+    refs = (mBar, BBar, RBar, nBar, TBar, phiBar)
+    if refs not in _unitRegistries:
+        _unitRegistries[refs] = _buildUnitRegistry(*refs)
+
+    return _unitRegistries[refs]
+
+_unitRegistries = {} # Built registries, keyed by their reference quantities
+
+def _buildUnitRegistry(mBar, BBar, RBar, nBar, TBar, phiBar):
+
+    from scipy.constants import e # elementary charge in Coulombs
+
+    # Important quantity
+    vBar = thermalVelocity(TBar, mBar) # m/s by default
+
+    # In the intensive radial fluxes, you will notice what appears to be an extra factor of m^-1.
+    # This is not an error. It comes about because the heat and particle flux vectors carry m^-2
+    # in their units, but they are always dotted with the gradient of a normalized radial
+    # coordinate. The gradient itself carries a m^-1 unit, and because the radial coordinates are
+    # normalized, they do not have any units. For presentations, it is suggested that you either
+    # use extensive units for fluxes or multiply the intensive values by RBar to recover the
+    # standard m^-2 units.
+
+    groups = [(['Er', 'dPhiHatdrHat'], phiBar / RBar), # V*m^-1
+              (['dPhiHatdpsiN', 'dPhiHatdrN'], phiBar), # V
+              (['dPhiHatdpsiHat'], phiBar / BBar / RBar**2), # V*T^-1*m^-2
+              (['FSABHat2'], BBar), # T^2
+              (['FSABFlow'], nBar * vBar * BBar), # T*m^-2*s^-1
+              (['FSABjHat'], e * nBar * vBar * BBar), # T*A*m^-2
+              (['FSABjHatOverRootFSAB2', 'FSABjHatOverB0'], e * nBar * vBar), # A*m^-2
+              (['particleFlux', 'classicalParticleFlux', 'classicalParticleFluxNoPhi1', 'totalParticleFlux'], nBar * vBar / RBar), # m^-3*s^-1
+              (['extensiveParticleFlux', 'extensiveClassicalParticleFlux', 'extensiveTotalParticleFlux'], nBar * vBar * RBar**2), # s^-1
+              (['heatFlux', 'classicalHeatFlux', 'classicalHeatFluxNoPhi1', 'totalHeatFlux'], mBar * nBar * vBar**3 / RBar), # J*m^-3*s^-1
+              (['extensiveHeatFlux', 'extensiveClassicalHeatFlux', 'extensiveTotalHeatFlux'], mBar * nBar * vBar**3 * RBar**2), # J*s^-1
+              (['momentumFlux'], mBar * nBar * vBar**2 * BBar / RBar), # Neoclassical, kg*T*m^-2*s^-2
+              (['extensiveMomentumFlux'], mBar * nBar * vBar**2 * BBar * RBar**2), # Neoclassical, kg*T*m*s^-2
+              (['radialCurrent'], e * nBar * vBar / RBar), # A*m^-3
+              (['extensiveRadialCurrent'], e * nBar * vBar * RBar**2)] # A
+
+    return {name:factor for names, factor in groups for name in names}
+
+def unitFactor(inVar, **refs):
+
+    '''
+    Inputs:
+        inVar: name (string) of a SFINCS variable, as for
+               fixOutputUnits.
+        refs: reference quantities, as for fixOutputUnits.
+    Outputs:
+        The factor that converts inVar to SI units.
+    '''
+
+    shouldHaveUnits = inVar.split('_')[0]
+
+    try:
+        return unitRegistry(**refs)[shouldHaveUnits]
+    except KeyError:
+        raise IOError('Conversion factor has not yet been specified for the variable {}.'.format(inVar))
+
 def fixOutputUnits(inVar, inFloat, mBar=1.67262192369e-27, BBar=1, RBar=1, nBar=1e20, TBar=1.602176634e-16, phiBar=1000):
 
     '''
     Inputs:
         inVar: name (string) of a SFINCS variable from its output (*.h5)
                file. Note that only a few variables are currently supported.
-        inFloat: float or numpy array; numerical value of inVar.
+        inFloat: float or numpy array; numerical value of inVar. Arrays of
+                 any shape (such as the (Nruns, Nspecies) arrays of a
+                 sfincsScan object) are converted in a single multiplication.
         mBar: reference mass. Default is the proton mass in kilograms.
               The default value is highly recommended.
         BBar: reference magnetic field in tesla.
@@ -211,73 +284,32 @@ def fixOutputUnits(inVar, inFloat, mBar=1.67262192369e-27, BBar=1, RBar=1, nBar=
         as inFloat.
     '''
 
-    from scipy.constants import e # elementary charge in Coulombs
-
-    # Important quantity
-    vBar = thermalVelocity(TBar, mBar) # m/s by default
-
-    # Identify inVar
-    if '_' not in inVar:
-        shouldHaveUnits = inVar
-    else:
-        shouldHaveUnits = inVar.split('_')[0]
-
-    # Convert to SI units 
-    # In the intensive radial fluxes, you will notice what appears to be an extra factor of m^-1.
-    # This is not an error. It comes about because the heat and particle flux vectors carry m^-2
-    # in their units, but they are always dotted with the gradient of a normalized radial
-    # coordinate. The gradient itself carries a m^-1 unit, and because the radial coordinates are
-    # normalized, they do not have any units. For presentations, it is suggested that you either
-    # use extensive units for fluxes or multiply the intensive values by RBar to recover the
-    # standard m^-2 units.
-    
-    if shouldHaveUnits in ['Er', 'dPhiHatdrHat']:
-        return phiBar / RBar * inFloat # V*m^-1
-    
-    elif shouldHaveUnits in ['dPhiHatdpsiN', 'dPhiHatdrN']:
-        return phiBar * inFloat # V
-
-    elif shouldHaveUnits == 'dPhiHatdpsiHat':
-        return phiBar / BBar / RBar**2 * inFloat # V*T^-1*m^-2
-    
-    elif shouldHaveUnits == 'FSABHat2':
-        return BBar * inFloat # T^2
+    return unitFactor(inVar, mBar=mBar, BBar=BBar, RBar=RBar, nBar=nBar, TBar=TBar, phiBar=phiBar) * inFloat
 
-    elif shouldHaveUnits == 'FSABFlow':
-        return nBar * vBar * BBar * inFloat # T*m^-2*s^-1
-    
-    elif shouldHaveUnits == 'FSABjHat':
-        return e * nBar * vBar * BBar * inFloat # T*A*m^-2
-
-    elif shouldHaveUnits in ['FSABjHatOverRootFSAB2', 'FSABjHatOverB0']:
-        return e * nBar * vBar * inFloat # A*m^-2
-     
-    elif shouldHaveUnits in ['particleFlux', 'classicalParticleFlux', 'classicalParticleFluxNoPhi1', 'totalParticleFlux']:
-        return nBar * vBar / RBar * inFloat # m^-3*s^-1
-    
-    elif shouldHaveUnits in ['extensiveParticleFlux', 'extensiveClassicalParticleFlux', 'extensiveTotalParticleFlux']:
-        return nBar * vBar * RBar**2 * inFloat # s^-1
-    
-    elif shouldHaveUnits in ['heatFlux', 'classicalHeatFlux', 'classicalHeatFluxNoPhi1', 'totalHeatFlux']:
-        return mBar * nBar * vBar**3 / RBar * inFloat # J*m^-3*s^-1
+def convertToPhysicalUnits(data, names=None):
 
-    elif shouldHaveUnits in ['extensiveHeatFlux', 'extensiveClassicalHeatFlux', 'extensiveTotalHeatFlux']:
-        return mBar * nBar * vBar**3 * RBar**2 * inFloat # J*s^-1
-    
-    elif shouldHaveUnits == 'momentumFlux': # Neoclassical 
-        return mBar * nBar * vBar**2 * BBar / RBar * inFloat # kg*T*m^-2*s^-2
+    '''
+    Inputs:
+        data: dictionary of SFINCS variables (floats or NumPy arrays),
+              such as the data loaded from an output (*.h5) file.
+        names: list of the keys of data to convert. If None, every
+               key that has a known conversion factor is converted.
+    Outputs:
+        Dictionary with the converted variables in SI units (using the
+        default reference quantities of fixOutputUnits). The other
+        entries of data are copied without changes.
+    '''
 
-    elif shouldHaveUnits == 'extensiveMomentumFlux': # Neoclassical
-        return mBar * nBar * vBar**2 * BBar * RBar**2 * inFloat # kg*T*m*s^-2
+    registry = unitRegistry()
 
-    elif shouldHaveUnits == 'radialCurrent':
-        return e * nBar * vBar / RBar * inFloat # A*m^-3
+    if names is None:
+        names = [name for name in data if name.split('_')[0] in registry]
 
-    elif shouldHaveUnits == 'extensiveRadialCurrent':
-        return e * nBar * vBar * RBar**2 * inFloat # A
+    out = dict(data)
+    for name in names:
+        out[name] = fixOutputUnits(name, data[name])
 
-    else:
-        raise IOError('Conversion factor has not yet been specified for the variable {}.'.format(inVar))
+    return out
 
 def convertRadDer(inputDerID, inputDerVal, outputDerID, aHat, psiAHat, psiN, XisPhi=False):
 
@@ -374,6 +406,65 @@ def checkConvergence(file):
 
     return f
 
+def summarizeRun(dataFile):
+
+    '''
+    Inputs:
+        Absolute path to a SFINCS output (*.h5) file.
+    Outputs:
+        If the file passes the checks in checkConvergence, a
+        dictionary with the quantities needed to spawn a new run
+        from it: the electric field and geometry ('Er', 'aHat',
+        'psiAHat', 'psiN'), whether Phi1 was included ('includedPhi1'),
+        and the magnitude of the extensive radial current ('absJr').
+        Otherwise, None. The file is only opened once and is closed
+        before returning.
+    '''
+
+    import numpy as np
+
+    try:
+        f = checkConvergence(dataFile)
+    except (IOError, KeyError, ValueError):
+        return None
+
+    with f:
+        out = {key:f[key][()] for key in ['aHat', 'psiAHat', 'psiN']}
+        out['Er'] = np.ravel(f['Er'][()])[-1] # ambipolarSolve runs store one value per iteration
+        out['includedPhi1'] = f['includePhi1'][()] == f['integerToRepresentTrue'][()]
+        radialCurrent_vm_psiHat = np.dot(f['Zs'][()], f['particleFlux_vm_psiHat'][()])
+        out['absJr'] = np.abs(f['VPrimeHat'][()] * np.ravel(radialCurrent_vm_psiHat)[-1]) # VPrimeHat = dVHat/dpsiHat
+
+    return out
+
+def summarizeRuns(dataFiles, numWorkers=None):
+
+    '''
+    Inputs:
+        dataFiles: list of absolute paths to SFINCS output (*.h5)
+                   files.
+        numWorkers: number of processes to use. If None, the number
+                    of processors is used.
+    Outputs:
+        List (one entry per file) of the outputs of summarizeRun.
+        The files are spread over a pool of processes, as in
+        rootPlots.plotRadii.
+    '''
+
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    if numWorkers == 1 or len(dataFiles) <= 1:
+        return [summarizeRun(dataFile) for dataFile in dataFiles]
+
+    try:
+        context = multiprocessing.get_context('fork')
+    except ValueError: # Forking is not available on every platform
+        context = None
+
+    with ProcessPoolExecutor(max_workers=numWorkers, mp_context=context) as pool:
+        return list(pool.map(summarizeRun, dataFiles))
+
 def combineAndSort(IVvec, DVarr):
 
     '''
@@ -702,3 +793,263 @@ def createVMECGrids(ns):
     halfgrid[0] = 0 
 
     return [halfgrid, fullgrid]
+
+def predictAlongRadius(knownRadii, knownVals, targetRadii):
+
+    '''
+    Inputs:
+        knownRadii: List or 1D NumPy array of radial coordinates
+                    at which a quantity (such as an ambipolar root)
+                    is known. NaN entries in knownVals are ignored.
+        knownVals: List or 1D NumPy array of the quantity at
+                   knownRadii.
+        targetRadii: List or 1D NumPy array of radial coordinates
+                     at which the quantity should be predicted.
+    Outputs:
+        1D NumPy array with the quantity linearly interpolated
+        to targetRadii. Outside the range of the known data,
+        the value on the closest known surface is used, since
+        extrapolating roots is not reliable. If no values are
+        known, the output is all NaN.
+    '''
+
+    import numpy as np
+
+    knownRadii = np.array(knownRadii, dtype=float)
+    knownVals = np.array(knownVals, dtype=float)
+    targetRadii = np.array(targetRadii, dtype=float)
+
+    goodInds = np.where(np.logical_not(np.isnan(knownVals)))
+    goodRadii = knownRadii[goodInds]
+    goodVals = knownVals[goodInds]
+
+    if goodRadii.size == 0:
+        return np.nan * np.zeros(targetRadii.shape)
+
+    sortInds = np.argsort(goodRadii)
+
+    return np.interp(targetRadii, goodRadii[sortInds], goodVals[sortInds])
+
+def oddResolution(value):
+
+    '''
+    Inputs:
+        value: (integer) resolution parameter, such as Ntheta.
+    Outputs:
+        value rounded up to the next odd integer (if it is not
+        odd already), and at least 3, as SFINCS requires for
+        Ntheta and Nzeta.
+    '''
+
+    return max(int(value) + 1 - int(value) % 2, 3)
+
+def coarsenResolution(value, factor, odd=False):
+
+    '''
+    Inputs:
+        value: (integer) resolution parameter, such as Nxi.
+        factor: multiplier (at most 1) on value.
+        odd: if True, the output is forced to be odd, as SFINCS
+             requires for Ntheta and Nzeta.
+    Outputs:
+        Reduced resolution parameter, which is at least 1 (or at
+        least 3 if odd is True).
+    '''
+
+    out = max(int(round(value * factor)), 1)
+
+    if odd:
+        out = oddResolution(out)
+
+    return out
+
+def resolutionLadder(baseValue, startFactor, stepFactor, maxFactor, odd=False):
+
+    '''
+    Inputs:
+        baseValue: (integer) base value of a resolution parameter,
+                   such as Nxi.
+        startFactor: multiplier on baseValue for the first step.
+        stepFactor: multiplier (greater than 1) from one step to
+                    the next.
+        maxFactor: multiplier on baseValue beyond which no more
+                   steps are taken.
+        odd: if True, every step is forced to be odd, as SFINCS
+             requires for Ntheta and Nzeta.
+    Outputs:
+        List of strictly increasing integer values of the resolution
+        parameter to try in an adaptive convergence study. Factors
+        that round to the same integer only appear once.
+    '''
+
+    out = []
+    factor = startFactor
+    while factor <= maxFactor * (1 + 1e-10):
+        value = max(int(round(baseValue * factor)), 1)
+        if odd:
+            value = oddResolution(value)
+        if len(out) == 0 or value > out[-1]:
+            out.append(value)
+        factor *= stepFactor
+
+    return out
+
+def clusteredPoints(numPoints, lower, upper, centers, widths, weights, numGrid=20001):
+
+    '''
+    Inputs:
+        numPoints: number of points to place.
+        lower: smallest allowed value.
+        upper: largest allowed value.
+        centers: list of values near which the points should cluster.
+        widths: list of (standard deviation) widths of the clusters,
+                one per center.
+        weights: list of the fractions of the points that should
+                 belong to each cluster, one per center. The rest of
+                 the points (at least some fraction must be left over)
+                 are spread uniformly between lower and upper.
+    Outputs:
+        Sorted 1D NumPy array of numPoints values between lower and
+        upper. They are the quantiles of a mixture of a uniform
+        distribution and Gaussians (truncated to [lower, upper]),
+        found by inverting the cumulative distribution function of
+        the mixture. The points are therefore dense near the
+        centers without ever leaving gaps elsewhere.
+    '''
+
+    import numpy as np
+    from scipy.stats import norm
+
+    if np.sum(weights) >= 1:
+        raise IOError('The cluster weights must sum to less than 1 so that some points are spread uniformly.')
+
+    grid = np.linspace(lower, upper, num=numGrid)
+    cdf = (1 - np.sum(weights)) * (grid - lower) / (upper - lower)
+    for center, width, weight in zip(centers, widths, weights):
+        clusterCdf = norm.cdf(grid, loc=center, scale=width)
+        clusterCdf = (clusterCdf - clusterCdf[0]) / (clusterCdf[-1] - clusterCdf[0]) # Truncate to [lower, upper]
+        cdf += weight * clusterCdf
+
+    quantiles = (np.arange(numPoints) + 0.5) / numPoints
+
+    return np.interp(quantiles, cdf, grid)
+
+def profileVariation(radialGrid, radialVar, gradFuncs, curvFuncs, curvWeight=0.5):
+
+    '''
+    Inputs:
+        radialGrid: 1D NumPy array of radii in terms of radialVar.
+        radialVar: name of the radial coordinate of radialGrid.
+                   This must be 'psiN' or 'rN'.
+        gradFuncs: list of functions that give the first derivative
+                   of each profile with respect to psiN.
+        curvFuncs: list of functions that give the second derivative
+                   of each profile with respect to psiN, in the same
+                   order as gradFuncs.
+        curvWeight: importance of the curvature of the profiles
+                    relative to their gradients.
+    Outputs:
+        1D NumPy array that is large where the profiles change
+        quickly (with respect to radialVar). The gradient and the
+        curvature of each profile are normalized by their largest
+        magnitude on radialGrid, so every profile counts equally
+        no matter its units.
+    '''
+
+    import numpy as np
+
+    radialGrid = np.array(radialGrid, dtype=float)
+    if radialVar == 'psiN':
+        psiN = radialGrid
+    elif radialVar == 'rN':
+        psiN = radialGrid ** 2
+    else:
+        raise IOError('The profile variation can only be calculated in terms of psiN or rN.')
+
+    variation = np.zeros(radialGrid.shape)
+    for gradFunc, curvFunc in zip(gradFuncs, curvFuncs):
+        grad = np.array(gradFunc(psiN))
+        curv = np.array(curvFunc(psiN))
+        if radialVar == 'rN': # Chain rule, with psiN = rN^2
+            curv = 2 * grad + 4 * psiN * curv
+            grad = 2 * radialGrid * grad
+        for vals, weight in ((np.abs(grad), 1), (np.abs(curv), curvWeight)):
+            if np.max(vals) > 0:
+                variation += weight * vals / np.max(vals)
+
+    return variation
+
+def placeByDensity(numPoints, grid, density, uniformFrac):
+
+    '''
+    Inputs:
+        numPoints: number of points to place.
+        grid: sorted 1D NumPy array spanning the interval in which
+              to place the points.
+        density: 1D NumPy array of non-negative values on grid,
+                 describing where points are wanted.
+        uniformFrac: fraction (between 0 and 1) of the points that
+                     are spread uniformly regardless of density.
+    Outputs:
+        Sorted 1D NumPy array of numPoints values, including both
+        ends of grid (if numPoints > 1). The points are evenly
+        spaced in the cumulative distribution of a mixture of a
+        uniform distribution and density, so a flat density gives
+        the same points as np.linspace.
+    '''
+
+    import numpy as np
+    from scipy.integrate import cumulative_trapezoid
+
+    grid = np.array(grid, dtype=float)
+    density = np.array(density, dtype=float)
+
+    uniformCdf = (grid - grid[0]) / (grid[-1] - grid[0])
+    densityCdf = cumulative_trapezoid(density, grid, initial=0)
+    if densityCdf[-1] > 0:
+        cdf = uniformFrac * uniformCdf + (1 - uniformFrac) * densityCdf / densityCdf[-1]
+    else:
+        cdf = uniformCdf
+
+    return np.interp(np.linspace(0, 1, num=numPoints), cdf, grid)
+
+def convergedValue(paramVals, quantities, tol):
+
+    '''
+    Inputs:
+        paramVals: 1D NumPy array of the values of a resolution
+                   parameter (such as Nxi) in a convergence scan.
+        quantities: 2D NumPy array with one row per entry of
+                    paramVals, containing the outputs (such as the
+                    fluxes of each species) whose convergence
+                    matters.
+        tol: largest relative difference for which two results
+             are considered to agree.
+    Outputs:
+        Smallest value in paramVals whose results, and the results
+        of every larger value, agree with the results of the
+        largest value within tol. Outputs that are exactly zero
+        for the largest value are ignored. If paramVals has a
+        single entry, that entry is returned.
+    '''
+
+    import numpy as np
+
+    paramVals = np.array(paramVals, dtype=float)
+    quantities = np.array(quantities, dtype=float).reshape(paramVals.size, -1)
+
+    order = np.argsort(paramVals)
+    paramVals = paramVals[order]
+    quantities = quantities[order]
+
+    reference = quantities[-1]
+    useCols = reference != 0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        diffs = relDiff(quantities[:,useCols], reference[useCols])
+    agrees = np.all(np.nan_to_num(diffs, nan=np.inf) <= tol, axis=1)
+
+    ind = paramVals.size - 1
+    while ind > 0 and agrees[ind - 1]:
+        ind -= 1
+
+    return paramVals[ind]
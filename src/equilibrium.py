@@ -0,0 +1,607 @@
+# This file contains functions that compare the inputs of a new SFINCS campaign (the magnetic geometry of each flux surface and the local profiles) with
+# those of a previous campaign, so that only the flux surfaces whose inputs have changed need to be run again. They also write reduced VMEC wout files, which
+# only contain the Fourier modes that a campaign's SFINCS runs can load, so that every job reads less from the shared filesystem. VMEC wout files in ASCII
+# format are converted to netCDF once (and cached by their contents), so that SFINCS and the Python scripts can all use the faster netCDF readers.
+
+def isNetcdfFile(fileName):
+
+    '''
+    Inputs:
+        fileName: name of a file, with path if necessary.
+    Outputs:
+        True if fileName is a (classic) netCDF file, False otherwise.
+        An error is raised for netCDF4 (HDF5) files, which cannot be
+        read by scipy.io.netcdf_file.
+    '''
+
+    with open(fileName, 'rb') as f:
+        magic = f.read(4)
+
+    if magic == b'\x89HDF':
+        raise IOError('{} is a netCDF4 file, which cannot be read here. Please convert it to the classic format first (for instance, with "nccopy -k classic").'.format(fileName))
+
+    return magic[:3] == b'CDF'
+
+def readAsciiWout(woutFile):
+
+    '''
+    Inputs:
+        woutFile: VMEC wout file in ASCII format (written by a VMEC
+                  version later than 8.0, which includes the Nyquist
+                  modes).
+    Outputs:
+        Dictionary of the quantities in woutFile, named as in wout
+        files in netCDF format. Each value is a tuple with the names
+        of the netCDF dimensions of the quantity and its value. Only
+        the quantities up to the Mercier criterion are read, which
+        includes everything that SFINCS and the scripts in this
+        repository use except the magnetic axis.
+    '''
+
+    import re
+    import numpy as np
+
+    with open(woutFile, 'r') as f:
+        lines = f.read().splitlines()
+    pos = [0]
+
+    def readLine():
+        if pos[0] >= len(lines):
+            raise IOError('{} ended unexpectedly. It may not be a complete VMEC wout file.'.format(woutFile))
+        pos[0] += 1
+        return lines[pos[0] - 1]
+
+    number = re.compile(r'[+-]?(?:\d+\.?\d*|\.\d+)(?:[eEdD]?[+-]\d+|[eEdD]\d+)?') # Fortran can leave out the "e" of exponents with three digits, and values can run together
+
+    def toFloat(token):
+        return float(re.sub(r'(?<=[0-9.])[eE]?(?=[+-])', 'e', token.replace('d', 'e').replace('D', 'e')))
+
+    def readValues(num): # Works like a Fortran list-directed READ: as many lines as necessary are read, and the rest of the last line is skipped
+        tokens = []
+        while len(tokens) < num:
+            tokens += number.findall(readLine())
+        return np.array([toFloat(token) for token in tokens[:num]])
+
+    firstLine = readLine()
+    if not firstLine.strip().upper().startswith('VMEC VERSION'):
+        raise IOError('{} is not a VMEC wout file in ASCII format.'.format(woutFile))
+    version = float(firstLine.split('=')[-1])
+    if version <= 8.0:
+        raise IOError('{} was written by VMEC version {}, but only ASCII wout files from versions later than 8.0 can be converted.'.format(woutFile, version))
+
+    out = {'version_':((), version)}
+    for name, val in zip(['wb', 'wp', 'gamma', 'pfac', 'rmax_surf', 'rmin_surf', 'zmax_surf'], readValues(7)):
+        out[name] = ((), val)
+    intNames = ['nfp', 'ns', 'mpol', 'ntor', 'mnmax', 'mnmax_nyq', 'itfsq', 'niter', 'lasym__logical__', 'lrecon__logical__', 'ier_flag']
+    intNames += ['imse', 'itse', 'nbsets', 'nobser', 'nextcur', 'nstore_seq']
+    ints = dict(zip(intNames, readValues(11).astype(int).tolist() + readValues(6).astype(int).tolist()))
+    if ints['ier_flag'] not in [0, 2, 11]: # Normal termination, too many iterations, and successful termination
+        raise IOError('According to {}, VMEC did not finish successfully (ier_flag = {}).'.format(woutFile, ints['ier_flag']))
+    ints['lasym__logical__'] = int(ints['lasym__logical__'] > 0)
+    ints['lrecon__logical__'] = int(ints['lrecon__logical__'] > 0)
+    ints['lfreeb__logical__'] = int(ints['nextcur'] > 0)
+    out.update({name:((), np.int32(val)) for name, val in ints.items()})
+    if ints['nbsets'] > 0:
+        _ = readValues(ints['nbsets'])
+    out['mgrid_file'] = (('dim_00200',), readLine().strip())
+
+    ns = ints['ns']
+    lasym = ints['lasym__logical__'] == 1
+    modeNames = ['rmnc', 'zmns', 'lmns'] + (['rmns', 'zmnc', 'lmnc'] if lasym else [])
+    nyqNames = ['bmnc', 'gmnc', 'bsubumnc', 'bsubvmnc', 'bsubsmns', 'bsupumnc', 'bsupvmnc']
+    if lasym:
+        nyqNames += ['bmns', 'gmns', 'bsubumns', 'bsubvmns', 'bsubsmnc', 'bsupumns', 'bsupvmns']
+    modes = {name:np.zeros((ns, ints['mnmax'])) for name in ['xm', 'xn'] + modeNames}
+    nyqModes = {name:np.zeros((ns, ints['mnmax_nyq'])) for name in ['xm_nyq', 'xn_nyq'] + nyqNames}
+    for js in range(ns):
+        for mn in range(ints['mnmax']):
+            if js == 0:
+                modes['xm'][0,mn], modes['xn'][0,mn] = readValues(2)
+            for name, val in zip(modeNames, np.append(readValues(3), readValues(3) if lasym else [])):
+                modes[name][js,mn] = val
+        for mn in range(ints['mnmax_nyq']):
+            if js == 0:
+                nyqModes['xm_nyq'][0,mn], nyqModes['xn_nyq'][0,mn] = readValues(2)
+            for name, val in zip(nyqNames, np.append(readValues(7), readValues(7) if lasym else [])):
+                nyqModes[name][js,mn] = val
+    for name, val in modes.items():
+        out[name] = (('mn_mode',), val[0]) if name in ['xm', 'xn'] else (('radius', 'mn_mode'), val)
+    for name, val in nyqModes.items():
+        out[name] = (('mn_mode_nyq',), val[0]) if name in ['xm_nyq', 'xn_nyq'] else (('radius', 'mn_mode_nyq'), val)
+
+    fullMesh = readValues(6 * ns).reshape((ns, 6))
+    for ind, name in enumerate(['iotaf', 'presf', 'phipf', 'phi', 'jcuru', 'jcurv']):
+        out[name] = (('radius',), fullMesh[:,ind])
+    halfMesh = np.vstack((np.zeros(10), readValues(10 * (ns - 1)).reshape((ns - 1, 10)))) # The first point of the half mesh is not used by VMEC
+    for ind, name in enumerate(['iotas', 'mass', 'pres', 'beta_vol', 'phips', 'buco', 'bvco', 'vp', 'over_r', 'specw']):
+        out[name] = (('radius',), halfMesh[:,ind])
+
+    for name, val in zip(['aspect', 'betatotal', 'betapol', 'betator', 'betaxis', 'b0'], readValues(6)):
+        out[name] = ((), val)
+    out['signgs'] = ((), np.int32(readValues(1)[0]))
+    out['input_extension'] = (('dim_00100',), readLine().strip())
+    for name, val in zip(['IonLarmor', 'volavgB', 'rbtor0', 'rbtor', 'ctor', 'Aminor_p', 'Rmajor_p', 'volume_p'], readValues(8)):
+        out[name] = ((), val)
+
+    mercier = np.zeros((ns, 5))
+    mercier[1:-1] = readValues(5 * (ns - 2)).reshape((ns - 2, 5))
+    for ind, name in enumerate(['DMerc', 'DShear', 'DWell', 'DCurr', 'DGeod']):
+        out[name] = (('radius',), mercier[:,ind])
+
+    return out
+
+def writeNetcdfWout(data, outFile):
+
+    '''
+    Inputs:
+        data: dictionary, as from readAsciiWout.
+        outFile: name of the netCDF file to write.
+    Outputs:
+        [outFile is written.]
+    '''
+
+    import numpy as np
+    from scipy.io import netcdf_file
+
+    with netcdf_file(outFile, mode='w') as f:
+        for name, (dims, val) in data.items():
+            if isinstance(val, str):
+                val = np.array(list(val.ljust(int(dims[0].split('_')[-1]))), dtype='S1')
+            val = np.asarray(val)
+            for dim, size in zip(dims, val.shape):
+                if dim not in f.dimensions:
+                    f.createDimension(dim, size)
+            var = f.createVariable(name, val.dtype, dims)
+            var[...] = val
+
+def netcdfWout(woutFile, cacheDir):
+
+    '''
+    Inputs:
+        woutFile: VMEC wout file in netCDF or ASCII format.
+        cacheDir: directory in which converted files are kept.
+    Outputs:
+        Name of a netCDF version of woutFile. This is woutFile itself
+        if it is already in netCDF format. Otherwise, it is a file in
+        cacheDir whose name contains the hash of the contents of
+        woutFile, which is only converted if it is not there already.
+    '''
+
+    from os import getpid, replace
+    from os.path import basename, isfile, join, splitext
+    from IO import makeDir
+    from resultCache import fileHash
+
+    if isNetcdfFile(woutFile):
+        return woutFile
+
+    outFile = join(cacheDir, '{}_{}.nc'.format(splitext(basename(woutFile))[0], fileHash(woutFile)[:16]))
+    if not isfile(outFile):
+        data = readAsciiWout(woutFile)
+        _ = makeDir(cacheDir)
+        tempFile = '{}.{}.tmp'.format(outFile, getpid()) # Jobs that convert the same file at the same time cannot corrupt it
+        writeNetcdfWout(data, tempFile)
+        replace(tempFile, outFile)
+
+    return outFile
+
+def openWout(woutFile, cacheDir=None):
+
+    '''
+    Inputs:
+        woutFile: VMEC wout file in netCDF or ASCII format.
+        cacheDir: as for netcdfWout. If None, a file in ASCII format
+                  is converted into a temporary directory, which is
+                  removed once the file has been read, so nothing is
+                  written anywhere else.
+    Outputs:
+        Open scipy.io.netcdf_file object for woutFile (or its netCDF
+        version, see netcdfWout). Its data is read into memory.
+    '''
+
+    from tempfile import TemporaryDirectory
+    from scipy.io import netcdf_file
+
+    def openNetcdf(netcdfFile):
+        try:
+            return netcdf_file(netcdfFile, mode='r', mmap=False)
+        except (TypeError, ValueError):
+            raise IOError('The equilibrium file {} could not be read as a VMEC wout file in netCDF format.'.format(netcdfFile))
+
+    if cacheDir is not None or isNetcdfFile(woutFile):
+        return openNetcdf(netcdfWout(woutFile, cacheDir))
+
+    with TemporaryDirectory() as tempDir:
+        return openNetcdf(netcdfWout(woutFile, tempDir))
+
+def loadWoutSpectrum(woutFile, Nyquist=2):
+
+    '''
+    Inputs:
+        woutFile: VMEC wout file (see openWout).
+        Nyquist: as for the <Nyquist> option of run.py. If 1, the
+                 modes whose mode numbers are larger than the largest
+                 ones in xm and xn are left out, as SFINCS does.
+    Outputs:
+        Dictionary with the normalized toroidal flux of the VMEC half
+        grid ('psiN'), the mode numbers ('xm' and 'xn'), the Fourier
+        coefficients of the magnetic field strength in tesla ('bmnc'
+        and, for stellarator-asymmetric equilibria, 'bmns', both with
+        shape (NpsiN, Nmodes)), and the rotational transform ('iota').
+    '''
+
+    import numpy as np
+    from dataProc import createVMECGrids
+
+    with openWout(woutFile) as f:
+        ns = int(f.variables['ns'][()])
+        xm = f.variables['xm_nyq'][()].astype(float)
+        xn = f.variables['xn_nyq'][()].astype(float)
+        keep = np.ones(xm.size, dtype=bool)
+        if Nyquist == 1:
+            keep = np.logical_and(np.abs(xm) <= np.max(np.abs(f.variables['xm'][()])), np.abs(xn) <= np.max(np.abs(f.variables['xn'][()])))
+        out = {'psiN':createVMECGrids(ns)[0][1:], 'xm':xm[keep], 'xn':xn[keep], 'bmnc':f.variables['bmnc'][()][1:,keep], 'iota':f.variables['iotas'][()][1:]} # The first half grid point is not used by VMEC
+        if 'bmns' in f.variables:
+            out['bmns'] = f.variables['bmns'][()][1:,keep]
+
+    return out
+
+def surfaceSpectrum(spectrum, psiN):
+
+    '''
+    Inputs:
+        spectrum: dictionary, as from loadWoutSpectrum.
+        psiN: normalized toroidal flux of a flux surface.
+    Outputs:
+        Dictionary with the Fourier coefficients of the magnetic field
+        strength on the flux surface (with (m, n, 'c' or 's') tuples as
+        keys), interpolated linearly between the VMEC surfaces (as
+        SFINCS does with VMECRadialOption = 0), and the rotational
+        transform ('iota').
+    '''
+
+    import numpy as np
+
+    out = {'iota':float(np.interp(psiN, spectrum['psiN'], spectrum['iota']))}
+    for parity, name in [('c', 'bmnc'), ('s', 'bmns')]:
+        if name not in spectrum:
+            continue
+        for ind, (m, n) in enumerate(zip(spectrum['xm'], spectrum['xn'])):
+            out[(m, n, parity)] = float(np.interp(psiN, spectrum['psiN'], spectrum[name][:,ind]))
+
+    return out
+
+def geometryChange(oldSurface, newSurface, minBmn=0.0):
+
+    '''
+    Inputs:
+        oldSurface, newSurface: dictionaries, as from surfaceSpectrum.
+        minBmn: Fourier coefficients smaller than this (in tesla) in
+                both oldSurface and newSurface are ignored, as they
+                would not be loaded by SFINCS (see <minBmn> in run.py).
+    Outputs:
+        Largest change in any Fourier coefficient of the magnetic field
+        strength, relative to the (0, 0) coefficient of newSurface, or
+        the relative change in the rotational transform, whichever is
+        larger.
+    '''
+
+    import numpy as np
+
+    B00 = np.abs(newSurface[(0.0, 0.0, 'c')])
+    change = np.abs(newSurface['iota'] - oldSurface['iota']) / max(np.abs(newSurface['iota']), np.finfo(float).tiny)
+
+    for key in set(oldSurface.keys()).union(newSurface.keys()):
+        if key == 'iota':
+            continue
+        oldVal = oldSurface.get(key, 0.0)
+        newVal = newSurface.get(key, 0.0)
+        if max(np.abs(oldVal), np.abs(newVal)) < minBmn:
+            continue
+        change = max(change, np.abs(newVal - oldVal) / B00)
+
+    return change
+
+def loadProfilesFile(profilesFile):
+
+    '''
+    Inputs:
+        profilesFile: profiles file written by run.py.
+    Outputs:
+        ID of the radial coordinate used in profilesFile (as in
+        generatePreamble) and a 2D NumPy array of its data, sorted by
+        radius.
+    '''
+
+    import numpy as np
+
+    with open(profilesFile, 'r') as f:
+        _ = f.readline()
+        radID = int(f.readline())
+    data = np.loadtxt(profilesFile, skiprows=2, ndmin=2)
+
+    return radID, data[np.argsort(data[:,0])]
+
+def profilesChange(oldProfiles, newProfiles, psiN):
+
+    '''
+    Inputs:
+        oldProfiles, newProfiles: outputs of loadProfilesFile.
+        psiN: normalized toroidal flux of a flux surface.
+    Outputs:
+        Largest relative change (between oldProfiles and newProfiles)
+        in the density or temperature of any species on the flux
+        surface, or in their radial derivatives with respect to psiN
+        (relative to the new density or temperature, which makes this
+        the change in the inverse gradient scale length).
+    '''
+
+    import numpy as np
+
+    local = []
+    for radID, data in [oldProfiles, newProfiles]:
+        if radID == 1:
+            radius = psiN
+            dRadiusdpsiN = 1
+        elif radID == 3:
+            radius = np.sqrt(psiN)
+            dRadiusdpsiN = 1 / (2 * np.sqrt(psiN))
+        else:
+            raise IOError('Profiles files are only compared if they use psiN or rN as their radial coordinate.')
+        vals = np.array([np.interp(radius, data[:,0], data[:,col]) for col in range(4, data.shape[1])]) # The first columns set up Er scans
+        ders = np.array([np.interp(radius, data[:,0], np.gradient(data[:,col], data[:,0])) for col in range(4, data.shape[1])]) * dRadiusdpsiN
+        local.append((vals, ders))
+
+    (oldVals, oldDers), (newVals, newDers) = local
+    if oldVals.size != newVals.size:
+        return np.inf # The species are different
+
+    scale = np.maximum(np.abs(newVals), np.finfo(float).tiny)
+
+    return float(np.max(np.append(np.abs(newVals - oldVals), np.abs(newDers - oldDers)) / np.append(scale, scale)))
+
+def namelistsMatch(oldNamelist, newNamelist):
+
+    '''
+    Inputs:
+        oldNamelist, newNamelist: input.namelist files of two
+                                  campaigns.
+    Outputs:
+        True if every parameter that is shared by all the flux
+        surfaces of a campaign (that is, everything except the
+        equilibrium file, the species parameters, and the flux
+        surface used for resolution scans) has the same value in
+        both files, False otherwise.
+    '''
+
+    from IO import parseNamelist
+    from resultCache import normalizeNamelistValue
+
+    params = []
+    for namelistFile in [oldNamelist, newNamelist]:
+        found = {}
+        for entry in parseNamelist(namelistFile):
+            if entry['name'] is None or entry['group'] == 'speciesparameters':
+                continue
+            name = entry['name'].lower()
+            if name == 'equilibriumfile' or name.endswith('_wish'):
+                continue
+            found[entry['group'] + '.' + name] = normalizeNamelistValue(entry['value'])
+        params.append(found)
+
+    return params[0] == params[1]
+
+def compareSurfaces(prevDir, newDir, newEqFile, surfaces, radialVarName, tol, minBmn=0.0, Nyquist=2):
+
+    '''
+    Inputs:
+        prevDir: top directory of a previous campaign (set up by
+                 run.py and sfincsScan).
+        newDir: directory in which run.py has written the profiles
+                and input.namelist files of the new campaign.
+        newEqFile: VMEC wout file of the new campaign (see openWout).
+        surfaces: 1D NumPy array of the flux surfaces of the new
+                  campaign.
+        radialVarName: 'psiN' or 'rN', the radial coordinate of
+                       surfaces.
+        tol: largest change in the geometry (see geometryChange) and
+             the profiles (see profilesChange) for which the results
+             of the previous campaign are reused.
+        minBmn, Nyquist: as for run.py.
+    Outputs:
+        List of dictionaries, one per flux surface, with the radial
+        value ('radVal'), the matching flux surface directory of the
+        previous campaign ('prevRadDir', None if there is none), the
+        changes in the geometry and profiles ('geometryChange' and
+        'profilesChange', NaN if they were not evaluated), and
+        whether the flux surface needs to be run again ('changed').
+    '''
+
+    import numpy as np
+    from os.path import basename, isabs, join
+    from IO import parseNamelist, namelistValue
+    from jobControl import findRadialDirs
+
+    if radialVarName not in ['psiN', 'rN']:
+        raise IOError('Flux surfaces can only be compared if they are given in psiN or rN.')
+
+    prevRadDirs, prevRadVals = findRadialDirs(prevDir)
+    prevRadDirs = [radDir for radDir in prevRadDirs if basename(radDir).split('_')[0] == radialVarName]
+    prevRadVals = np.array([float(basename(radDir).split('_')[-1]) for radDir in prevRadDirs])
+
+    out = [{'radVal':radVal, 'prevRadDir':None, 'geometryChange':np.nan, 'profilesChange':np.nan, 'changed':True} for radVal in surfaces]
+    for surface in out:
+        matches = np.flatnonzero(np.isclose(prevRadVals, surface['radVal'], rtol=0, atol=1e-4)) # The directory names are rounded by sfincsScan
+        if matches.size != 0:
+            surface['prevRadDir'] = prevRadDirs[matches[0]]
+
+    if all([surface['prevRadDir'] is None for surface in out]) or not namelistsMatch(join(prevDir, 'input.namelist'), join(newDir, 'input.namelist')):
+        return out
+
+    prevEqFile = namelistValue(parseNamelist(join(prevDir, 'input.namelist')), 'equilibriumFile').strip('"\'')
+    if not isabs(prevEqFile):
+        prevEqFile = join(prevDir, prevEqFile)
+    oldSpectrum = loadWoutSpectrum(prevEqFile, Nyquist=Nyquist)
+    newSpectrum = loadWoutSpectrum(newEqFile, Nyquist=Nyquist)
+    oldProfiles = loadProfilesFile(join(prevDir, 'profiles'))
+    newProfiles = loadProfilesFile(join(newDir, 'profiles'))
+
+    for surface in out:
+        if surface['prevRadDir'] is None:
+            continue
+        psiN = surface['radVal'] if radialVarName == 'psiN' else surface['radVal'] ** 2
+        surface['geometryChange'] = geometryChange(surfaceSpectrum(oldSpectrum, psiN), surfaceSpectrum(newSpectrum, psiN), minBmn=minBmn)
+        surface['profilesChange'] = profilesChange(oldProfiles, newProfiles, psiN)
+        surface['changed'] = max(surface['geometryChange'], surface['profilesChange']) > tol
+
+    return out
+
+def nyquistModesToKeep(f, psiNRange, minBmn=0.0, Nyquist=2):
+
+    '''
+    Inputs:
+        f: open netCDF file (from scipy.io.netcdf_file) of a VMEC wout
+           file.
+        psiNRange: list with the smallest and largest normalized
+                   toroidal flux of the flux surfaces of a campaign.
+        minBmn, Nyquist: as for run.py.
+    Outputs:
+        1D boolean NumPy array, with one entry per mode in xm_nyq and
+        xn_nyq, that is True for the modes that SFINCS may load on some
+        flux surface in psiNRange: the modes whose magnetic field
+        strength reaches minBmn on one of the VMEC surfaces that are
+        used for interpolation in psiNRange (with one extra surface on
+        either side), and, if Nyquist is 1, whose mode numbers are not
+        larger than the largest ones in xm and xn.
+    '''
+
+    import numpy as np
+    from dataProc import createVMECGrids
+
+    ns = int(f.variables['ns'][()])
+    halfGrid = createVMECGrids(ns)[0]
+    lowInd = max(np.searchsorted(halfGrid, psiNRange[0], side='right') - 2, 1) # The first half grid point is not used by VMEC
+    highInd = min(np.searchsorted(halfGrid, psiNRange[1], side='left') + 2, ns)
+
+    Bmn = np.abs(f.variables['bmnc'][()][lowInd:highInd])
+    if 'bmns' in f.variables:
+        Bmn = np.maximum(Bmn, np.abs(f.variables['bmns'][()][lowInd:highInd]))
+    keep = np.max(Bmn, axis=0) >= minBmn
+
+    xm = f.variables['xm_nyq'][()]
+    xn = f.variables['xn_nyq'][()]
+    keep[np.logical_and(xm == 0, xn == 0)] = True
+    if Nyquist == 1:
+        keep = np.logical_and(keep, np.logical_and(np.abs(xm) <= np.max(np.abs(f.variables['xm'][()])), np.abs(xn) <= np.max(np.abs(f.variables['xn'][()]))))
+
+    return keep
+
+def reduceWout(woutFile, outFile, psiNRange, minBmn=0.0, Nyquist=2):
+
+    '''
+    Inputs:
+        woutFile: VMEC wout file (see openWout).
+        outFile: name of the reduced wout file to write.
+        psiNRange, minBmn, Nyquist: as for nyquistModesToKeep.
+    Outputs:
+        [outFile is written. It is a copy of woutFile in which every
+        quantity that is expanded in the Nyquist modes (xm_nyq and
+        xn_nyq) only keeps the modes from nyquistModesToKeep. Every
+        flux surface is kept, since SFINCS builds its radial grid and
+        normalizations from all of them.]
+        The number of Nyquist modes that were kept and the number of
+        Nyquist modes in woutFile.
+    '''
+
+    import numpy as np
+    from scipy.io import netcdf_file
+
+    with openWout(woutFile) as f:
+        keep = nyquistModesToKeep(f, psiNRange, minBmn=minBmn, Nyquist=Nyquist)
+        modeDim = f.variables['xm_nyq'].dimensions[0]
+
+        with netcdf_file(outFile, mode='w', version=f.version_byte) as g:
+            for name, val in f._attributes.items():
+                setattr(g, name, val)
+            for dim, size in f.dimensions.items():
+                g.createDimension(dim, int(np.sum(keep)) if dim == modeDim else size)
+            for name, var in f.variables.items():
+                data = var[()]
+                if modeDim in var.dimensions:
+                    data = np.compress(keep, data, axis=var.dimensions.index(modeDim))
+                elif name == 'mnmax_nyq':
+                    data = np.sum(keep)
+                newVar = g.createVariable(name, var.typecode(), var.dimensions)
+                newVar[...] = data
+                for attr, val in var._attributes.items():
+                    setattr(newVar, attr, val)
+
+    return int(np.sum(keep)), keep.size
+
+def reducedWoutError(woutFile, reducedFile, psiN, minBmn=0.0, Nyquist=2):
+
+    '''
+    Inputs:
+        woutFile: VMEC wout file (see openWout).
+        reducedFile: reduced version of woutFile, as from reduceWout.
+        psiN: normalized toroidal flux of a test flux surface.
+        minBmn, Nyquist: as for run.py.
+    Outputs:
+        Largest difference between the two files on the test flux
+        surface (interpolated as in surfaceSpectrum), relative to the
+        largest value of the same quantity in woutFile. Every
+        quantity that is expanded in the Nyquist modes is compared
+        for every mode that SFINCS would load from woutFile on the
+        test flux surface (that is, modes with a magnetic field
+        strength of at least minBmn, and, if Nyquist is 1, mode numbers
+        that are not larger than the largest ones in xm and xn), and
+        every other quantity is
+        compared in full. A value of zero means that SFINCS would see
+        the same geometry on the test flux surface.
+    '''
+
+    import numpy as np
+    from scipy.io import netcdf_file
+    from dataProc import createVMECGrids
+
+    with openWout(woutFile) as f, netcdf_file(reducedFile, mode='r', mmap=False) as g:
+        modeDim = f.variables['xm_nyq'].dimensions[0]
+        halfGrid = createVMECGrids(int(f.variables['ns'][()]))[0][1:]
+        atSurface = lambda data: np.array([np.interp(psiN, halfGrid, data[1:,ind]) for ind in range(data.shape[1])])
+
+        modes = list(zip(f.variables['xm_nyq'][()], f.variables['xn_nyq'][()]))
+        reducedModes = list(zip(g.variables['xm_nyq'][()], g.variables['xn_nyq'][()]))
+        Bmn = np.abs(atSurface(f.variables['bmnc'][()]))
+        if 'bmns' in f.variables:
+            Bmn = np.maximum(Bmn, np.abs(atSurface(f.variables['bmns'][()])))
+        loaded = [ind for ind in range(len(modes)) if Bmn[ind] >= minBmn]
+        if Nyquist == 1:
+            maxM = np.max(np.abs(f.variables['xm'][()]))
+            maxN = np.max(np.abs(f.variables['xn'][()]))
+            loaded = [ind for ind in loaded if abs(modes[ind][0]) <= maxM and abs(modes[ind][1]) <= maxN]
+        if not all([modes[ind] in reducedModes for ind in loaded]):
+            return np.inf
+
+        error = 0.0
+        for name, var in f.variables.items():
+            if name not in g.variables:
+                return np.inf
+            data = np.asarray(var[()])
+            if data.dtype.kind not in 'fiu':
+                continue
+            if modeDim in var.dimensions:
+                if var.dimensions != (var.dimensions[0], modeDim) or data.shape[0] != halfGrid.size + 1:
+                    continue # Only the radial profiles of the Fourier coefficients are used by SFINCS
+                oldVals = atSurface(data)[loaded]
+                newVals = atSurface(g.variables[name][()])[[reducedModes.index(modes[ind]) for ind in loaded]]
+            elif name == 'mnmax_nyq':
+                continue
+            else:
+                oldVals = np.ravel(data)
+                newVals = np.ravel(g.variables[name][()])
+            if oldVals.size == 0:
+                continue
+            scale = max(np.max(np.abs(oldVals)), np.finfo(float).tiny)
+            error = max(error, np.max(np.abs(newVals - oldVals)) / scale)
+
+    return error
@@ -0,0 +1,214 @@
+# This file contains functions for monitoring and submitting SFINCS runs.
+
+def runIsFinished(runDir, fileName='sfincsOutput.h5'):
+
+    '''
+    Inputs:
+        runDir: directory of a single SFINCS run.
+        fileName: name of the SFINCS output file.
+    Outputs:
+        True if the output file exists and SFINCS has marked it
+        as finished, False otherwise. Files that cannot be opened
+        (for instance, because SFINCS is still writing them) are
+        treated as unfinished.
+    '''
+
+    import h5py
+    from os.path import join, isfile
+
+    outFile = join(runDir, fileName)
+
+    if not isfile(outFile):
+        return False
+
+    try:
+        with h5py.File(outFile, 'r') as f:
+            if 'finished' not in f:
+                return False
+            return bool(f['finished'][()] == f['integerToRepresentTrue'][()])
+    except (OSError, KeyError):
+        return False
+
+def snapshotRuns(radDir, previous=None, fileName='sfincsOutput.h5'):
+
+    '''
+    Inputs:
+        radDir: directory containing the electric field subdirectories
+                for a single flux surface.
+        previous: output of a previous call to this function for the
+                  same directory. Output files whose modification time
+                  has not changed are not opened again.
+        fileName: name of the SFINCS output file.
+    Outputs:
+        Dictionary with one entry for each run subdirectory (that
+        is, each subdirectory containing an input.namelist file).
+        Each entry is a tuple containing the modification time of
+        the output file (None if it does not exist) and a boolean
+        indicating whether the run has finished.
+    '''
+
+    from os import scandir
+    from os.path import join, isfile, getmtime
+
+    if previous is None:
+        previous = {}
+
+    out = {}
+    for entry in scandir(radDir):
+        if not entry.is_dir() or not isfile(join(entry.path, 'input.namelist')):
+            continue
+        outFile = join(entry.path, fileName)
+        try:
+            mtime = getmtime(outFile)
+        except OSError:
+            out[entry.name] = (None, False)
+            continue
+        if entry.name in previous and previous[entry.name][0] == mtime:
+            out[entry.name] = previous[entry.name]
+        else:
+            out[entry.name] = (mtime, runIsFinished(entry.path, fileName=fileName))
+
+    return out
+
+async def submitJob(runDir, launchCommand='sbatch', jobFile='job.sfincsScan', cacheFile=None):
+
+    '''
+    Inputs:
+        runDir: directory containing the job file to submit.
+        launchCommand: command used to submit the job file.
+        jobFile: name of the job file.
+        cacheFile: if not None, the result cache (see resultCache.py)
+                   is checked first. If it contains a finished run
+                   with the same inputs, its output is linked into
+                   runDir and nothing is submitted.
+    Outputs:
+        Standard output of the submission command, as a string.
+        An IOError is raised if the submission fails.
+    '''
+
+    import asyncio
+    from os import environ
+
+    if cacheFile is not None:
+        from resultCache import reuseCachedRuns
+        if len(reuseCachedRuns(cacheFile, [runDir])) == 0:
+            return 'The output of an identical run was linked from the result cache {}.'.format(cacheFile)
+
+    proc = await asyncio.create_subprocess_exec(launchCommand, jobFile, cwd=runDir, env=dict(environ), stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    stdout, stderr = await proc.communicate()
+
+    if proc.returncode != 0:
+        raise IOError('Error submitting the file {}/{} with {}: {}'.format(runDir, jobFile, launchCommand, stderr.decode().strip()))
+
+    return stdout.decode().strip()
+
+def findRadialDirs(sfincsDir, excludeDir=None):
+
+    '''
+    Inputs:
+        sfincsDir: top directory of a SFINCS radial and electric
+                   field scan.
+        excludeDir: directory inside sfincsDir (such as the output
+                    directory of chooseErs.py) that should not be
+                    treated as a flux surface.
+    Outputs:
+        List of the flux surface subdirectories in sfincsDir and
+        list of the radial values parsed from their names (NaN if
+        a name cannot be parsed), both sorted by radial value.
+    '''
+
+    import numpy as np
+    from os import scandir
+    from os.path import abspath, basename
+
+    radDirs = []
+    for entry in scandir(sfincsDir):
+        if entry.is_dir() and (excludeDir is None or abspath(entry.path) != abspath(excludeDir)):
+            radDirs.append(entry.path)
+
+    def radialValue(radDir):
+        try:
+            return float(basename(radDir).split('_')[-1])
+        except ValueError:
+            return np.nan
+
+    radVals = [radialValue(radDir) for radDir in radDirs]
+    sortInds = np.argsort(radVals)
+
+    return [radDirs[ind] for ind in sortInds], [radVals[ind] for ind in sortInds]
+
+def groupRunsByRadius(dataFiles, sfincsDir):
+
+    '''
+    Inputs:
+        dataFiles: list of SFINCS output (*.h5) files inside sfincsDir,
+                   as from IO.findFiles.
+        sfincsDir: top directory of a SFINCS radial (or radial and
+                   electric field) scan.
+    Outputs:
+        Dictionary with the flux surface subdirectories of sfincsDir
+        as keys. Each value is a list of the files in dataFiles that
+        belong to that flux surface: either the output in the flux
+        surface directory itself, or the outputs in its electric field
+        subdirectories. The files are grouped by the first component
+        of their path relative to sfincsDir, so a directory name that
+        is a prefix of another one is never confused with it.
+    '''
+
+    from os.path import join, relpath, sep
+
+    groups = {}
+    depths = {}
+    for dataFile in dataFiles:
+        pathParts = relpath(dataFile, sfincsDir).split(sep)
+        radDir = join(sfincsDir, pathParts[0])
+        depths.setdefault(radDir, set()).add(len(pathParts)) # 2 if only radial directories are present, 3 if radial and Er directories are present
+        groups.setdefault(radDir, []).append(dataFile)
+
+    for radDir, depth in depths.items():
+        if not (depth == set([2]) or depth == set([3])):
+            raise IOError('The structure of the directory {} seems to be irregular.'.format(sfincsDir))
+
+    return groups
+
+def outputStamps(snapshot):
+
+    '''
+    Inputs:
+        snapshot: dictionary, as from snapshotRuns.
+    Outputs:
+        Dictionary with the modification time of the output file
+        of every run that has one. Runs that have not produced
+        an output yet are left out, so setting up new runs does
+        not change the result until they start writing data.
+    '''
+
+    return {name:run[0] for name, run in snapshot.items() if run[0] is not None}
+
+def pendingValues(snapshot, varName):
+
+    '''
+    Inputs:
+        snapshot: dictionary, as from snapshotRuns.
+        varName: name of the scanned variable, such as the one used
+                 for the electric field.
+    Outputs:
+        1D NumPy array of the values of varName (in SFINCS internal
+        units) for the runs without an output file. The values are
+        parsed from the run directory names, which are varName
+        followed by the value. Names that do not follow this
+        pattern are ignored.
+    '''
+
+    import numpy as np
+
+    vals = []
+    for name, run in snapshot.items():
+        if run[0] is not None or not name.startswith(varName):
+            continue
+        try:
+            vals.append(float(name[len(varName):]))
+        except ValueError:
+            continue
+
+    return np.array(vals)
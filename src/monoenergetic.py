@@ -0,0 +1,260 @@
+# This file contains functions for a database of the monoenergetic transport coefficients calculated by SFINCS (RHSMode = 3), and for the energy
+# convolution that turns these coefficients into the fluxes of any set of species. The convolution follows Beidler et al, Nuclear Fusion 51 (2011) 076001.
+
+def buildDatabase(radDirs):
+
+    '''
+    Inputs:
+        radDirs: list of flux surface directories, each containing
+                 monoenergetic SFINCS runs (as set up by
+                 scanMonoenergetic.py) in its subdirectories. Every
+                 flux surface must use the same grid of nuPrime and
+                 EStar values.
+    Outputs:
+        Dictionary of NumPy arrays. The 'nuPrime' and 'EStar' keys
+        contain the (sorted) grids, the 'D' key contains the 2x2
+        monoenergetic transport matrix for each flux surface and grid
+        point (shape (Nradii, NnuPrime, NEStar, 2, 2), nan where a run
+        is missing or unfinished), and the other keys contain the
+        geometric quantities of each flux surface that are needed for
+        the convolution.
+    '''
+
+    import numpy as np
+    from sfincsOutputLib import sfincsScan
+
+    geomNames = ['psiN', 'rN', 'rHat', 'psiAHat', 'GHat', 'IHat', 'iota', 'B0OverBBar']
+    runs = []
+    for radDir in radDirs:
+        try:
+            ds = sfincsScan(radDir, verbose=0)
+        except SystemExit: # sfincsScan exits if it finds something it does not like
+            raise IOError('The monoenergetic runs in {} could not be loaded.'.format(radDir))
+        if ds.RHSMode != 3:
+            raise IOError('The runs in {} are not monoenergetic (RHSMode = 3) runs.'.format(radDir))
+        runs.append(ds)
+
+    nuGrid = np.unique(runs[0].nuPrime)
+    EGrid = np.unique(runs[0].EStar)
+    if nuGrid.size < 2 or EGrid.size < 2:
+        raise IOError('At least two values of both nuPrime and EStar are needed in {}.'.format(radDirs[0]))
+
+    out = {'nuPrime':nuGrid, 'EStar':EGrid, 'D':np.nan * np.zeros((len(runs), nuGrid.size, EGrid.size, 2, 2))}
+    out.update({name:np.zeros(len(runs)) for name in geomNames})
+    for radInd, (radDir, ds) in enumerate(zip(radDirs, runs)):
+        if not (np.all(np.isin(ds.nuPrime, nuGrid)) and np.all(np.isin(ds.EStar, EGrid))):
+            raise IOError('The runs in {} do not use the same grid of nuPrime and EStar as the runs in {}.'.format(radDir, radDirs[0]))
+        for name in geomNames:
+            out[name][radInd] = np.atleast_1d(getattr(ds, name))[0]
+        for ind in range(ds.Nruns):
+            if ds.transportMatrix[ind] is not None:
+                out['D'][radInd, np.searchsorted(nuGrid, ds.nuPrime[ind]), np.searchsorted(EGrid, ds.EStar[ind])] = ds.transportMatrix[ind]
+
+    return out
+
+def saveDatabase(databaseFile, database):
+
+    '''
+    Inputs:
+        databaseFile: name of the file (with path if necessary) in
+                      which to save the database.
+        database: dictionary, as from buildDatabase.
+    Outputs:
+        [The database is saved in compressed NumPy format.]
+    '''
+
+    import numpy as np
+
+    with open(databaseFile, 'wb') as f:
+        np.savez_compressed(f, **database)
+
+def loadDatabase(databaseFile):
+
+    '''
+    Inputs:
+        databaseFile: file written by saveDatabase.
+    Outputs:
+        Dictionary, as from buildDatabase.
+    '''
+
+    import numpy as np
+
+    with np.load(databaseFile) as data:
+        return {key:data[key] for key in data.files}
+
+def interpolateD11(database, radInd, nuPrime, EStar):
+
+    '''
+    Inputs:
+        database: dictionary, as from buildDatabase.
+        radInd: index of the flux surface in database.
+        nuPrime: NumPy array of normalized collisionalities.
+        EStar: NumPy array (of the same shape as nuPrime) of
+               normalized radial electric fields.
+    Outputs:
+        NumPy array of the monoenergetic radial transport coefficient
+        (the magnitude of the first element of the transport matrix),
+        interpolated linearly in the logarithms of nuPrime and the
+        coefficient. Values outside of the grid are clipped to its
+        edges. If the grid only contains EStar >= 0, the coefficient
+        is assumed to be even in EStar. An IOError is raised if
+        nuPrime is not positive or either input is not finite.
+    '''
+
+    import numpy as np
+    from scipy.interpolate import RegularGridInterpolator
+
+    nuGrid = database['nuPrime']
+    EGrid = database['EStar']
+    D11 = np.abs(database['D'][radInd,:,:,0,0])
+    if np.any(np.isnan(D11)) or np.any(D11 == 0):
+        raise IOError('The database is missing coefficients for flux surface {}.'.format(radInd))
+
+    if not (np.all(np.isfinite(nuPrime)) and np.all(nuPrime > 0) and np.all(np.isfinite(EStar))):
+        raise IOError('The coefficients can only be interpolated for finite values of EStar and finite, positive values of nuPrime.')
+
+    if np.min(EGrid) >= 0:
+        EStar = np.abs(EStar)
+    logNu = np.clip(np.log10(nuPrime), np.log10(nuGrid[0]), np.log10(nuGrid[-1]))
+    EStar = np.clip(EStar, EGrid[0], EGrid[-1])
+
+    interp = RegularGridInterpolator((np.log10(nuGrid), EGrid), np.log10(D11))
+
+    return 10 ** interp(np.stack((logNu, EStar), axis=-1))
+
+def collisionFrequencies(species, K):
+
+    '''
+    Inputs:
+        species: list of dictionaries, one per species, containing the
+                 density (key 'n', in units of 10^20 m^-3), temperature
+                 (key 't', in keV), charge number (key 'z'), and mass
+                 (key 'm', in proton masses) on a single flux surface.
+        K: 1D NumPy array of normalized kinetic energies.
+    Outputs:
+        2D NumPy array (Nspecies, NK) of the total pitch-angle
+        scattering frequency (in Hz) of each species with every
+        species (including itself) at each energy.
+    '''
+
+    import numpy as np
+    from dataProc import nu_ab
+
+    out = np.zeros((len(species), len(K)))
+    for a, aSpec in enumerate(species):
+        for kInd, KVal in enumerate(K):
+            out[a, kInd] = sum([nu_ab(dict(aSpec), dict(bSpec), KVal) for bSpec in species])
+
+    return out
+
+def convolveFluxes(database, radInd, species, Ers, numEnergies=32):
+
+    '''
+    Inputs:
+        database: dictionary, as from buildDatabase.
+        radInd: index of the flux surface in database.
+        species: list of dictionaries, as for collisionFrequencies,
+                 which must also contain the radial derivatives of the
+                 density and temperature with respect to psiHat (keys
+                 'dndpsiHat' and 'dtdpsiHat', in the same units).
+        Ers: 1D NumPy array of radial electric field values (Er in
+             SFINCS units, which is -dPhiHatdrHat) at which to
+             evaluate the fluxes.
+        numEnergies: number of Gauss-Laguerre quadrature points used
+                     for the energy integrals.
+    Outputs:
+        Particle fluxes and heat fluxes in the direction of rHat (2D
+        NumPy arrays with shape (NEr, Nspecies)) and the radial current
+        (1D NumPy array with length NEr). The monoenergetic coefficient is assumed to be
+        normalized by a factor that scales with m^2 v^3 / Z^2 (the
+        drift velocity squared divided by the transit frequency) times
+        geometric quantities, as is conventional. The geometric
+        quantities are the same for every species on a flux surface,
+        so they are left out: the outputs are only correct up to a
+        factor that is shared by every species on a flux surface.
+        This does not affect the roots of the radial current or their
+        stability.
+    '''
+
+    import numpy as np
+    from dataProc import convertRadDer, thermalVelocity
+
+    K, weights = np.polynomial.laguerre.laggauss(numEnergies)
+    kernel = 2 / np.sqrt(np.pi) * weights * np.sqrt(K) # Integrates against sqrt(K) exp(-K), as for a Maxwellian
+
+    GHat = database['GHat'][radInd]
+    GPlusIotaI = GHat + database['iota'][radInd] * database['IHat'][radInd]
+    iota = database['iota'][radInd]
+    B0 = database['B0OverBBar'][radInd]
+    aHat = database['rHat'][radInd] / database['rN'][radInd]
+    drHatdpsiHat = convertRadDer(2, 1, 0, aHat, database['psiAHat'][radInd], database['psiN'][radInd])
+    dPhiHatdpsiHat = -drHatdpsiHat * np.array(Ers)
+    dPhidpsi = dPhiHatdpsiHat * 1000 # V/Wb
+
+    nus = collisionFrequencies(species, K)
+    particleFluxes = np.zeros((len(Ers), len(species)))
+    heatFluxes = np.zeros((len(Ers), len(species)))
+    for a, spec in enumerate(species):
+        v = thermalVelocity(spec['t'] * K, spec['m'], units='keV_mp')
+        nuPrime = nus[a] * np.abs(GPlusIotaI) / (v * B0) # As in SFINCS, whose nu_n = nuPrime * B0OverBBar / |GHat + iota * IHat|
+        EStar = GHat / (iota * v * B0) * dPhidpsi[:,np.newaxis] # As in SFINCS, whose dPhiHatdpsiHat is proportional to EStar * iota / GHat, so the sign follows the field direction
+        D11 = interpolateD11(database, radInd, np.broadcast_to(nuPrime, EStar.shape), EStar) * spec['m'] ** 2 * v ** 3 / spec['z'] ** 2
+
+        L11 = D11 @ kernel
+        L12 = D11 @ (kernel * K)
+        L22 = D11 @ (kernel * K ** 2)
+
+        A1 = spec['dndpsiHat'] / spec['n'] + spec['z'] * dPhiHatdpsiHat / spec['t'] - 1.5 * spec['dtdpsiHat'] / spec['t']
+        A2 = spec['dtdpsiHat'] / spec['t']
+        particleFluxes[:,a] = -spec['n'] * (L11 * A1 + L12 * A2) * drHatdpsiHat # Fluxes in the direction of rHat, as for particleFlux_vm_rHat
+        heatFluxes[:,a] = -spec['n'] * spec['t'] * (L12 * A1 + L22 * A2) * drHatdpsiHat
+
+    Jr = particleFluxes @ np.array([spec['z'] for spec in species])
+
+    return particleFluxes, heatFluxes, Jr
+
+def loadSpecies(profilesFile, psiN, psiAHat, assumedSpeciesMass, assumedSpeciesCharge):
+
+    '''
+    Inputs:
+        profilesFile: BEAMS3D input file with the profiles and the
+                      ion species, as for run.py.
+        psiN: 1D NumPy array of the flux surfaces at which to evaluate
+              the profiles.
+        psiAHat: 1D NumPy array of the value of psiAHat for each
+                 flux surface in psiN.
+        assumedSpeciesMass: mass (in kg) of the species that is added
+                            to the species in profilesFile (normally
+                            electrons), as for run.py.
+        assumedSpeciesCharge: charge (in units of the proton charge)
+                              of that species.
+    Outputs:
+        List with one entry per flux surface, each of which is a list
+        of dictionaries (one per species, as for convolveFluxes) in
+        SFINCS units.
+    '''
+
+    from IO import cleanStrings, listifyBEAMS3DFile, makeProfileNames, extractProfileData, extractScalarData, sortProfileFunctions
+    from dataProc import scaleInputData, nonlinearInterp
+
+    listifiedInFile = listifyBEAMS3DFile(profilesFile)
+    profileData = scaleInputData(extractProfileData(listifiedInFile, makeProfileNames(cleanStrings(['NE', 'NI', 'TE', 'TI']))))
+    valFuncs = sortProfileFunctions(nonlinearInterp(profileData, {key:0 for key in profileData}, k=3))
+    derFuncs = sortProfileFunctions(nonlinearInterp(profileData, {key:1 for key in profileData}, k=3))
+
+    scalarData = extractScalarData(listifiedInFile, cleanStrings(['NI_AUX_M', 'NI_AUX_Z']))
+    scalarData['m'].insert(0, assumedSpeciesMass)
+    scalarData['z'].insert(0, assumedSpeciesCharge)
+    scalarData = scaleInputData(scalarData, profiles=False)
+    if len(scalarData['m']) != len(valFuncs) // 2:
+        raise IOError('The number of species with profiles in {} does not match the number of species with a mass and charge.'.format(profilesFile))
+
+    out = []
+    for psiNVal, psiAHatVal in zip(psiN, psiAHat):
+        species = []
+        for specInd, (m, z) in enumerate(zip(scalarData['m'], scalarData['z'])):
+            species.append({'n':float(valFuncs[2*specInd](psiNVal)), 't':float(valFuncs[2*specInd + 1](psiNVal)), 'z':z, 'm':m,
+                            'dndpsiHat':float(derFuncs[2*specInd](psiNVal)) / psiAHatVal, 'dtdpsiHat':float(derFuncs[2*specInd + 1](psiNVal)) / psiAHatVal})
+        out.append(species)
+
+    return out
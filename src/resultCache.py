@@ -0,0 +1,315 @@
+# This file contains functions for a content-addressed cache of SFINCS results. Each finished run is recorded under a hash of its effective inputs (the
+# normalized input.namelist, the contents of its equilibrium file, and its row of the profiles file), so physically identical runs in later campaigns can
+# reuse its output instead of being run again.
+
+def fileHash(fileName, cache=None):
+
+    '''
+    Inputs:
+        fileName: name of a file, with path if necessary.
+        cache: dictionary, as from loadResultCache. If given, the
+               hash is only recomputed if the size or modification
+               time of the file have changed since it was last hashed.
+    Outputs:
+        SHA-256 hash (hexadecimal string) of the contents of fileName.
+    '''
+
+    import hashlib
+    from os import stat
+    from os.path import abspath
+
+    info = stat(fileName)
+    stamp = [info.st_size, info.st_mtime]
+    key = abspath(fileName)
+    if cache is not None and key in cache['files'] and cache['files'][key][:2] == stamp:
+        return cache['files'][key][2]
+
+    h = hashlib.sha256()
+    with open(fileName, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    out = h.hexdigest()
+
+    if cache is not None:
+        cache['files'][key] = stamp + [out]
+
+    return out
+
+def normalizeNamelistValue(value):
+
+    '''
+    Inputs:
+        value: value (string) of a namelist parameter, as from
+               IO.parseNamelist.
+    Outputs:
+        String in which every number is written in the same way
+        (so that 1d-6, 1.0E-06, and 0.000001 are identical) and
+        logicals are written in lowercase. Strings are left alone.
+    '''
+
+    if value.startswith('"') or value.startswith("'"):
+        return value
+
+    tokens = []
+    for token in value.replace(',', ' ').split():
+        try:
+            tokens.append(repr(float(token.lower().replace('d', 'e'))))
+        except ValueError:
+            tokens.append(token.lower())
+
+    return ' '.join(tokens)
+
+def profilesRow(runDir, parsed, numDirsUp=2):
+
+    '''
+    Inputs:
+        runDir: directory of a single SFINCS run.
+        parsed: contents of the input.namelist file of the run, as
+                from IO.parseNamelist.
+        numDirsUp: number of parent directories of runDir in which
+                   to look for the profiles file (as written by
+                   run.py), after runDir itself.
+    Outputs:
+        List of strings with the densities and temperatures of every
+        species on the flux surface of the run, interpolated from the
+        profiles file, or None if no profiles file was found. If the
+        flux surface cannot be located in the profiles file, the hash
+        of the whole file is output instead (as a single string).
+    '''
+
+    import numpy as np
+    from os.path import abspath, dirname, isfile, join
+    from IO import namelistValue, radialVarDict
+
+    searchDir = abspath(runDir)
+    for _ in range(numDirsUp + 1):
+        if isfile(join(searchDir, 'profiles')):
+            break
+        searchDir = dirname(searchDir)
+    else:
+        return None
+    profilesFile = join(searchDir, 'profiles')
+
+    data = np.loadtxt(profilesFile, skiprows=2, ndmin=2)
+    with open(profilesFile, 'r') as f:
+        _ = f.readline()
+        profilesRadID = int(f.readline())
+
+    runRadID = namelistValue(parsed, 'inputRadialCoordinate')
+    runRadID = 3 if runRadID is None else int(runRadID) # 3 is the SFINCS default
+    radius = namelistValue(parsed, radialVarDict()[runRadID] + '_wish')
+    if radius is None:
+        return [fileHash(profilesFile)]
+    radius = float(normalizeNamelistValue(radius))
+
+    if runRadID == 3 and profilesRadID == 1:
+        radius = radius ** 2 # psiN = rN^2
+    elif runRadID == 1 and profilesRadID == 3:
+        radius = np.sqrt(radius)
+    elif runRadID != profilesRadID: # psiHat and rHat cannot be converted without the equilibrium
+        return [fileHash(profilesFile)]
+
+    sortInds = np.argsort(data[:,0])
+    return ['{:.10g}'.format(np.interp(radius, data[sortInds,0], data[sortInds,col])) for col in range(4, data.shape[1])] # The first columns set up Er scans
+
+def inputHash(runDir, cache=None):
+
+    '''
+    Inputs:
+        runDir: directory of a single SFINCS run, containing its
+                input.namelist file.
+        cache: dictionary, as from loadResultCache, used to avoid
+               rehashing large equilibrium files.
+    Outputs:
+        SHA-256 hash (hexadecimal string) of the effective inputs of
+        the run: every parameter in input.namelist (normalized, and
+        independent of comments, ordering, and case), the contents of
+        the equilibrium file, and the profiles of the run's flux
+        surface. None is output if the equilibrium file cannot be
+        found, since the run cannot be identified reliably.
+    '''
+
+    import hashlib
+    import json
+    from os.path import join, isfile, isabs
+    from IO import parseNamelist
+
+    parsed = parseNamelist(join(runDir, 'input.namelist'))
+
+    params = {}
+    for entry in parsed:
+        if entry['name'] is None:
+            continue
+        name = entry['name'].lower()
+        value = normalizeNamelistValue(entry['value'])
+        if name == 'equilibriumfile':
+            eqFile = entry['value'].strip('"\'')
+            if not isabs(eqFile):
+                eqFile = join(runDir, eqFile)
+            if not isfile(eqFile):
+                return None
+            value = fileHash(eqFile, cache=cache)
+        params[entry['group'] + '.' + name] = value # If a parameter is repeated, the last value wins, as in Fortran
+
+    canonical = json.dumps({'namelist':params, 'profiles':profilesRow(runDir, parsed)}, sort_keys=True)
+
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+def loadResultCache(cacheFile):
+
+    '''
+    Inputs:
+        cacheFile: JSON file written by saveResultCache.
+    Outputs:
+        Dictionary with the finished outputs ('outputs', with the
+        input hashes as keys and the output files as values), the
+        outputs that have already been examined ('seen', with their
+        modification times), and the file hashes ('files').
+    '''
+
+    from IO import loadCache
+
+    cache = loadCache(cacheFile)
+    for key in ['outputs', 'seen', 'files']:
+        cache.setdefault(key, {})
+
+    return cache
+
+def saveResultCache(cacheFile, cache):
+
+    '''
+    Inputs:
+        cacheFile: JSON file in which to save cache.
+        cache: dictionary, as from loadResultCache.
+    Outputs:
+        [cacheFile is written.]
+    '''
+
+    from IO import saveCache
+
+    saveCache(cacheFile, cache)
+
+def lockResultCache(cacheFile):
+
+    '''
+    Inputs:
+        cacheFile: JSON file of the cache.
+    Outputs:
+        Open lock file, which holds an exclusive lock on the cache
+        until it is closed. The cache can be shared between campaigns,
+        so it should only be loaded, modified, and saved while the
+        lock is held (for instance, in a "with" block).
+    '''
+
+    import fcntl
+
+    lockFile = open(cacheFile + '.lock', 'a')
+    fcntl.flock(lockFile, fcntl.LOCK_EX)
+
+    return lockFile
+
+def registerRuns(cacheFile, sfincsDir, fileName='sfincsOutput.h5'):
+
+    '''
+    Inputs:
+        cacheFile: JSON file of the cache. It is created if it does
+                   not exist.
+        sfincsDir: directory whose SFINCS runs (in any subdirectory)
+                   should be added to the cache.
+        fileName: name of the SFINCS output files.
+    Outputs:
+        [Every output in sfincsDir that passes the checks in
+        dataProc.checkConvergence is added to the cache. Outputs that
+        have not changed since they were last examined are skipped.]
+        The number of outputs that were added.
+    '''
+
+    from os.path import dirname, getmtime, realpath
+    from dataProc import checkConvergence
+    from IO import findFiles
+
+    numAdded = 0
+    with lockResultCache(cacheFile):
+        cache = loadResultCache(cacheFile)
+        for dataFile in findFiles(fileName, sfincsDir):
+            dataFile = realpath(dataFile) # Outputs linked from the cache are only recorded once
+            mtime = getmtime(dataFile)
+            if cache['seen'].get(dataFile) == mtime:
+                continue
+            try:
+                checkConvergence(dataFile).close()
+            except (IOError, KeyError, ValueError):
+                continue
+            try:
+                key = inputHash(dirname(dataFile), cache=cache)
+            except (OSError, ValueError):
+                continue
+            if key is None: # The run is examined again next time, since its equilibrium file may only be missing for now
+                continue
+            if key not in cache['outputs']:
+                cache['outputs'][key] = dataFile
+                numAdded += 1
+            cache['seen'][dataFile] = mtime
+        saveResultCache(cacheFile, cache)
+
+    return numAdded
+
+def registerCampaign(cacheFile, sfincsDir):
+
+    '''
+    Inputs:
+        cacheFile: JSON file of the cache (as given to the
+                   <resultCache> option of a script), or None.
+        sfincsDir: directory of the campaign.
+    Outputs:
+        [If cacheFile is not None, the finished runs in sfincsDir
+        are added to it with registerRuns, and a message is
+        printed.]
+    '''
+
+    from IO import messagePrinter
+
+    if cacheFile is None:
+        return
+
+    numAdded = registerRuns(cacheFile, sfincsDir)
+    messagePrinter('{} finished run(s) in {} were added to the result cache {}.'.format(numAdded, sfincsDir, cacheFile))
+
+def reuseCachedRuns(cacheFile, runDirs, fileName='sfincsOutput.h5'):
+
+    '''
+    Inputs:
+        cacheFile: JSON file of the cache.
+        runDirs: list of run directories that are about to be
+                 submitted.
+        fileName: name of the SFINCS output files.
+    Outputs:
+        [For every run in runDirs whose inputs match a finished run in
+        the cache, the cached output is linked into the run directory.]
+        List of the run directories that still need to be submitted.
+    '''
+
+    from os import symlink
+    from os.path import basename, dirname, join, isfile, lexists
+    from jobControl import runIsFinished
+
+    toSubmit = []
+    with lockResultCache(cacheFile):
+        cache = loadResultCache(cacheFile)
+        for runDir in runDirs:
+            try:
+                key = inputHash(runDir, cache=cache)
+            except (OSError, ValueError): # The run cannot be identified, so it is simply submitted
+                key = None
+            target = cache['outputs'].get(key)
+            if target is None or lexists(join(runDir, fileName)):
+                toSubmit.append(runDir)
+                continue
+            if not (isfile(target) and runIsFinished(dirname(target), fileName=basename(target))): # The cached output was moved or deleted
+                del cache['outputs'][key]
+                toSubmit.append(runDir)
+                continue
+            symlink(target, join(runDir, fileName))
+        saveResultCache(cacheFile, cache)
+
+    return toSubmit
@@ -0,0 +1,765 @@
+# This file contains functions for locating and classifying the roots of the ambipolar radial current.
+
+def rootFileNames():
+
+    '''
+    Inputs:
+        None.
+    Outputs:
+        List of the names (without extensions) of the files
+        in which the root information for each flux surface
+        is stored. The order matches the order in which the
+        information is written by chooseErs.py.
+    '''
+
+    return ['rootsToUse', 'ionRoots', 'unstableRoots', 'electronRoots', 'integralVals', 'soloRoots']
+
+def findRoots(dataMat, xScan):
+
+    '''
+    Inputs:
+        dataMat: 2D NumPy array whose first column contains the
+                 (sorted) independent variable and whose second
+                 column contains the dependent variable.
+        xScan: 1D NumPy array on which to evaluate the interpolant.
+    Outputs:
+        PCHIP interpolant of the data, the roots of the interpolant,
+        and the interpolant evaluated on xScan.
+    '''
+
+    from scipy.interpolate import PchipInterpolator
+
+    f = PchipInterpolator(dataMat[:,0], dataMat[:,1], extrapolate=False)
+    estRoots = f.roots(extrapolate=False)
+    yEst = f(xScan)
+
+    return f, estRoots, yEst
+
+def getErJrData(dataMat, negative=True, numInterpPoints=1000):
+
+    '''
+    Inputs:
+        dataMat: 2D NumPy array with Er (or a proxy) in the first
+                 column and Jr in the second column, sorted by Er.
+        negative: if True, use the data with Er <= 0. Otherwise,
+                  use the data with Er >= 0.
+        numInterpPoints: number of points at which the interpolant
+                         is evaluated for plotting.
+    Outputs:
+        Interpolant for the chosen side of Er = 0, the estimated
+        roots on that side, and the scan of Er and interpolated
+        Jr values.
+    '''
+
+    import numpy as np
+
+    if negative:
+        ErsData = dataMat[np.where(dataMat[:,0] <= 0)]
+    else:
+        ErsData = dataMat[np.where(dataMat[:,0] >= 0)]
+
+    ErScan = np.linspace(np.min(ErsData[:,0]), np.max(ErsData[:,0]), num=numInterpPoints)
+
+    f, estRoots, JrEst = findRoots(ErsData, ErScan)
+
+    return f, estRoots, ErScan, JrEst
+
+def determineRootStability(f, knownRoots, ErQuantityHasSameSignAsEr):
+
+    '''
+    Inputs:
+        f: interpolant of Jr as a function of Er (or a proxy).
+        knownRoots: 1D NumPy array of roots to check.
+        ErQuantityHasSameSignAsEr: True if the electric field
+                                   quantity has the same sign as Er.
+    Outputs:
+        1D NumPy array containing the stable roots in knownRoots.
+    '''
+
+    import numpy as np
+
+    if len(knownRoots) != 0:
+        fDer = f.derivative()
+        ders = fDer(knownRoots)
+        if ErQuantityHasSameSignAsEr:
+            stableInds = np.where(ders > 0) # dJr/dEr > 0 -> stable root
+        else:
+            stableInds = np.where(ders < 0) # Using Er definition/representation with opposite sign -> root stability condition flips
+        stableRoots = knownRoots[stableInds]
+    else:
+        stableRoots = np.array([])
+
+    return stableRoots
+
+def getAllRootInfo(dataMat, knownRoots, ErQuantityHasSameSignAsEr):
+
+    '''
+    Inputs:
+        dataMat: 2D NumPy array with Er (or a proxy) in the first
+                 column and Jr in the second column, sorted by Er.
+        knownRoots: 1D NumPy array of the Er values of runs that
+                    satisfy ambipolarity.
+        ErQuantityHasSameSignAsEr: True if the electric field
+                                   quantity has the same sign as Er.
+    Outputs:
+        List of the interpolants for Er <= 0 and Er >= 0, the
+        estimated roots from both interpolants, the stable roots
+        among knownRoots, and lists of the Er and Jr scans for
+        both sides (for plotting). Note that the estimated roots
+        will contain any actual roots since there is no smoothing
+        of the interpolants.
+    '''
+
+    import numpy as np
+
+    negKnownRoots = np.array(knownRoots)[np.where(knownRoots < 0)]
+    posKnownRoots = np.array(knownRoots)[np.where(knownRoots > 0)]
+
+    # Negative roots first
+    negF, negEstRoots, negErScan, negJrEst = getErJrData(dataMat, negative=True)
+    negStableRoots = determineRootStability(negF, negKnownRoots, ErQuantityHasSameSignAsEr)
+
+    # Now positive roots
+    posF, posEstRoots, posErScan, posJrEst = getErJrData(dataMat, negative=False)
+    posStableRoots = determineRootStability(posF, posKnownRoots, ErQuantityHasSameSignAsEr)
+
+    # Now combine everything
+    fs = [negF, posF]
+    estRoots = np.append(negEstRoots, posEstRoots)
+    stableRoots = np.append(negStableRoots, posStableRoots)
+    ErScan = [negErScan, posErScan]
+    JrScan = [negJrEst, posJrEst]
+
+    return fs, estRoots, stableRoots, ErScan, JrScan
+
+
+def clusterRoots(groupIds, rootErs, rootJrs, diffTol=0.01):
+
+    '''
+    Inputs:
+        groupIds: 1D NumPy array of integers identifying the flux
+                  surface to which each root belongs.
+        rootErs: 1D NumPy array of Er values which may contain
+                 (effective) duplicates.
+        rootJrs: 1D NumPy array of the corresponding Jr values.
+        diffTol: relative difference below which two neighboring
+                 Er values are considered to be the same.
+    Outputs:
+        1D NumPy arrays of the group IDs, Er values, and Jr values,
+        sorted by group and then by Er. Within each group, every
+        cluster of effective duplicates is replaced by the member
+        with the smallest |Jr|. All the groups are handled at once.
+    '''
+
+    import numpy as np
+    from dataProc import relDiff
+
+    groupIds = np.array(groupIds, dtype=int)
+    rootErs = np.array(rootErs, dtype=float)
+    rootJrs = np.array(rootJrs, dtype=float)
+
+    if groupIds.size == 0:
+        return groupIds, rootErs, rootJrs
+
+    order = np.lexsort((rootErs, groupIds))
+    groupIds = groupIds[order]
+    rootErs = rootErs[order]
+    rootJrs = rootJrs[order]
+
+    # A new cluster starts at every new group and wherever neighboring Er values are not effectively the same
+    with np.errstate(invalid='ignore', divide='ignore'): # NumPy will throw a warning before evaluating frac, which makes output confusing
+        similar = relDiff(rootErs[1:], rootErs[:-1]) < diffTol
+    newCluster = np.concatenate(([True], np.logical_or(groupIds[1:] != groupIds[:-1], np.logical_not(similar))))
+    clusterIds = np.cumsum(newCluster) - 1
+
+    # Keep the member of each cluster with the smallest |Jr|
+    byJr = np.lexsort((np.abs(rootJrs), clusterIds))
+    _, firstInds = np.unique(clusterIds[byJr], return_index=True)
+    keep = np.sort(byJr[firstInds])
+
+    return groupIds[keep], rootErs[keep], rootJrs[keep]
+
+def determineErQuantitySign(ErQuantity, Er):
+
+    '''
+    Inputs:
+        ErQuantity: 1D NumPy array of the electric field quantity
+                    used in the scan (such as dPhiHatdrN).
+        Er: 1D NumPy array of the corresponding Er values.
+    Outputs:
+        True if ErQuantity and Er have the same sign, False if
+        they have opposite signs, and NaN if the data is
+        inconsistent.
+    '''
+
+    import numpy as np
+
+    if len(ErQuantity) != len(Er): # I/O problem
+        return np.nan
+    zeroInd = np.where(ErQuantity == 0)
+    if not np.all(Er[zeroInd] == 0): # Physics problem
+        return np.nan
+    newErQuantity = np.delete(ErQuantity, zeroInd)
+    newEr = np.delete(Er, zeroInd)
+    if len(newErQuantity) != len(newEr): # Physics problem
+        return np.nan
+    trueCount = np.count_nonzero(newErQuantity * newEr > 0) # All entries True if same sign, all entries False otherwise
+    if (trueCount != len(newErQuantity)) and (trueCount != 0): # Physics problem
+        return np.nan
+    if trueCount != 0:
+        return True # ErQuantity and Er have the same sign
+    else:
+        return False # ErQuantity and Er have different signs
+
+def evaluateIntegral(negF, posF, lowerBound, upperBound):
+
+    '''
+    Inputs:
+        negF: interpolant of Jr for Er <= 0.
+        posF: interpolant of Jr for Er >= 0.
+        lowerBound: lower bound of the integral.
+        upperBound: upper bound of the integral.
+    Outputs:
+        Integral of Jr with respect to Er between the bounds,
+        or NaN if the bounds cannot be handled.
+    '''
+
+    import numpy as np
+
+    if (lowerBound <= 0) and (upperBound <= 0):
+        return negF.integrate(lowerBound, upperBound, extrapolate=False)
+
+    elif (lowerBound >= 0) and (upperBound >= 0):
+        return posF.integrate(lowerBound, upperBound, extrapolate=False)
+
+    elif (lowerBound <= 0) and (upperBound >= 0):
+        return negF.integrate(lowerBound, 0, extrapolate=True) + posF.integrate(0, upperBound, extrapolate=True)
+        # Jr is forced to be evaluated very near Er = 0, so extrapolation should be fine here.
+
+    elif (lowerBound >= 0) and (upperBound <= 0):
+        return posF.integrate(lowerBound, 0, extrapolate=True) + negF.integrate(0, upperBound, extrapolate=True)
+        # Jr is forced to be evaluated very near Er = 0, so extrapolation should be fine here.
+
+    else:
+        return np.nan
+
+def determineLabels(sfincsDir):
+
+    '''
+    Inputs:
+        sfincsDir: top directory of a SFINCS radial and electric
+                   field scan.
+    Outputs:
+        The most common radial variable label (from the radial
+        subdirectory names) and electric field variable label
+        (from the electric field subdirectory names).
+    '''
+
+    from collections import Counter
+    from IO import findFiles
+
+    # This will only work if the radial directories are named 'var_val', rather than just given an integer number.
+    # Directories created with stelloptPlusSfincs will always follow this naming convention.
+    # Note that if no electric field scan is present, this function will return nonsense. This behavior is caught another way later, though.
+    dataFiles = findFiles('sfincsOutput.h5', sfincsDir, raiseError=True) # Note that sfincsScan breaks if you use a different output file name, so the default is hard-coded in
+    subdirsFirst = [address.replace(sfincsDir, '') for address in dataFiles]
+    radSubdirTitles = [address.split('/')[1] for address in subdirsFirst]
+    elecSubdirTitles = [address.split('/')[2] for address in subdirsFirst]
+    radSubdirLabels = [title.split('_')[0] for title in radSubdirTitles]
+    elecSubdirLabels = [''.join(i for i in label if not i.isdigit()).replace('-','').replace('.','') for label in elecSubdirTitles]
+    countRadLabels = Counter(radSubdirLabels)
+    countElecLabels = Counter(elecSubdirLabels)
+    mostCommonRadLabel = max(countRadLabels, key=countRadLabels.get)
+    mostCommonElecLabel = max(countElecLabels, key=countElecLabels.get)
+
+    return mostCommonRadLabel, mostCommonElecLabel
+
+def fluxVarNames(electricFieldLabel, includePhi1):
+
+    '''
+    Inputs:
+        electricFieldLabel: electric field variable used in the scan.
+        includePhi1: True if Phi1 was included in the SFINCS runs.
+    Outputs:
+        Names of the particle flux and radial current variables
+        consistent with electricFieldLabel.
+    '''
+
+    if includePhi1:
+        distr = 'vd'
+    else:
+        distr = 'vm'
+    if electricFieldLabel == 'Er':
+        coord = 'rHat'
+    else:
+        coord = electricFieldLabel.split('d')[-1]
+    particleFluxVar = 'particleFlux_'+distr+'_'+coord
+    radialCurrentVar = 'radialCurrent_'+distr+'_'+coord
+
+    return particleFluxVar, radialCurrentVar
+
+
+def prepareRadius(dataContainer, radLabel, electricFieldLabel, zeroErTol, allowZeroJr=False):
+
+    '''
+    Inputs:
+        dataContainer: sfincsScan instance holding the electric
+                       field scan for a single flux surface.
+        radLabel: radial variable label, as from determineLabels.
+        electricFieldLabel: electric field variable label, as from
+                            determineLabels.
+        zeroErTol: largest |Er| (in physical units) for which a run
+                   is considered to be the Er = 0 case.
+        allowZeroJr: continue the analysis even if some runs have
+                     exactly zero radial current.
+    Outputs:
+        Dictionary containing the data from the flux surface in
+        physical units (such as the sorted Er and Jr values in the
+        'ErJrVals' key, which also contains the intermediate
+        iterations of ambipolarSolve runs when SFINCS stored them)
+        and the results of some sanity checks. If
+        the data cannot be used, the 'status' key is 'skip', the
+        reason is in the 'skipMessage' key, and 'ErJrVals' is None.
+        Otherwise, 'status' is None until the dictionary is passed
+        to analyzeRadii. Warnings for the user are in the
+        'messages' key.
+    '''
+
+    import numpy as np
+    from dataProc import combineAndSort, fixOutputUnits
+
+    radVal = getattr(dataContainer, radLabel)[0]
+    particleFluxVar, radialCurrentVar = fluxVarNames(electricFieldLabel, dataContainer.includePhi1)
+
+    out = {'radLabel':radLabel, 'radVal':radVal, 'status':None, 'messages':[], 'skipMessage':None, 'moreDataMessage':None, 'guesses':np.array([]),
+           'roots':{name:np.nan for name in rootFileNames()}, 'particleFluxVar':particleFluxVar, 'radialCurrentVar':radialCurrentVar,
+           'Zs':dataContainer.Zs, 'ErJrVals':None, 'ErParticleFluxes':None, 'ErQuantityHasSameSignAsEr':None, 'ErScan':None, 'JrScan':None,
+           'estRoots':None, 'rootErs':None, 'stableRoots':None}
+
+    def skip(customString):
+        out['status'] = 'skip'
+        out['skipMessage'] = customString
+        return out
+
+    ErVals = fixOutputUnits(electricFieldLabel, getattr(dataContainer, electricFieldLabel)) # Note this doesn't literally have to be Er, it could be various derivatives of the electric potential
+    closeToZero = np.isclose(ErVals, 0, rtol=0, atol=zeroErTol)
+    if True not in closeToZero:
+        msg = 'No zero-electric-field case (or anything sufficiently close) was found in the {} = {} subdirectory, '.format(radLabel, radVal)
+        msg += 'so this subdirectory will be skipped.'
+        return skip(msg)
+    if 0 in dataContainer.Zs:
+        msg = 'A zero-charge particle was found in the output of the {} = {} subdirectory, '.format(radLabel, radVal)
+        msg += 'so this subdirectory will be skipped.'
+        return skip(msg)
+    actualEr = fixOutputUnits('Er', getattr(dataContainer, 'Er')) # This is just for comparison purposes
+    ErQuantityHasSameSignAsEr = determineErQuantitySign(ErVals, actualEr)
+    if np.isnan(ErQuantityHasSameSignAsEr):
+        msg = 'For {} = {}, the radial electric field as represented by {} did not seem to be consistent '.format(radLabel, radVal, electricFieldLabel)
+        msg += 'with the standard definition. It may have been zero in odd places or not followed the proper sign convention. Please investigate. '
+        msg += 'In the meantime, this subdirectory will be skipped.'
+        return skip(msg)
+    JrVals = fixOutputUnits(radialCurrentVar, dataContainer.Jr)
+    exactlyZeroCurrentInds = np.where(np.array(JrVals) == 0)
+    exactlyZeroErVals = np.array(ErVals)[exactlyZeroCurrentInds]
+    if len(exactlyZeroErVals) != 0:
+        msg = 'For {} = {}, it appears that the following electric field subdirectories contained a run with zero radial current:\n'.format(radLabel, radVal)
+        msg += str(exactlyZeroErVals) + '\n'
+        msg += 'This indicates a SFINCS error. Please check and fix these run(s) to get reliable results.\n'
+        if not allowZeroJr:
+            msg += 'In the meantime, this subdirectory will be skipped because it will break the root finding algorithm.'
+            return skip(msg)
+        else:
+            msg += 'Because <allowZeroJr> was used, calculations for this subdirectory will continue even though the results will likely be incorrect.'
+            out['messages'].append(msg)
+    unsortedParticleFluxes = fixOutputUnits(particleFluxVar, getattr(dataContainer, particleFluxVar))
+    out['ErParticleFluxes'] = combineAndSort(ErVals, unsortedParticleFluxes)
+    # The intermediate iterations of ambipolarSolve runs (if they were stored) are extra samples of Jr(Er)
+    iterErVals, iterJrVals = dataContainer.iterationSamples(electricFieldLabel)
+    if iterErVals.size != 0:
+        iterErVals = fixOutputUnits(electricFieldLabel, iterErVals)
+        iterJrVals = fixOutputUnits(radialCurrentVar, iterJrVals)
+        iterErVals, uniqueInds = np.unique(iterErVals, return_index=True)
+        iterJrVals = iterJrVals[uniqueInds]
+        isNew = np.logical_not(np.any(np.isclose(iterErVals[:,np.newaxis], np.array(ErVals)[np.newaxis,:], rtol=1e-8, atol=0), axis=1)) # Real runs take precedence
+        ErVals = np.append(ErVals, iterErVals[isNew])
+        JrVals = np.append(JrVals, iterJrVals[isNew])
+    out['ErJrVals'] = combineAndSort(ErVals, JrVals)
+    out['ErQuantityHasSameSignAsEr'] = ErQuantityHasSameSignAsEr
+
+    return out
+
+def classifyRadius(surface, numActualRoots, numStableRoots, numUniqueRootGuesses):
+
+    '''
+    Inputs:
+        surface: dictionary, as from prepareRadius, with the
+                 'rootErs', 'stableRoots', and 'guesses' keys
+                 filled in by analyzeRadii.
+        numActualRoots: number of (deduplicated) runs that satisfy
+                        ambipolarity on the flux surface.
+        numStableRoots: number of those runs that are stable.
+        numUniqueRootGuesses: number of estimated roots that are not
+                              close to the actual roots.
+    Outputs:
+        The status of the flux surface ('launch', 'moreData',
+        'solo', 'triple', or 'needsIntegral') and, for the 'moreData'
+        status, the reason. The 'needsIntegral' status means that
+        a valid set of three roots was found and the Turkin integral
+        must be evaluated to choose between them.
+    '''
+
+    radLabel = surface['radLabel']
+    radVal = surface['radVal']
+
+    # Determine if new runs should be launched, or the data processed as-is
+    if numActualRoots == 0:
+
+        if numUniqueRootGuesses == 0: # No root (real or estimated) can be identified - this is a problem
+            return 'moreData', 'No root could be identified for {} = {}.'.format(radLabel, radVal)
+
+        else: # A root guess has been identified - launch a run for it
+            return 'launch', None
+
+    elif numActualRoots == 1:
+
+        if numUniqueRootGuesses == 0: # The fit polynomials could not find any roots beyond the one already identified
+
+            if numStableRoots == 0: # The only root that can be found or guessed is unstable - this is a problem
+                return 'moreData', 'Only a single, unstable root could be identified for {} = {}.'.format(radLabel, radVal)
+
+            else: # The identified root is stable, and no other guesses are apparent - assume the identified root is the only one
+                return 'solo', None
+
+        else: # If there are other guesses for roots, they should be investigated
+            return 'launch', None
+
+    elif numActualRoots == 2:
+
+        if numStableRoots == 0: # Impossible - something is wrong
+            return 'moreData', 'Two unstable roots were identified for {} = {}, which should not be possible.'.format(radLabel, radVal)
+
+        elif numStableRoots == 1: # The other stable root has not been found yet
+
+            if numUniqueRootGuesses == 0: # This is a problem
+                return 'moreData', 'Only one stable and one unstable root were identified for {} = {}.'.format(radLabel, radVal)
+
+            else: # Investigate the guesses, which will hopefully allow the other stable root to be identified
+                return 'launch', None
+
+        else: # Both roots are stable, which likely means the data is incomplete
+
+            if numUniqueRootGuesses == 0: # This is a problem
+                return 'moreData', 'Two stable roots and no unstable roots were identified for {} = {}.'.format(radLabel, radVal)
+
+            else: # Investigate the guesses, which will hopefully allow the unstable root to be identified
+                return 'launch', None
+
+    elif numActualRoots == 3:
+
+        if numStableRoots in (0, 1, 3): # Does not make sense, something strange is going on
+            return 'moreData', 'Three roots were identified for {} = {}. {} of these appear to be stable, which should not be possible.'.format(radLabel, radVal, numStableRoots)
+
+        else: # We have a valid number of total and stable roots
+
+            if numUniqueRootGuesses != 0: # Probably a good idea to investigate these guesses just to get better data resolution (since we can only have 1 or 3 roots)
+                return 'launch', None
+
+            else: # So far, it looks like we have three roots with the right stability properties
+
+                # We need to check that the unstable root is between the stable roots
+                unstableRoot = list(set(surface['rootErs']) - set(surface['stableRoots']))[0]
+
+                if min(surface['stableRoots']) < unstableRoot < max(surface['stableRoots']): # Everything is in order
+                    return 'needsIntegral', None
+
+                else:
+                    return 'moreData', 'For {} = {}, three roots were found and two were stable, but the unstable root was not between the stable ones.'.format(radLabel, radVal)
+
+    else: # More than three roots should not be possible
+        return 'moreData', 'More than three roots were identified for {} = {}, which should not be possible.'.format(radLabel, radVal)
+
+def analyzeRadii(surfaces, maxRootJr, diffTol=0.01):
+
+    '''
+    Inputs:
+        surfaces: list of dictionaries, as from prepareRadius, one
+                  for each flux surface.
+        maxRootJr: largest |Jr| (in physical units) for which a run
+                   is considered to satisfy ambipolarity.
+        diffTol: relative difference below which two roots on the
+                 same flux surface are considered to be the same.
+    Outputs:
+        The same list, with each dictionary updated in place. The
+        'status' key is one of 'skip' (the data cannot be used),
+        'launch' (runs should be performed at the Er values in the
+        'guesses' key), 'moreData' (more data is needed, but no
+        guesses are available), 'solo' (a single stable root was
+        found), or 'triple' (two stable roots and one unstable root
+        were found). The reason for the 'skip' status is in the
+        'skipMessage' key and the reason for the 'moreData' status
+        is in the 'moreDataMessage' key. The 'roots' key contains a
+        dictionary with one entry for each name in rootFileNames.
+        The roots of every flux surface are found and deduplicated
+        at once from the stacked data; the interpolants are only
+        built once per side of Er = 0 for each flux surface.
+    '''
+
+    import numpy as np
+
+    useInds = [ind for ind, surface in enumerate(surfaces) if surface['status'] != 'skip']
+    if len(useInds) == 0:
+        return surfaces
+
+    # Stack the data from every usable flux surface
+    counts = [surfaces[ind]['ErJrVals'].shape[0] for ind in useInds]
+    groupIds = np.repeat(np.arange(len(useInds)), counts)
+    allErJrVals = np.vstack([surfaces[ind]['ErJrVals'] for ind in useInds])
+    allErs = allErJrVals[:,0]
+    allJrs = allErJrVals[:,1]
+
+    # Find the runs that satisfy ambipolarity, removing (effective) duplicates
+    isRoot = np.abs(allJrs) <= maxRootJr
+    rootGroups, rootErs, rootJrs = clusterRoots(groupIds[isRoot], allErs[isRoot], allJrs[isRoot], diffTol=diffTol)
+    rootBounds = np.searchsorted(rootGroups, np.arange(len(useInds) + 1))
+
+    # Interpolate between the available data points to determine root stability and guess the position of as-yet-unfound roots
+    fsList = []
+    estGroups = []
+    estErs = []
+    stableMask = np.zeros(rootErs.shape, dtype=bool)
+    for group, ind in enumerate(useInds):
+        surface = surfaces[ind]
+        theseRoots = rootErs[rootBounds[group]:rootBounds[group + 1]]
+        fs, allEstRoots, stableRoots, ErScan, JrScan = getAllRootInfo(surface['ErJrVals'], theseRoots, surface['ErQuantityHasSameSignAsEr'])
+        fsList.append(fs)
+        estGroups.append(np.full(allEstRoots.shape, group))
+        estErs.append(allEstRoots)
+        stableMask[rootBounds[group]:rootBounds[group + 1]] = np.isin(theseRoots, stableRoots)
+        surface['ErScan'] = ErScan
+        surface['JrScan'] = JrScan
+        surface['rootErs'] = theseRoots
+        surface['stableRoots'] = stableRoots
+
+    # Eliminate estimated roots if they are too close to real ones (the real ones always win because of their small |Jr|)
+    estGroups = np.concatenate(estGroups)
+    estErs = np.concatenate(estErs)
+    fakeJr = 10 ** 9
+    combinedGroups, combinedErs, combinedJrs = clusterRoots(np.append(rootGroups, estGroups), np.append(rootErs, estErs), np.append(rootJrs, np.full(estErs.shape, fakeJr)), diffTol=diffTol)
+    combinedBounds = np.searchsorted(combinedGroups, np.arange(len(useInds) + 1))
+    isGuess = combinedJrs == fakeJr
+
+    numActualRoots = np.bincount(rootGroups, minlength=len(useInds))
+    numStableRoots = np.bincount(rootGroups[stableMask], minlength=len(useInds))
+    numUniqueRootGuesses = np.bincount(combinedGroups[isGuess], minlength=len(useInds))
+
+    for group, ind in enumerate(useInds):
+        surface = surfaces[ind]
+        groupSlice = slice(combinedBounds[group], combinedBounds[group + 1])
+        surface['estRoots'] = combinedErs[groupSlice]
+        surface['guesses'] = combinedErs[groupSlice][isGuess[groupSlice]]
+
+        status, msg = classifyRadius(surface, numActualRoots[group], numStableRoots[group], numUniqueRootGuesses[group])
+
+        if status == 'moreData':
+            surface['moreDataMessage'] = msg
+
+        elif status == 'solo':
+            surface['roots']['soloRoots'] = surface['rootErs'][0]
+            surface['roots']['rootsToUse'] = surface['rootErs'][0]
+
+        elif status == 'needsIntegral': # Choose the correct root using eq. (A2) of Turkin et al., PoP 18, 022505 (2011)
+            stableRoots = surface['stableRoots']
+            unstableRoot = list(set(surface['rootErs']) - set(stableRoots))[0]
+            lowerRoot = np.min(stableRoots)
+            upperRoot = np.max(stableRoots)
+            negF, posF = fsList[group]
+            intVal = evaluateIntegral(negF, posF, lowerRoot, upperRoot)
+            # Note that the bounds of the integral in Turkin et al. would switch when Er is defined as a derivative of the potential without the negative sign,
+            # so this ^ form of the integral should be correct.
+
+            if np.isnan(intVal) or intVal == 0:
+                msg = 'For {} = {}, the integral of Jr with respect to Er was {}. '.format(surface['radLabel'], surface['radVal'], intVal)
+                msg += 'Something is wrong, so this subdirectory will be skipped.'
+                surface['status'] = 'skip'
+                surface['skipMessage'] = msg
+                continue
+
+            if surface['ErQuantityHasSameSignAsEr']:
+                ionRoot = lowerRoot
+                electronRoot = upperRoot
+            else:
+                ionRoot = upperRoot
+                electronRoot = lowerRoot
+
+            surface['roots']['ionRoots'] = ionRoot
+            surface['roots']['unstableRoots'] = unstableRoot
+            surface['roots']['electronRoots'] = electronRoot
+            surface['roots']['integralVals'] = intVal
+
+            if intVal > 0:
+                surface['roots']['rootsToUse'] = ionRoot
+            elif intVal < 0:
+                surface['roots']['rootsToUse'] = electronRoot
+
+            status = 'triple'
+
+        surface['status'] = status
+
+    return surfaces
+
+def analyzeRadius(dataContainer, radLabel, electricFieldLabel, maxRootJr, zeroErTol, allowZeroJr=False):
+
+    '''
+    Inputs:
+        dataContainer: sfincsScan instance holding the electric
+                       field scan for a single flux surface.
+        radLabel: radial variable label, as from determineLabels.
+        electricFieldLabel: electric field variable label, as from
+                            determineLabels.
+        maxRootJr: largest |Jr| (in physical units) for which a run
+                   is considered to satisfy ambipolarity.
+        zeroErTol: largest |Er| (in physical units) for which a run
+                   is considered to be the Er = 0 case.
+        allowZeroJr: continue the analysis even if some runs have
+                     exactly zero radial current.
+    Outputs:
+        Dictionary describing the state of the flux surface, as
+        from analyzeRadii. This is a convenience function for
+        analyzing a single flux surface.
+    '''
+
+    surface = prepareRadius(dataContainer, radLabel, electricFieldLabel, zeroErTol, allowZeroJr=allowZeroJr)
+
+    return analyzeRadii([surface], maxRootJr)[0]
+
+def loadRadius(radDir):
+
+    '''
+    Inputs:
+        radDir: directory containing the electric field
+                subdirectories for a single flux surface.
+    Outputs:
+        sfincsScan instance for the flux surface, or None if the
+        data could not be loaded (for instance, because some runs
+        have not finished).
+    '''
+
+    from sfincsOutputLib import sfincsScan
+
+    try:
+        return sfincsScan(radDir, sortafter='dPhiHatdrN', verbose=0)
+    except (Exception, SystemExit): # sfincsScan exits if it finds something it does not like
+        return None
+
+def loadRootFiles(determineErDir):
+
+    '''
+    Inputs:
+        determineErDir: directory in which chooseErs.py saved its
+                        outputs (typically <sfincsDir>/determineEr).
+    Outputs:
+        Name of the radial coordinate, name of the electric field
+        variable (None if it was not recorded, as in older outputs),
+        1D NumPy array of the radii of the flux surfaces, and
+        dictionary with a 1D NumPy array for each name in
+        rootFileNames (in physical units, NaN where a root is not
+        known).
+    '''
+
+    import numpy as np
+    from os.path import join, isfile
+
+    radiiFile = join(determineErDir, 'radii.txt')
+    if not isfile(radiiFile):
+        raise IOError('No radii.txt file was found in {}. Please run chooseErs.py on the corresponding SFINCS directory again.'.format(determineErDir))
+
+    with open(radiiFile, 'r') as f:
+        radLabel = f.readline().strip('#').strip()
+
+    with open(join(determineErDir, rootFileNames()[0] + '.txt'), 'r') as f:
+        firstLine = f.readline()
+    ErLabel = firstLine.strip('#').strip() if firstLine.startswith('#') else None
+
+    radii = np.loadtxt(radiiFile, ndmin=1)
+    roots = {name:np.loadtxt(join(determineErDir, name + '.txt'), ndmin=1) for name in rootFileNames()}
+
+    return radLabel, ErLabel, radii, roots
+
+def predictRoots(determineErDir, targetRadii, radLabel=None, ErLabel=None):
+
+    '''
+    Inputs:
+        determineErDir: directory in which chooseErs.py saved its
+                        outputs.
+        targetRadii: list or 1D NumPy array of radii at which the
+                     roots should be predicted.
+        radLabel: name of the radial coordinate of targetRadii. If
+                  it is given, it must match the one used in
+                  determineErDir.
+        ErLabel: name of the electric field variable in which the
+                 roots are wanted. If it is given, it must match the
+                 one used in determineErDir (where recorded).
+    Outputs:
+        List (one entry per target radius) of 1D NumPy arrays with
+        the predicted roots (in physical units). The ion, unstable,
+        electron, and solo roots are each interpolated along the
+        radius from the flux surfaces on which they are known. The
+        roots that are only known far away still yield a prediction
+        (the closest known value), so the output should be treated
+        as a prior rather than as an answer.
+    '''
+
+    import numpy as np
+    from dataProc import predictAlongRadius
+
+    knownLabel, knownErLabel, radii, roots = loadRootFiles(determineErDir)
+    if radLabel is not None and radLabel != knownLabel:
+        raise IOError('The roots in {} are given as a function of {}, but {} was requested.'.format(determineErDir, knownLabel, radLabel))
+    if ErLabel is not None and knownErLabel is not None and ErLabel != knownErLabel:
+        raise IOError('The roots in {} are given in terms of {}, but {} was requested.'.format(determineErDir, knownErLabel, ErLabel))
+
+    targetRadii = np.array(targetRadii, ndmin=1, dtype=float)
+    predictions = [predictAlongRadius(radii, roots[name], targetRadii) for name in ['ionRoots', 'unstableRoots', 'electronRoots', 'soloRoots']]
+    predictions = np.column_stack(predictions)
+
+    return [np.unique(row[np.logical_not(np.isnan(row))]) for row in predictions]
+
+def predictErWindows(determineErDir, psiN, ErLabel, halfWidth):
+
+    '''
+    Inputs:
+        determineErDir: directory in which chooseErs.py saved its
+                        outputs for a previous campaign.
+        psiN: list or 1D NumPy array of the normalized toroidal
+              flux of the flux surfaces of the new campaign.
+        ErLabel: name of the electric field variable used in the
+                 input.namelist files of the new campaign.
+        halfWidth: distance (in the units of the input.namelist
+                   files) to extend the windows on either side of
+                   the outermost predicted roots.
+    Outputs:
+        1D NumPy arrays with the lower and upper bounds (in the
+        units of the input.namelist files) of the electric field
+        window on each flux surface. These are NaN on surfaces
+        for which no roots could be predicted.
+    '''
+
+    import numpy as np
+    from dataProc import unitFactor
+
+    radLabel, _, _, _ = loadRootFiles(determineErDir)
+    psiN = np.array(psiN, ndmin=1, dtype=float)
+    if radLabel == 'psiN':
+        targetRadii = psiN
+    elif radLabel == 'rN':
+        targetRadii = np.sqrt(psiN)
+    else:
+        raise IOError('The roots in {} are given as a function of {}. Only psiN and rN can be converted without the equilibrium.'.format(determineErDir, radLabel))
+
+    predictions = predictRoots(determineErDir, targetRadii, ErLabel=ErLabel)
+    factor = unitFactor(ErLabel)
+
+    lower = np.array([np.min(roots) / factor - halfWidth if roots.size != 0 else np.nan for roots in predictions])
+    upper = np.array([np.max(roots) / factor + halfWidth if roots.size != 0 else np.nan for roots in predictions])
+
+    return lower, upper
@@ -0,0 +1,191 @@
+# This file contains functions for plotting the root finding information for each flux surface. The plots are made in separate processes because
+# rendering them can take much longer than the root finding itself.
+
+def findPlotMinMax(inData, margin):
+
+    '''
+    Inputs:
+        inData: NumPy array of data to be plotted.
+        margin: fraction of the data range to leave above and
+                below the data.
+    Outputs:
+        Lower and upper limits for the plot axis.
+    '''
+
+    import numpy as np
+
+    dataMin = np.min(inData)
+    dataMax = np.max(inData)
+    dataRange = dataMax - dataMin
+    useMin = dataMin - margin * dataRange
+    useMax = dataMax + margin * dataRange
+
+    return useMin, useMax
+
+def plotJob(result, campaignName, outDir, electricFieldLabel, margin):
+
+    '''
+    Inputs:
+        result: dictionary for a single flux surface, as from
+                analyzeRadii.
+        campaignName: name of the SFINCS directory, used as the
+                      prefix of the output file names.
+        outDir: directory in which to save the plots.
+        electricFieldLabel: electric field variable label, as from
+                            determineLabels.
+        margin: margin argument passed to findPlotMinMax.
+    Outputs:
+        Dictionary containing only the information needed by
+        plotRadius. Unlike the sfincsScan instances, it can be
+        sent to other processes cheaply.
+    '''
+
+    keys = ['radLabel', 'radVal', 'ErJrVals', 'ErParticleFluxes', 'particleFluxVar', 'radialCurrentVar',
+            'Zs', 'ErScan', 'JrScan', 'estRoots', 'rootErs', 'stableRoots']
+
+    job = {key:result[key] for key in keys}
+    job.update({'campaignName':campaignName, 'outDir':outDir, 'electricFieldLabel':electricFieldLabel, 'margin':margin})
+
+    return job
+
+def plotRadius(job):
+
+    '''
+    Inputs:
+        job: dictionary, as from plotJob.
+    Outputs:
+        List of the names of the files (plots of the radial current
+        and the particle fluxes against the electric field, and the
+        plotted data) written in job['outDir'].
+    '''
+
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import numpy as np
+    from os.path import join
+    from warnings import warn
+    from IO import prettyDataLabel
+
+    radVal = job['radVal']
+    ErJrVals = job['ErJrVals']
+    ErParticleFluxes = job['ErParticleFluxes']
+    particleFluxVar = job['particleFluxVar']
+    radialCurrentVar = job['radialCurrentVar']
+    rootErs = job['rootErs']
+    stableRoots = job['stableRoots']
+    files = [] # Names of the files written in outDir
+
+    # Plot and save total current data for interpretation later
+    plt.figure()
+    plt.axhline(y=0, color='black', linestyle='-', zorder=0)
+    plt.scatter(ErJrVals[:,0], ErJrVals[:,1], zorder=5)
+    for ErPart, JrPart in zip(job['ErScan'], job['JrScan']):
+        plt.plot(ErPart, JrPart, color='tab:blue', zorder=10)
+    for root in job['estRoots']:
+        if root in rootErs:
+            ls = '-'
+            if root in stableRoots:
+                clr = 'green'
+                lbl = 'Stable Root'
+            else:
+                clr = 'red'
+                lbl = 'Unstable Root'
+        else:
+            ls = ':'
+            clr = 'black'
+            lbl = 'Root Guess'
+        plt.axvline(x=root, color=clr, linestyle=ls, label=lbl, zorder=15)
+    useMin, useMax = findPlotMinMax(ErJrVals[:,1], job['margin'])
+    plt.ylim(bottom=useMin, top=useMax)
+    plt.legend(loc='best')
+    plt.xlabel(prettyDataLabel(job['electricFieldLabel']))
+    plt.ylabel(prettyDataLabel(radialCurrentVar))
+    nameBits = job['campaignName'] + '-' + job['radLabel'] + '_' + str(radVal) + '-' + 'Jr-vs-' + job['electricFieldLabel']
+    plotName = nameBits + '.pdf'
+    dataName = nameBits + '.dat'
+    plt.savefig(join(job['outDir'], plotName), bbox_inches='tight', dpi=400)
+    files += [plotName, dataName]
+    np.savetxt(join(job['outDir'], dataName), ErJrVals)
+    plt.close()
+
+    # Also plot individual species flux data
+    plt.figure()
+    plt.axhline(y=0, color='black', linestyle='-', zorder=0)
+    for i in range(1, ErParticleFluxes.shape[1]):
+        lbl = 'Spec. ' + str(i)
+        plt.plot(ErParticleFluxes[:,0], ErParticleFluxes[:,i], label=lbl, zorder=5)
+    useMin, useMax = findPlotMinMax(ErParticleFluxes[:,1:], job['margin'])
+    plt.ylim(bottom=useMin, top=useMax)
+    plt.legend(loc='best')
+    plt.xlabel(prettyDataLabel(job['electricFieldLabel']))
+    plt.ylabel(prettyDataLabel(particleFluxVar))
+    nameBits = job['campaignName'] + '-' + job['radLabel'] + '_' + str(radVal) + '-' + 'particleFluxes-vs-' + job['electricFieldLabel']
+    plotName = nameBits + '.pdf'
+    dataName = nameBits + '.dat'
+    plt.tight_layout()
+    plt.savefig(join(job['outDir'], plotName), bbox_inches='tight', dpi=400)
+    files += [plotName, dataName]
+    np.savetxt(join(job['outDir'], dataName), ErParticleFluxes)
+    plt.close()
+
+    # Also plot grouped (ion and electron) flux data
+    plt.figure()
+    plt.axhline(y=0, color='black', linestyle='-', zorder=0)
+    eInds = np.where(job['Zs'] < 0)
+    iInds = np.where(job['Zs'] > 0)
+    if eInds[0].size > 1:
+        msg = 'Multiple negative-charge species were detected in the output of the {} = {} subdirectory. '.format(job['radLabel'], radVal)
+        msg += 'This is unusual. They will all be labeled "electrons" in the grouped flux plots.'
+        warn(msg)
+    eFlux = np.sum(ErParticleFluxes[:,1:].T[eInds], axis=0)
+    iFlux = np.sum(ErParticleFluxes[:,1:].T[iInds], axis=0)
+    plt.plot(ErParticleFluxes[:,0], eFlux, label='Electrons', zorder=5)
+    plt.plot(ErParticleFluxes[:,0], iFlux, label='Ions', zorder=6)
+    eiFlux = np.column_stack((eFlux, iFlux))
+    useMin, useMax = findPlotMinMax(eiFlux, job['margin'])
+    plt.ylim(bottom=useMin, top=useMax)
+    plt.legend(loc='best')
+    plt.xlabel(prettyDataLabel(job['electricFieldLabel']))
+    plt.ylabel(prettyDataLabel(particleFluxVar))
+    nameBits = job['campaignName'] + '-' + job['radLabel'] + '_' + str(radVal) + '-' + 'groupedParticleFluxes-vs-' + job['electricFieldLabel']
+    plotName = nameBits + '.pdf'
+    dataName = nameBits + '.dat'
+    plt.tight_layout()
+    plt.savefig(join(job['outDir'], plotName), bbox_inches='tight', dpi=400)
+    files += [plotName, dataName]
+    np.savetxt(join(job['outDir'], dataName), np.column_stack((ErParticleFluxes[:,0], eiFlux)))
+    plt.close()
+
+    return files
+
+def plotRadii(jobs, numWorkers=None):
+
+    '''
+    Inputs:
+        jobs: list of dictionaries, as from plotJob.
+        numWorkers: number of processes to use. If None, the number
+                    of processors is used.
+    Outputs:
+        List (one entry per job) of lists of the names of the files
+        written by plotRadius. The jobs are spread over a pool of
+        processes. New processes are forked (where possible) so that
+        they do not rerun the script that called this function.
+    '''
+
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    if len(jobs) == 0:
+        return []
+
+    if numWorkers == 1 or len(jobs) == 1:
+        return [plotRadius(job) for job in jobs]
+
+    try:
+        context = multiprocessing.get_context('fork')
+    except ValueError: # Forking is not available on every platform
+        context = None
+
+    with ProcessPoolExecutor(max_workers=numWorkers, mp_context=context) as pool:
+        return list(pool.map(plotRadius, jobs))
@@ -36,6 +36,9 @@ class sfincsScan:
 
       #initiate a lot
       self.finished                        = [None]*Nruns
+      self.iterations                      = [None]*Nruns
+      self.transportMatrix                 = [None]*Nruns
+      self.RHSColumns                      = [None]*Nruns
       self.didNonlinearCalculationConverge = [None]*Nruns 
       self.Ntheta   = np.zeros((Nruns))
       self.Nzeta    = np.zeros((Nruns))
@@ -89,6 +92,8 @@ class sfincsScan:
       self.dPhiHatdrHat  = np.zeros((Nruns))
       self.Er            = np.zeros((Nruns))
       self.EParallelHat  = np.zeros((Nruns))
+      self.nuPrime       = np.nan*np.zeros((Nruns))
+      self.EStar         = np.nan*np.zeros((Nruns))
       self.adiabaticNHat = np.nan*np.zeros((Nruns))
       self.adiabaticTHat = np.nan*np.zeros((Nruns))
       self.NBIspecNHat   = np.nan*np.zeros((Nruns))
@@ -200,9 +205,10 @@ class sfincsScan:
         
         file = h5py.File(fullDirectory + '/sfincsOutput.h5','r') 
 
-        if file['RHSMode'][()]!=1:
-          print('RHSMode was not = 1. Not implemented yet!')
-          sys.exit('RHSMode was not = 1. Not implemented yet!')
+        RHSMode = file['RHSMode'][()]
+        if RHSMode not in [1,2,3]:
+          print('RHSMode was not = 1, 2, or 3. Not implemented yet!')
+          sys.exit('RHSMode was not = 1, 2, or 3. Not implemented yet!')
         
         integerToRepresentTrue = file['integerToRepresentTrue'][()]
         if 'finished' in file:
@@ -225,6 +231,7 @@ class sfincsScan:
 
         #consistency checks
         if self.NPeriods is None: #First run
+          self.RHSMode      = RHSMode
           self.NPeriods     = NPeriods
           self.psiAHat      = psiAHat
           self.Zs           = Zs
@@ -238,6 +245,8 @@ class sfincsScan:
           if withNBIspec:
             self.NBIspecZ = NBIspecZ
         else:
+          if self.RHSMode!=RHSMode:
+            sys.exit('Different RHSMode for different runs!')
           if self.NPeriods!=NPeriods:
             sys.exit('Different NPeriods for different runs!')
           if self.psiAHat!=psiAHat:
@@ -309,18 +318,35 @@ class sfincsScan:
         self.dTHatdpsiN[ind]   = file['dTHatdpsiN'][()]
         self.dTHatdrN[ind]     = file['dTHatdrN'][()]
         self.dTHatdrHat[ind]   = file['dTHatdrHat'][()]
-        self.dPhiHatdpsiN[ind] = file['dPhiHatdpsiN'][()]
-        self.dPhiHatdpsiHat[ind]= file['dPhiHatdpsiHat'][()]
-        self.dPhiHatdrN[ind]   = file['dPhiHatdrN'][()]
-        self.dPhiHatdrHat[ind] = file['dPhiHatdrHat'][()]
-        self.Er[ind]           = file['Er'][()]
+        # ambipolarSolve may store one value per iteration; the last one is the result of the run
+        self.dPhiHatdpsiN[ind] = np.ravel(file['dPhiHatdpsiN'][()])[-1]
+        self.dPhiHatdpsiHat[ind]= np.ravel(file['dPhiHatdpsiHat'][()])[-1]
+        self.dPhiHatdrN[ind]   = np.ravel(file['dPhiHatdrN'][()])[-1]
+        self.dPhiHatdrHat[ind] = np.ravel(file['dPhiHatdrHat'][()])[-1]
+        self.Er[ind]           = np.ravel(file['Er'][()])[-1]
         self.EParallelHat[ind] = file['EParallelHat'][()]
+        if RHSMode==3: # Monoenergetic runs
+          self.nuPrime[ind]    = file['nuPrime'][()]
+          self.EStar[ind]      = file['EStar'][()]
         if withAdiabatic:
           self.adiabaticNHat[ind] = file['adiabaticNHat'][()]
           self.adiabaticTHat[ind] = file['adiabaticTHat'][()]
         if withNBIspec:
           self.NBIspecNHat[ind]   = file['NBIspecNHat'][()]
-        if self.finished[ind] and 'FSABFlow' in file:
+        if self.finished[ind] and 'FSABFlow' in file and RHSMode!=1:
+          # Transport matrix runs store the response to each drive (whichRHS) along the last index, so there is no single
+          # set of fluxes. Keep the columns (see transportMatrix.py) and leave the usual flux variables as nan.
+          NRHS = file['FSABFlow'][()].shape[-1]
+          if 'transportMatrix' in file:
+            self.transportMatrix[ind] = file['transportMatrix'][()]
+          self.RHSColumns[ind] = {}
+          for name in file.keys():
+            if (name.split('_')[0] in ['particleFlux','heatFlux','momentumFlux','classicalParticleFlux','FSABFlow','FSABjHat','NTV']) and file[name][()].shape[-1:]==(NRHS,):
+              self.RHSColumns[ind][name] = file[name][()]
+          for name in list(vars(self)):
+            if name.split('_')[0] in ['particleFlux','heatFlux','momentumFlux','classicalParticleFlux','FSABFlow','FSABjHat','NTV']:
+              getattr(self,name)[ind] = np.nan
+        elif self.finished[ind] and 'FSABFlow' in file:
           self.FSABFlow[ind]            =file['FSABFlow'][()][:,-1]
           self.FSABjHat[ind]            =file['FSABjHat'][()][-1]
           self.NTV[ind]                 =file['NTV'][()][:,-1]
@@ -361,6 +387,20 @@ class sfincsScan:
               self.classicalParticleFlux_psiHat[ind]=file['classicalParticleFlux_psiHat'][()][:,-1]
               self.classicalParticleFlux_psiN[ind]=file['classicalParticleFlux_psiN'][()][:,-1]
           #end if self.includePhi1
+          # Keep every iteration of ambipolarSolve runs, since each one is a sample of Jr(Er)
+          NIterations = file['FSABFlow'][()].shape[-1]
+          ErNames = ['Er','dPhiHatdpsiN','dPhiHatdpsiHat','dPhiHatdrN','dPhiHatdrHat']
+          ErHistories = {name:np.ravel(file[name][()]) for name in ErNames if np.size(file[name][()])==NIterations}
+          if NIterations>1 and len(ErHistories)>0:
+            history = list(ErHistories.values())[0]
+            if history[-1]!=0.0: # The other definitions are proportional to the stored one on a flux surface
+              for name in ErNames:
+                if name not in ErHistories:
+                  ErHistories[name] = getattr(self,name)[ind]*history/history[-1]
+            self.iterations[ind] = ErHistories
+            for name in file.keys():
+              if (name.startswith('particleFlux_') or name.startswith('classicalParticleFlux_')) and file[name][()].shape[-1]==NIterations:
+                self.iterations[ind][name] = file[name][()]
         #end if self.finished[ind]
         file.close
       #end for ind in range(len(self.DataDirs))
@@ -444,6 +484,29 @@ class sfincsScan:
     print(self.FSABFlow)
 
 
+  def iterationSamples(self,ErQuantity='dPhiHatdrN'):
+    # returns the ErQuantity and Jr values (defined as for self.Jr) of the intermediate iterations of
+    # the ambipolarSolve runs that stored them. The last iteration of each run is left out, since it
+    # is already part of the scan.
+    coord=self.ErDefForJr.split('d')[-1]
+    if self.includePhi1:
+      neoclassicalName='particleFlux_vd_'+coord
+    else:
+      neoclassicalName='particleFlux_vm_'+coord
+    classicalName='classicalParticleFlux_'+coord
+    Ers=[]
+    Jrs=[]
+    for iterations in self.iterations:
+      if iterations is None or ErQuantity not in iterations or neoclassicalName not in iterations:
+        continue
+      particleFlux=iterations[neoclassicalName]
+      if classicalName in iterations:
+        particleFlux=particleFlux+iterations[classicalName]
+      Jr=np.sum(particleFlux*self.Zs[:,np.newaxis],axis=0)
+      Ers+=list(iterations[ErQuantity][:-1])
+      Jrs+=list(Jr[:-1])
+    return np.array(Ers),np.array(Jrs)
+
   def choose_Erscan_run_with_best_Er(self,ErQuantity='dPhiHatdrN'):
     # returns the index of the run with the lowest radial current
     if not(self.sortafter=='dPhiHatdrN' or self.sortafter=='dPhiHatdrHat' or self.sortafter=='dPhiHatdpsiN' or self.dPhiHatdpsiHat or self.sortafter=='Er'):
@@ -491,150 +554,140 @@ class sfincsScan:
         else:
           print('{:10.8e}        nan       nan'.format(Er[ind]))
 
-    if np.any(self.Jr==0.0) or np.any(np.isnan(self.Jr)):
-      #print('removing nans')
-      # Unbeliavable that the current is zero to machine precision! This is instead beacuse there was no result stored!
-      goodindxs=np.where(np.logical_and(self.Jr!=0.0,np.logical_not(np.isnan(self.Jr))))[0]
-      #print(goodindxs)
-      Er = Er[goodindxs]
-      self.Jr = self.Jr[goodindxs]
-      rel_error = rel_error[goodindxs]
-    
-    if len(self.Jr)<2:
+    newEr,closestind=self.proposeEr(ErQuantity=ErQuantity,interptype=interptype)
+    if newEr is None:
       print('Less than two (finished) runs. Skipping this radius.')
+      return np.nan
+
+    if launch=='ask':
+      answer=inp('Launch the calculation at the new value: '+ErQuantity + ' = {:8.6f} ? (ret=yes,n=no):'.format(newEr))
+      if len(answer)==0:
+        launch='yes'
+
+    if launch=='yes':
+      self.launchRun(ErQuantity, newEr, jobfilefrom, closestind, launchCommand=launchCommand)
+
+    return newEr
+
+  def proposeEr(self,ErQuantity='dPhiHatdrN',interptype='quad'):
+    # The estimate of the ambipolar Er used by Ersearch, without printing, asking or launching anything.
+    # Returns the new Er and the index of the closest existing run, or (None, None) if there are less than two finished runs.
+    if not(self.sortafter=='dPhiHatdrN' or self.sortafter=='dPhiHatdrHat' or self.sortafter=='dPhiHatdpsiN' or self.dPhiHatdpsiHat or self.sortafter=='Er'):
+      raise IOError("The sfincsScan data in "+self.mainDir+" was not sorted after radial electric field. "+
+                    "Please use the option sortafter='dPhiHatdrN' in the initialisation.")
+
+    Er=getattr(self,ErQuantity)
+    if self.includePhi1:
+      particleFlux=self.particleFlux_vd_rHat
+    else:
+      particleFlux=self.particleFlux_vm_rHat
+    Jr=np.sum(particleFlux*self.Zs,axis=1)
+
+    #print('removing nans')
+    # Unbeliavable that the current is zero to machine precision! This is instead beacuse there was no result stored!
+    goodindxs=np.where(np.logical_and(Jr!=0.0,np.logical_not(np.isnan(Jr))))[0]
+    #print(goodindxs)
+    Er = Er[goodindxs]
+    Jr = Jr[goodindxs]
+    
+    if len(Jr)<2:
+      return None,None
+
+    extrapNeeded='No'
+    if np.all(np.diff(np.sign(Jr))==0.0):
+      extrapNeeded='Right'
+      if abs(Jr[0])<abs(Jr[-1]):
+        extrapNeeded='Left'
+
+    if np.any(np.diff(Er)==0.0):
+      raise IOError('The radial electric fields in the scan '+self.mainDir+' are not unique! Perhaps not an Er scan.')
+    if self.Nruns==2 or extrapNeeded=='Left':
+      newEr = Er[0]+(Er[1]-Er[0])/(Jr[1]-Jr[0])*(0.0-Jr[0])
+    elif extrapNeeded=='Right':
+      newEr = Er[-1]+(Er[-2]-Er[-1])/(Jr[-2]-Jr[-1])*(0.0-Jr[-1])
+    elif interptype=='lin' or len(Jr)==2:
+      Lind=np.where(np.diff(np.sign(Jr))!=0)[0][0]
+      newEr=Er[Lind]+(Er[Lind+1]-Er[Lind])/(Jr[Lind+1]-Jr[Lind])*(0.0-Jr[Lind])
     else:
-      extrapNeeded='No'
-      if np.all(np.diff(np.sign(self.Jr))==0.0):
-        extrapNeeded='Right'
-        if abs(self.Jr[0])<abs(self.Jr[-1]):
-          extrapNeeded='Left'
-
-      if np.any(np.diff(Er)==0.0):
-        sys.exit('Error using Ersearch: The radial electric fields in this scan '+self.mainDir+' are not unique! Perhaps not an Er scan.')
-      if self.Nruns==2 or extrapNeeded=='Left':
-        newEr = Er[0]+(Er[1]-Er[0])/(self.Jr[1]-self.Jr[0])*(0.0-self.Jr[0])
-      elif extrapNeeded=='Right':
-        newEr = Er[-1]+(Er[-2]-Er[-1])/(self.Jr[-2]-self.Jr[-1])*(0.0-self.Jr[-1])
-      elif interptype=='lin' or len(self.Jr)==2:
-        Lind=np.where(np.diff(np.sign(self.Jr))!=0)[0][0]
-        newEr=Er[Lind]+(Er[Lind+1]-Er[Lind])/(self.Jr[Lind+1]-self.Jr[Lind])*(0.0-self.Jr[Lind])
+      Lind=np.where(np.diff(np.sign(Jr))!=0)[0][0]
+      Hind=Lind+1
+      if self.Nruns==3 or Lind==0:
+        #define c by Er=Er[base]+c[0]*(Jr-Jr[base])+c[1]*(Jr-Jr[base])^2
+        base=0
+        DJ1=Jr[base+1]-Jr[base]
+        DJ2=Jr[base+2]-Jr[base]
+        A=np.array([[DJ2**2,-DJ1**2],[-DJ2,DJ1]])
+        c=1/(DJ1*DJ2*(DJ2-DJ1))*np.matmul(A,Er[base+1:base+3]-Er[base])
+        newEr = Er[base]+c[0]*(0.0-Jr[base])+c[1]*(0.0-Jr[base])**2
+      elif Lind==len(Jr)-2:
+        base=len(Jr)-3
+        DJ1=Jr[base+1]-Jr[base]
+        DJ2=Jr[base+2]-Jr[base]
+        A=np.array([[DJ2**2,-DJ1**2],[-DJ2,DJ1]])
+        c=1/(DJ1*DJ2*(DJ2-DJ1))*np.matmul(A,Er[base+1:base+3]-Er[base])
+        newEr = Er[base]+c[0]*(0.0-Jr[base])+c[1]*(0.0-Jr[base])**2
       else:
-        Lind=np.where(np.diff(np.sign(self.Jr))!=0)[0][0]
-        Hind=Lind+1
-        if self.Nruns==3 or Lind==0:
-          #define c by Er=Er[base]+c[0]*(self.Jr-self.Jr[base])+c[1]*(self.Jr-self.Jr[base])^2
-          base=0
-          DJ1=self.Jr[base+1]-self.Jr[base]
-          DJ2=self.Jr[base+2]-self.Jr[base]
-          A=np.array([[DJ2**2,-DJ1**2],[-DJ2,DJ1]])
-          c=1/(DJ1*DJ2*(DJ2-DJ1))*np.matmul(A,Er[base+1:base+3]-Er[base])
-          newEr = Er[base]+c[0]*(0.0-self.Jr[base])+c[1]*(0.0-self.Jr[base])**2
-        elif Lind==len(self.Jr)-2:
-          base=len(self.Jr)-3
-          DJ1=self.Jr[base+1]-self.Jr[base]
-          DJ2=self.Jr[base+2]-self.Jr[base]
-          A=np.array([[DJ2**2,-DJ1**2],[-DJ2,DJ1]])
-          c=1/(DJ1*DJ2*(DJ2-DJ1))*np.matmul(A,Er[base+1:base+3]-Er[base])
-          newEr = Er[base]+c[0]*(0.0-self.Jr[base])+c[1]*(0.0-self.Jr[base])**2
-        else:
-          #Make two quadratic approximations
-          bas1=Lind-1
-          bas2=Lind
-
-          DJ1=self.Jr[bas1+1]-self.Jr[bas1]
-          DJ2=self.Jr[bas1+2]-self.Jr[bas1]
-          A=np.array([[DJ2**2,-DJ1**2],[-DJ2,DJ1]])
-          c=1/(DJ1*DJ2*(DJ2-DJ1))*np.matmul(A,Er[bas1+1:bas1+3]-Er[bas1])
-          Er1=Er[bas1]+c[0]*(0.0-self.Jr[bas1])+c[1]*(0.0-self.Jr[bas1])**2
-
-          DJ1=self.Jr[bas2+1]-self.Jr[bas2]
-          DJ2=self.Jr[bas2+2]-self.Jr[bas2]
-          A=np.array([[DJ2**2,-DJ1**2],[-DJ2,DJ1]])
-          c=1/(DJ1*DJ2*(DJ2-DJ1))*np.matmul(A,Er[bas2+1:bas2+3]-Er[bas2])
-          Er2=Er[bas2]+c[0]*(0.0-self.Jr[bas2])+c[1]*(0.0-self.Jr[bas2])**2
-          
-          x=(0.0-self.Jr[Lind])/(self.Jr[Hind]-self.Jr[Lind])
-          newEr = Er1*(1-x)+Er2*x
-        #end if self.Nruns==3 or Lind==0
-        if (newEr-Er[Lind])*(newEr-Er[Lind+1])>0: #newEr is not in the interval => use linear approximation
-          newEr=Er[Lind]+(Er[Lind+1]-Er[Lind])/(self.Jr[Lind+1]-self.Jr[Lind])*(0.0-self.Jr[Lind])
-      #end if self.Nruns==2
-      closestind=np.argmin(np.abs(newEr-Er))
-
-      if launch=='ask':
-        answer=inp('Launch the calculation at the new value: '+ErQuantity + ' = {:8.6f} ? (ret=yes,n=no):'.format(newEr))
-        if len(answer)==0:
-          launch='yes'
-
-      if launch=='yes':
-        self.launchRun(ErQuantity, newEr, jobfilefrom, closestind, launchCommand=launchCommand)
+        #Make two quadratic approximations
+        bas1=Lind-1
+        bas2=Lind
 
-    return newEr
-  
-  def launchRun(self, ErQuantity, newEr, jobfilefrom, closestind, sendRunToScheduler=True, launchCommand='sbatch'):
-    newDataDir=self.mainDir + '/' + ErQuantity + '{}'.format(newEr)
-    launchindeed=False
-    if not(os.path.isdir(newDataDir)):
-      os.mkdir(newDataDir) 
-      launchindeed=True
+        DJ1=Jr[bas1+1]-Jr[bas1]
+        DJ2=Jr[bas1+2]-Jr[bas1]
+        A=np.array([[DJ2**2,-DJ1**2],[-DJ2,DJ1]])
+        c=1/(DJ1*DJ2*(DJ2-DJ1))*np.matmul(A,Er[bas1+1:bas1+3]-Er[bas1])
+        Er1=Er[bas1]+c[0]*(0.0-Jr[bas1])+c[1]*(0.0-Jr[bas1])**2
+
+        DJ1=Jr[bas2+1]-Jr[bas2]
+        DJ2=Jr[bas2+2]-Jr[bas2]
+        A=np.array([[DJ2**2,-DJ1**2],[-DJ2,DJ1]])
+        c=1/(DJ1*DJ2*(DJ2-DJ1))*np.matmul(A,Er[bas2+1:bas2+3]-Er[bas2])
+        Er2=Er[bas2]+c[0]*(0.0-Jr[bas2])+c[1]*(0.0-Jr[bas2])**2
+        
+        x=(0.0-Jr[Lind])/(Jr[Hind]-Jr[Lind])
+        newEr = Er1*(1-x)+Er2*x
+      #end if self.Nruns==3 or Lind==0
+      if (newEr-Er[Lind])*(newEr-Er[Lind+1])>0: #newEr is not in the interval => use linear approximation
+        newEr=Er[Lind]+(Er[Lind+1]-Er[Lind])/(Jr[Lind+1]-Jr[Lind])*(0.0-Jr[Lind])
+    #end if self.Nruns==2
+
+    # The index refers to all the runs (not only the finished ones) so it can be used with DataDirs
+    closestind=goodindxs[np.argmin(np.abs(newEr-Er))]
+
+    return newEr,closestind
+
+  def planRun(self, ErQuantity, newEr, closestind, jobfilefrom='nearest', radLabel='rN'):
+    # Describes a new run without creating anything. The input.namelist of the run with index closestind is used as the template.
+    # The radius is given in the radial coordinate radLabel (e.g. 'rN' or 'psiN'), which is stored with it.
+    templateDir=self.mainDir + '/' + self.DataDirs[closestind]
+    if jobfilefrom=='nearest':
+      jobfile=templateDir+'/job.sfincsScan'
     else:
+      jobfile=jobfilefrom
+    return {'radius':getattr(self,radLabel)[0], 'radLabel':radLabel, 'ErQuantity':ErQuantity, 'Er':newEr, 'templateDir':templateDir,
+            'jobFile':jobfile, 'runDir':self.mainDir + '/' + ErQuantity + '{}'.format(newEr)}
+
+  def planErsearch(self,ErQuantity='dPhiHatdrN',interptype='quad',jobfilefrom='nearest',radLabel='rN'):
+    # Non-interactive version of Ersearch. Returns a list with the proposed run (see planRun), which is empty if no run can be proposed.
+    newEr,closestind=self.proposeEr(ErQuantity=ErQuantity,interptype=interptype)
+    if newEr is None:
+      return []
+    return [self.planRun(ErQuantity, newEr, closestind, jobfilefrom=jobfilefrom, radLabel=radLabel)]
+  
+  def launchRun(self, ErQuantity, newEr, jobfilefrom, closestind, sendRunToScheduler=True, launchCommand='sbatch', overwrite=None):
+    #overwrite can be None (ask if the directory exists), True or False
+    plan=self.planRun(ErQuantity, newEr, closestind, jobfilefrom=jobfilefrom)
+    newDataDir=plan['runDir']
+    if os.path.isdir(newDataDir) and overwrite is None:
       print('The directory {} already exists. It might contain a failed calculation.'.format(newDataDir))
       answer=inp('Overwrite files and (if <noRun> was not used) run again? (<press return>=yes, <type anything and then press return>=no):') 
-      if len(answer)==0:
-        launchindeed=True
-    if launchindeed:
-      #copy jobfile
-      if jobfilefrom=='nearest':
-         jobfilesource=self.mainDir + '/' + self.DataDirs[closestind]+'/job.sfincsScan'
-      else:
-         jobfilesource=jobfilefrom
-      with open(jobfilesource) as f:
-        oldjob_file=f.readlines()
-      newjob_fid=open(newDataDir+'/job.sfincsScan','w')
-      for line in oldjob_file:
-        newjob_fid.write(line)
-      newjob_fid.close()
-
-      #copy input.namelist
-      with open(self.mainDir + '/' + self.DataDirs[closestind]+'/input.namelist') as f:
-        oldnamelist_file=f.readlines()
-      
-      # First, some safety checks and modifications as needed
-      ErQuantityLineInd = None
-      for lineInd, line in enumerate(oldnamelist_file):
-          
-          if '&physicsParameters' in line:
-              physicsParametersLineInd = lineInd
-        
-          if (ErQuantity in line) and ('_min' not in line) and ('_max' not in line) and ('search_tolerance' not in line):
-              ErQuantityLineInd = lineInd
-
-      if ErQuantityLineInd is None:
-          oldnamelist_file.insert(physicsParametersLineInd + 1, '{} = {}\n'.format(ErQuantity, newEr))
-
-      # Now write the new file
-      newnamelist_fid=open(newDataDir+'/input.namelist','w')
-      for line in oldnamelist_file:
-        startind=line.find(ErQuantity)
-        if (line.find('_min') != -1) or (line.find('_max') != -1) or (line.find('search_tolerance') != -1): # the previous line will throw a false positive
-            startind = -1
-        ambiSolveInd = line.find('ambipolarSolve')
-        if (line.find('ambipolarSolveOption') != -1) or (line.find('NEr_ambipolarSolve') != -1): # the previous line will throw a false positive
-            ambiSolveInd = -1
-        if startind == -1 and ambiSolveInd == -1:
-            newnamelist_fid.write(line)
-        elif ambiSolveInd != -1:
-            newnamelist_fid.write(line[:ambiSolveInd]+'ambipolarSolve = .false.\n')
-        elif startind != -1:
-            newnamelist_fid.write(line[:startind]+ErQuantity+' = '+'{}\n'.format(newEr))
-      newnamelist_fid.close()
-      
-      if sendRunToScheduler:
-          env = dict(os.environ)
-          stat=subprocess.call([launchCommand,'job.sfincsScan'],cwd=newDataDir,env=env)
-          if stat > 0:
-            print('Error submitting the file '+newDataDir+'/job.sfincsScan with '+launchCommand+' !')
-            sys.exit(stat)
+      overwrite=(len(answer)==0)
+    launchindeed=materializeRun(plan, overwrite=overwrite)
+    if launchindeed and sendRunToScheduler:
+      env = dict(os.environ)
+      stat=subprocess.call([launchCommand,'job.sfincsScan'],cwd=newDataDir,env=env)
+      if stat > 0:
+        print('Error submitting the file '+newDataDir+'/job.sfincsScan with '+launchCommand+' !')
+        sys.exit(stat)
 
   def plot(self,xvarName,yvarNames):
     print(xvarName)
@@ -839,3 +892,137 @@ class sfincsRadialAndErScan:
                                                interptype=interptype,jobfilefrom=jobfilefrom)
         
     return newErQ
+
+  def planErsearch(self,ErQuantity='dPhiHatdrN',interptype='quad',jobfilefrom='nearest',radLabel='rN'):
+    # Non-interactive version of Ersearch for all radii at once. Returns a list of proposed runs (see sfincsScan.planRun),
+    # which can be created with materializeRuns and submitted with submitRuns.
+    if jobfilefrom=='parentdir':
+      jobfilefrom=self.headDir+'/job.sfincsScan'
+    plans=[]
+    for ind in range(self.Nradii):
+      plans+=self.Erscans[ind].planErsearch(ErQuantity=ErQuantity,interptype=interptype,jobfilefrom=jobfilefrom,radLabel=radLabel)
+    return plans
+
+#################################################################################################################
+# Non-interactive creation and submission of new runs
+#################################################################################################################
+
+def materializeRun(plan, overwrite=False):
+  # Creates the run described by plan (see sfincsScan.planRun) by copying the job file and the input.namelist of the
+  # template run, with the new Er and without ambipolarSolve. If plan contains a 'patch' dictionary (as for
+  # IO.patchParsedNamelist), those namelist parameters (such as the resolution parameters) are changed as well.
+  # Returns True if the files were written.
+  from IO import parseNamelist, patchParsedNamelist, namelistText
+  newDataDir=plan['runDir']
+  if os.path.isdir(newDataDir):
+    if not overwrite:
+      return False
+  else:
+    os.makedirs(newDataDir)
+
+  #copy jobfile
+  with open(plan['jobFile']) as f:
+    oldjob_file=f.readlines()
+  with open(newDataDir+'/job.sfincsScan','w') as newjob_fid:
+    for line in oldjob_file:
+      newjob_fid.write(line)
+
+  #copy input.namelist
+  patch={'general':{'ambipolarSolve':False}, 'physicsParameters':{plan['ErQuantity']:plan['Er']}}
+  for group, params in plan.get('patch',{}).items():
+    patch.setdefault(group,{}).update(params)
+  newnamelist=patchParsedNamelist(parseNamelist(plan['templateDir']+'/input.namelist'), patch)
+  with open(newDataDir+'/input.namelist','w') as newnamelist_fid:
+    newnamelist_fid.write(namelistText(newnamelist))
+
+  return True
+
+def materializeRuns(plans, overwrite=False):
+  # Creates all the runs in plans. Existing directories are skipped unless overwrite is True, so nothing is ever asked.
+  # Returns the list of run directories that were written.
+  runDirs=[]
+  for plan in plans:
+    if materializeRun(plan, overwrite=overwrite):
+      runDirs.append(plan['runDir'])
+  return runDirs
+
+def writeArrayJob(runDirs, arrayDir, jobFileName='job.sfincsScan'):
+  # Writes a Slurm array job that runs every directory in runDirs, using the job file of the first run as the template.
+  # Each array task moves to its own run directory (listed in a separate file) before running, so the results end up
+  # exactly where they would be if every run had been submitted separately. Returns the path of the array job file.
+  import tempfile
+  with open(runDirs[0]+'/'+jobFileName) as f:
+    template=f.readlines()
+
+  fid,listFile=tempfile.mkstemp(prefix='sfincsArray_', suffix='.txt', dir=arrayDir)
+  with os.fdopen(fid,'w') as f:
+    for runDir in runDirs:
+      f.write(os.path.abspath(runDir)+'\n')
+  arrayFile=listFile[:-len('.txt')]+'.sh'
+
+  # Directives that only make sense for single runs are replaced
+  hasShebang=template[0].startswith('#!')
+  header=[template[0]] if hasShebang else ['#!/bin/bash -l\n']
+  header.append('#SBATCH --array=0-{}\n'.format(len(runDirs)-1))
+  header.append('#SBATCH -o '+arrayFile[:-len('.sh')]+'.out.%A_%a\n')
+  header.append('#SBATCH -e '+arrayFile[:-len('.sh')]+'.err.%A_%a\n')
+  body=[]
+  moved=False
+  for line in template[1 if hasShebang else 0:]:
+    words=line.split()
+    if line.startswith('#SBATCH') and len(words)>1 and (words[1] in ['-o','-e','-D'] or words[1].startswith('--array')):
+      continue
+    if not moved and line.strip()!='' and not line.startswith('#'):
+      body.append('# Move to the run directory of this array task:\n')
+      body.append('cd "$(sed -n "$((SLURM_ARRAY_TASK_ID+1))p" '+listFile+')" || exit 1\n')
+      body.append('exec >sfincsJob.out.${SLURM_ARRAY_JOB_ID}_${SLURM_ARRAY_TASK_ID} 2>sfincsJob.err.${SLURM_ARRAY_JOB_ID}_${SLURM_ARRAY_TASK_ID}\n\n')
+      moved=True
+    body.append(line)
+
+  with open(arrayFile,'w') as f:
+    for line in header+body:
+      f.write(line)
+  return arrayFile
+
+def submitRuns(runDirs, launchCommand='sbatch', useArray=True, arrayDir=None, maxArraySize=1000, jobFileName='job.sfincsScan', cacheFile=None):
+  # Submits all the runs in runDirs. If useArray is True, runs with identical job files are submitted together as
+  # Slurm array jobs (one scheduler call for each distinct job file and each maxArraySize runs), and the array job
+  # files are written in arrayDir (by default, the deepest directory containing all the runs). Otherwise, each run
+  # is submitted separately. If cacheFile is given, runs whose inputs match a finished run in that result cache (see
+  # resultCache.py) get a link to its output and are not submitted. Returns the list of submitted job files. Raises
+  # IOError if a submission fails.
+  if cacheFile is not None and len(runDirs)!=0:
+    from resultCache import reuseCachedRuns
+    toSubmit=reuseCachedRuns(cacheFile, runDirs)
+    if len(toSubmit)!=len(runDirs):
+      print('{} run(s) were found in the result cache {}, so their outputs were linked instead of running them again.'.format(len(runDirs)-len(toSubmit), cacheFile))
+    runDirs=toSubmit
+  if len(runDirs)==0:
+    return []
+  env = dict(os.environ)
+  submitted=[]
+
+  if not useArray:
+    for runDir in runDirs:
+      stat=subprocess.call([launchCommand,jobFileName],cwd=runDir,env=env)
+      if stat > 0:
+        raise IOError('Error submitting the file '+runDir+'/'+jobFileName+' with '+launchCommand+' !')
+      submitted.append(runDir+'/'+jobFileName)
+    return submitted
+
+  if arrayDir is None:
+    arrayDir=os.path.commonpath([os.path.dirname(os.path.abspath(runDir)) for runDir in runDirs])
+
+  groups={}
+  for runDir in runDirs:
+    with open(runDir+'/'+jobFileName) as f:
+      groups.setdefault(f.read(),[]).append(runDir)
+
+  for groupDirs in groups.values():
+    for start in range(0,len(groupDirs),maxArraySize):
+      arrayFile=writeArrayJob(groupDirs[start:start+maxArraySize], arrayDir, jobFileName=jobFileName)
+      stat=subprocess.call([launchCommand,arrayFile],cwd=arrayDir,env=env)
+      if stat > 0:
+        raise IOError('Error submitting the file '+arrayFile+' with '+launchCommand+' !')
+      submitted.append(arrayFile)
+  return submitted
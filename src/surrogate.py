@@ -0,0 +1,299 @@
+# This file contains functions for a Gaussian process surrogate model of the radial current as a function of radius and the radial electric field.
+
+def transformJr(Jr, JrScale):
+
+    '''
+    Inputs:
+        Jr: NumPy array of radial current values.
+        JrScale: positive scale for the transformation.
+    Outputs:
+        NumPy array of arcsinh(Jr / JrScale). This compresses the
+        large values of Jr near Er = 0 (the "spike") while keeping
+        the sign of Jr, and therefore the roots, unchanged.
+    '''
+
+    import numpy as np
+
+    return np.arcsinh(np.array(Jr) / JrScale)
+
+def kernel(X1, X2, lengthScales, signalVar):
+
+    '''
+    Inputs:
+        X1: 2D NumPy array of points (one per row).
+        X2: 2D NumPy array of points (one per row).
+        lengthScales: 1D NumPy array with one length scale per
+                      column of X1 and X2.
+        signalVar: variance of the Gaussian process.
+    Outputs:
+        2D NumPy array of the anisotropic squared exponential
+        covariance between the points in X1 and X2.
+    '''
+
+    import numpy as np
+
+    diff = (X1[:,np.newaxis,:] - X2[np.newaxis,:,:]) / lengthScales
+
+    return signalVar * np.exp(-0.5 * np.sum(diff ** 2, axis=-1))
+
+def negLogMarginalLikelihood(logParams, X, y):
+
+    '''
+    Inputs:
+        logParams: 1D NumPy array containing the logarithms of the
+                   length scales (one per column of X), the signal
+                   variance, and the noise variance, in that order.
+        X: 2D NumPy array of training points (one per row).
+        y: 1D NumPy array of training values.
+    Outputs:
+        Negative log marginal likelihood of the Gaussian process,
+        and its gradient with respect to logParams. The gradient is
+        computed analytically so that the optimizer does not need a
+        Cholesky factorization for every parameter at every step.
+    '''
+
+    import numpy as np
+    from scipy.linalg import cho_factor, cho_solve
+
+    params = np.exp(logParams)
+    lengthScales = params[:X.shape[1]]
+    signalVar = params[-2]
+    noiseVar = params[-1]
+
+    kernelOnly = kernel(X, X, lengthScales, signalVar)
+    K = kernelOnly + noiseVar * np.eye(X.shape[0])
+    try:
+        L = cho_factor(K, lower=True)
+    except np.linalg.LinAlgError:
+        return 1e25, np.zeros(logParams.shape)
+
+    alpha = cho_solve(L, y)
+    nll = 0.5 * y @ alpha + np.sum(np.log(np.diag(L[0]))) + 0.5 * len(y) * np.log(2 * np.pi)
+
+    # d(nll)/d(theta) = -0.5 * tr((alpha alpha^T - K^-1) dK/dtheta)
+    inner = np.outer(alpha, alpha) - cho_solve(L, np.eye(X.shape[0]))
+    grad = np.zeros(logParams.shape)
+    for dim in range(X.shape[1]):
+        sqDiff = ((X[:,np.newaxis,dim] - X[np.newaxis,:,dim]) / lengthScales[dim]) ** 2
+        grad[dim] = -0.5 * np.sum(inner * kernelOnly * sqDiff)
+    grad[-2] = -0.5 * np.sum(inner * kernelOnly)
+    grad[-1] = -0.5 * noiseVar * np.trace(inner)
+
+    return nll, grad
+
+def fitSurrogate(radii, Ers, Jrs, JrScale=None, maxPoints=500):
+
+    '''
+    Inputs:
+        radii: 1D NumPy array of the radial coordinate of each run.
+        Ers: 1D NumPy array of the electric field (or proxy) of each run.
+        Jrs: 1D NumPy array of the radial current of each run.
+        JrScale: scale used by transformJr. If None, the median
+                 of |Jrs| is used.
+        maxPoints: largest number of runs used to fit the surrogate.
+                   If there are more, an evenly spaced subset (in
+                   order of radius and then Er) is used, since the
+                   cost of the fit grows as the cube of the number
+                   of runs.
+    Outputs:
+        Dictionary describing the fitted Gaussian process. The
+        hyperparameters are chosen by maximizing the marginal
+        likelihood. Because several flux surfaces are fit at once,
+        surfaces with little data borrow information from their
+        neighbors.
+    '''
+
+    import numpy as np
+    from scipy.linalg import cholesky
+    from scipy.optimize import minimize
+
+    radii = np.array(radii, dtype=float)
+    Ers = np.array(Ers, dtype=float)
+    Jrs = np.array(Jrs, dtype=float)
+
+    if len(radii) > maxPoints:
+        order = np.lexsort((Ers, radii))
+        keep = order[np.round(np.linspace(0, len(order) - 1, num=maxPoints)).astype(int)]
+        radii = radii[keep]
+        Ers = Ers[keep]
+        Jrs = Jrs[keep]
+
+    if JrScale is None:
+        JrScale = np.median(np.abs(Jrs))
+        if JrScale == 0:
+            JrScale = 1.0
+
+    # Work with normalized inputs and outputs so the same hyperparameter bounds make sense for any campaign
+    radCenter = np.mean(radii)
+    radScale = np.ptp(radii) if np.ptp(radii) != 0 else 1.0
+    ErScale = np.max(np.abs(Ers)) if np.max(np.abs(Ers)) != 0 else 1.0
+    yRaw = transformJr(Jrs, JrScale)
+    yMean = np.mean(yRaw)
+    yScale = np.std(yRaw) if np.std(yRaw) != 0 else 1.0
+
+    X = np.column_stack(((radii - radCenter) / radScale, Ers / ErScale))
+    y = (yRaw - yMean) / yScale
+
+    initial = np.log([0.3, 0.1, 1.0, 1e-4])
+    bounds = [(np.log(1e-2), np.log(1e1)), (np.log(1e-3), np.log(1e1)), (np.log(1e-2), np.log(1e2)), (np.log(1e-8), np.log(1e-1))]
+    opt = minimize(negLogMarginalLikelihood, initial, args=(X, y), method='L-BFGS-B', jac=True, bounds=bounds)
+    params = np.exp(opt.x)
+
+    model = {'X':X, 'y':y, 'lengthScales':params[:2], 'signalVar':params[2], 'noiseVar':params[3],
+             'radCenter':radCenter, 'radScale':radScale, 'ErScale':ErScale, 'yMean':yMean, 'yScale':yScale, 'JrScale':JrScale}
+    K = kernel(X, X, model['lengthScales'], model['signalVar']) + model['noiseVar'] * np.eye(X.shape[0])
+    model['chol'] = (cholesky(K, lower=True), True) # Same form as the output of cho_factor, but with a clean upper triangle so it can be extended
+
+    return model
+
+def predictSurrogate(model, radii, Ers):
+
+    '''
+    Inputs:
+        model: dictionary, as from fitSurrogate.
+        radii: 1D NumPy array of radial coordinates.
+        Ers: 1D NumPy array of electric field (or proxy) values.
+    Outputs:
+        Posterior mean and standard deviation of the (normalized
+        and transformed) radial current at each (radius, Er)
+        pair. Only the sign of the mean and its size relative to
+        the standard deviation are physically meaningful.
+    '''
+
+    import numpy as np
+    from scipy.linalg import cho_solve
+
+    Xs = np.column_stack(((np.array(radii, dtype=float) - model['radCenter']) / model['radScale'], np.array(Ers, dtype=float) / model['ErScale']))
+    Ks = kernel(Xs, model['X'], model['lengthScales'], model['signalVar'])
+
+    mean = Ks @ cho_solve(model['chol'], model['y']) + model['yMean'] / model['yScale']
+    var = model['signalVar'] - np.sum(Ks * cho_solve(model['chol'], Ks.T).T, axis=1)
+
+    return mean, np.sqrt(np.maximum(var, 0))
+
+def rootAcquisition(mean, std):
+
+    '''
+    Inputs:
+        mean: NumPy array of posterior means.
+        std: NumPy array of posterior standard deviations.
+    Outputs:
+        NumPy array that is large where the surrogate cannot tell
+        whether Jr is positive or negative, and therefore where a
+        new run would most reduce the uncertainty in the roots.
+    '''
+
+    import numpy as np
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = std * np.exp(-0.5 * (mean / std) ** 2)
+
+    return np.nan_to_num(out)
+
+def surfaceUncertainty(model, radius, ErRange, numCandidates=400):
+
+    '''
+    Inputs:
+        model: dictionary, as from fitSurrogate.
+        radius: radial coordinate of a flux surface.
+        ErRange: [min, max] electric field (or proxy) range to check.
+        numCandidates: number of electric field values to check.
+    Outputs:
+        Largest value of rootAcquisition on the flux surface. This
+        is close to 1 if the surrogate has no idea where the roots
+        are and close to 0 if it is confident about the sign of the
+        radial current everywhere except very near the roots.
+    '''
+
+    import numpy as np
+
+    grid = np.linspace(ErRange[0], ErRange[1], num=numCandidates)
+    mean, std = predictSurrogate(model, [radius] * numCandidates, grid)
+
+    return np.max(rootAcquisition(mean, std)) / np.sqrt(model['signalVar'])
+
+def proposeRootSamples(model, targetRadii, ErRanges, existingErs, batchSize, numCandidates=400, diffTol=0.01):
+
+    '''
+    Inputs:
+        model: dictionary, as from fitSurrogate.
+        targetRadii: list of the radial coordinates of the flux
+                     surfaces that need more data.
+        ErRanges: list of [min, max] electric field (or proxy)
+                  ranges in which to search, one per target radius.
+        existingErs: list of 1D NumPy arrays of the electric field
+                     (or proxy) values that already exist (or will
+                     soon exist) for each target radius.
+        batchSize: total number of new runs to propose.
+        numCandidates: number of candidate electric field values
+                       per target radius.
+        diffTol: candidates with a relative difference smaller than
+                 this from an existing value are not proposed.
+    Outputs:
+        List (one entry per target radius) of 1D NumPy arrays with
+        the proposed electric field (or proxy) values. The batch is
+        chosen greedily: after each choice, the surrogate is updated
+        as if the run had returned the predicted mean (the "kriging
+        believer" strategy), which spreads the batch out. Each update
+        is a rank-1 extension of the Cholesky factor of the model.
+    '''
+
+    import numpy as np
+    from scipy.linalg import solve_triangular
+    from dataProc import relDiff
+
+    candRadii = []
+    candErs = []
+    candOwner = []
+    for ind, (radius, ErRange) in enumerate(zip(targetRadii, ErRanges)):
+        grid = np.linspace(ErRange[0], ErRange[1], num=numCandidates)
+        if len(existingErs[ind]) != 0:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                keep = [np.all(relDiff(Er, np.array(existingErs[ind])) > diffTol) for Er in grid]
+            grid = grid[keep]
+        candRadii += [radius] * len(grid)
+        candErs += list(grid)
+        candOwner += [ind] * len(grid)
+    candRadii = np.array(candRadii)
+    candErs = np.array(candErs)
+    candOwner = np.array(candOwner, dtype=int)
+
+    # With Ks the covariance between the training points and the candidates and L the Cholesky factor of
+    # the training covariance, the posterior is described by V = L^-1 Ks^T and w = L^-1 y
+    Xs = np.column_stack(((candRadii - model['radCenter']) / model['radScale'], candErs / model['ErScale']))
+    L = model['chol'][0]
+    V = solve_triangular(L, kernel(model['X'], Xs, model['lengthScales'], model['signalVar']), lower=True)
+    w = solve_triangular(L, model['y'], lower=True)
+    meanOffset = model['yMean'] / model['yScale']
+
+    proposals = [np.array([]) for _ in targetRadii]
+    available = np.ones(candErs.shape, dtype=bool)
+    for _ in range(batchSize):
+        if not np.any(available):
+            break
+        mean = V.T @ w + meanOffset
+        std = np.sqrt(np.maximum(model['signalVar'] - np.sum(V ** 2, axis=0), 0))
+        acq = rootAcquisition(mean, std)
+        acq[np.logical_not(available)] = -1
+        best = np.argmax(acq)
+        if acq[best] <= 0:
+            break
+        owner = candOwner[best]
+        proposals[owner] = np.append(proposals[owner], candErs[best])
+
+        # Do not propose (effectively) the same run twice
+        with np.errstate(invalid='ignore', divide='ignore'):
+            tooClose = np.logical_and(candOwner == owner, relDiff(candErs[best], candErs) <= diffTol)
+        available[tooClose] = False
+        available[best] = False
+
+        # Pretend the run returned the predicted mean. Adding it to the training set only appends one row to L
+        # (hyperparameters are kept), so V gains one row and nothing needs to be refactored. The appended
+        # entry of w is zero because the pretend value is the predicted mean, so the mean does not change.
+        l = V[:,best]
+        d = np.sqrt(max(model['signalVar'] + model['noiseVar'] - l @ l, model['noiseVar']))
+        newRow = (kernel(Xs[best:best+1], Xs, model['lengthScales'], model['signalVar'])[0] - l @ V) / d
+        V = np.vstack((V, newRow))
+        w = np.append(w, 0.0)
+
+    return [np.sort(prop) for prop in proposals]
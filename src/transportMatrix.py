@@ -0,0 +1,149 @@
+# This file contains functions that use the results of SFINCS transport matrix runs (RHSMode = 2) to evaluate the fluxes and flows for arbitrary gradients.
+
+def radialDerivativeFactor(dataContainer, radialVar):
+
+    '''
+    Inputs:
+        dataContainer: sfincsScan object.
+        radialVar: radial coordinate in which gradients are given.
+                   Must be 'psiHat', 'psiN', 'rHat', or 'rN'.
+    Outputs:
+        NumPy array (with one entry per run in dataContainer) of the
+        factors that convert a radial derivative with respect to
+        radialVar into a derivative with respect to psiHat.
+    '''
+
+    import numpy as np
+
+    psiAHat = dataContainer.psiAHat
+    rN = dataContainer.rN
+
+    if radialVar == 'psiHat':
+        factor = np.ones(dataContainer.Nruns)
+    elif radialVar == 'psiN':
+        factor = np.ones(dataContainer.Nruns) / psiAHat
+    elif radialVar == 'rN':
+        factor = 1 / (2 * rN * psiAHat)
+    elif radialVar == 'rHat':
+        factor = (dataContainer.rHat / rN) / (2 * rN * psiAHat) # rHat / rN = aHat
+    else:
+        raise IOError('<radialVar> must be psiHat, psiN, rHat, or rN.')
+
+    return factor
+
+def RHSWeights(nHat, THat, Z, alpha, dnHatdpsiHat, dTHatdpsiHat, dPhiHatdpsiHat, EParallelHat):
+
+    '''
+    Inputs:
+        nHat, THat, Z: density, temperature, and charge of the
+                       species (in SFINCS units).
+        alpha: SFINCS normalization parameter.
+        dnHatdpsiHat, dTHatdpsiHat, dPhiHatdpsiHat: radial gradients
+                       of the density, temperature, and electric
+                       potential.
+        EParallelHat: inductive parallel electric field.
+        All of the inputs can be NumPy arrays that broadcast against
+        each other.
+    Outputs:
+        NumPy array whose last axis has length 3, containing the
+        weights of the responses to the three right-hand sides of a
+        SFINCS transport matrix run. With RHSMode = 2, SFINCS uses
+            whichRHS = 1: dnHatdpsiHat = 1,
+            whichRHS = 2: dnHatdpsiHat = (3/2) nHat / THat and
+                          dTHatdpsiHat = 1 (so that the drive
+                          (1/n) dn/dpsi - (3/2) (1/T) dT/dpsi vanishes),
+            whichRHS = 3: EParallelHat = 1,
+        with the other drives set to zero. Since the drift-kinetic
+        equation is linear in these drives (for a fixed electric
+        field in the ExB drift), the fluxes for any other gradients
+        are the sum of the responses multiplied by these weights.
+    '''
+
+    import numpy as np
+
+    w1 = dnHatdpsiHat - 1.5 * nHat / THat * dTHatdpsiHat + alpha * Z * nHat / THat * dPhiHatdpsiHat
+    w2 = dTHatdpsiHat
+    w3 = EParallelHat
+
+    return np.stack(np.broadcast_arrays(w1, w2, w3), axis=-1)
+
+def stackColumns(dataContainer, name):
+
+    '''
+    Inputs:
+        dataContainer: sfincsScan object loaded from transport
+                       matrix runs.
+        name: name of a SFINCS output, such as 'FSABFlow'.
+    Outputs:
+        NumPy array with shape (Nruns, M, NRHS), where M is the number
+        of entries of the output for each right-hand side (the number
+        of species, or 1 for outputs such as FSABjHat). Runs that did
+        not finish (or did not store name) are filled with nan.
+    '''
+
+    import numpy as np
+
+    available = [columns[name] for columns in dataContainer.RHSColumns if columns is not None and name in columns]
+    if len(available) == 0:
+        raise IOError('{} was not found in the output of any transport matrix run in {}.'.format(name, dataContainer.mainDir))
+    shape = np.atleast_2d(available[0]).shape
+
+    out = np.nan * np.zeros((dataContainer.Nruns,) + shape)
+    for ind, columns in enumerate(dataContainer.RHSColumns):
+        if columns is not None and name in columns:
+            out[ind] = np.atleast_2d(columns[name])
+
+    return out
+
+def reconstructFluxes(dataContainer, dnHatdx, dTHatdx, radialVar='psiHat', dPhiHatdx=None, EParallelHat=0.0, names=['particleFlux_vm_rHat', 'heatFlux_vm_rHat', 'FSABFlow']):
+
+    '''
+    Inputs:
+        dataContainer: sfincsScan object loaded from transport matrix
+                       runs (RHSMode = 2). Each run provides the
+                       matrix for its own flux surface, electric
+                       field, densities, and temperatures.
+        dnHatdx: radial density gradient(s) with respect to radialVar.
+        dTHatdx: radial temperature gradient(s) with respect to
+                 radialVar.
+        radialVar: radial coordinate of the gradients ('psiHat',
+                   'psiN', 'rHat', or 'rN').
+        dPhiHatdx: radial electric potential gradient(s) with respect
+                   to radialVar, which only enter through the
+                   thermodynamic drive. If None, the value of each run
+                   (with which its matrix was calculated) is used.
+        EParallelHat: inductive parallel electric field(s).
+        names: SFINCS outputs to evaluate.
+        The gradients can be floats or NumPy arrays of any shape whose
+        last axis broadcasts against the runs in dataContainer, so many
+        sets of gradients can be evaluated at once.
+    Outputs:
+        Dictionary with names as keys. Each value is a NumPy array
+        with the broadcast shape of the gradients (whose last axis
+        corresponds to the runs in dataContainer), with an extra
+        last axis if the output has more than one entry per run.
+    '''
+
+    import numpy as np
+
+    if dataContainer.RHSMode != 2:
+        raise IOError('The runs in {} are not transport matrix (RHSMode = 2) runs.'.format(dataContainer.mainDir))
+
+    factor = radialDerivativeFactor(dataContainer, radialVar)
+    dnHatdpsiHat = np.asarray(dnHatdx) * factor
+    dTHatdpsiHat = np.asarray(dTHatdx) * factor
+    if dPhiHatdx is None:
+        dPhiHatdpsiHat = dataContainer.dPhiHatdpsiHat
+    else:
+        dPhiHatdpsiHat = np.asarray(dPhiHatdx) * factor
+
+    weights = RHSWeights(dataContainer.nHats[:,0], dataContainer.THats[:,0], dataContainer.Zs[0], dataContainer.alpha,
+                         dnHatdpsiHat, dTHatdpsiHat, dPhiHatdpsiHat, EParallelHat)
+
+    out = {}
+    for name in names:
+        columns = stackColumns(dataContainer, name)
+        result = np.einsum('...rk,rmk->...rm', weights, columns)
+        out[name] = result[...,0] if columns.shape[1] == 1 else result
+
+    return out
@@ -9,7 +9,7 @@ def run(profilesInUse, saveLocUse):
     # Import necessary modules
     from os.path import join
     from os import environ
-    from IO import getRunArgs, getFileInfo, writeFile
+    from IO import getRunArgs, getFileInfo, writeFile, loadMachineProfile, packTasks
 
     # Get command line arguments
     args = getRunArgs()
@@ -20,9 +20,9 @@ def run(profilesInUse, saveLocUse):
     # Load location of SFINCS directory
     sfincsLoc = join(environ['SFINCS_PATH'],'fortran/version3/sfincs')
 
-    # Load machine name
-    machineVar = 'MACHINE'
-    machine = environ[machineVar]
+    # Load machine information and decide how to lay the tasks out on the nodes
+    machineProfile = loadMachineProfile(machine=args.machine[0], registryFile=args.machineFile[0])
+    layout = packTasks(machineProfile, args.time[0], nNodes=args.nNodes[0], nTasksPerNode=args.nTasksPerNode[0], nTasks=args.nTasks[0], mem=args.mem[0])
 
     # Create string to be written
     stringToWrite = '#!/bin/bash -l\n\n'
@@ -35,14 +35,14 @@ def run(profilesInUse, saveLocUse):
     stringToWrite += '#\n'
     
     stringToWrite += '# Resource allocation:\n'
-    if args.nNodes[0] is not None:
-        stringToWrite += '#SBATCH --nodes={}\n'.format(args.nNodes[0])
-    if args.nTasksPerNode[0] is not None:
-        stringToWrite += '#SBATCH --ntasks-per-node={}\n'.format(args.nTasksPerNode[0])
-    if args.nTasks[0] is not None:
-        stringToWrite += '#SBATCH --ntasks={}\n'.format(args.nTasks[0])
-    if args.mem[0] is not None:
-        stringToWrite += '#SBATCH --mem={}\n'.format(args.mem[0])
+    if layout['partition'] is not None:
+        stringToWrite += '#SBATCH --partition={}\n'.format(layout['partition'])
+    stringToWrite += '#SBATCH --nodes={}\n'.format(layout['nodes'])
+    stringToWrite += '#SBATCH --ntasks-per-node={}\n'.format(layout['tasksPerNode'])
+    if layout['tasks'] is not None:
+        stringToWrite += '#SBATCH --ntasks={}\n'.format(layout['tasks'])
+    if layout['memPerNode'] is not None:
+        stringToWrite += '#SBATCH --mem={}\n'.format(layout['memPerNode'])
     stringToWrite += '#\n'
     
     try: # Set up job notification emails if possible 
@@ -67,32 +67,46 @@ def run(profilesInUse, saveLocUse):
     stringToWrite += '# Load necessary modules (typically must be the same as those used for compiling the code):\n'
     stringToWrite += 'module purge\n'
 
-    # These packages allowed for SFINCS, STELLOPT, and Simsopt to be used simultaneously.
+    # The module lists in the machine registry allowed for SFINCS, STELLOPT, and Simsopt to be used simultaneously.
     # That is why so many are loaded.
-    if machine == 'raven' or machine == 'cobra':
-        stringToWrite += 'module load intel/19.1.2\n'
-        stringToWrite += 'module load mkl/2020.4\n'
-        stringToWrite += 'module load impi/2019.8\n'
-        stringToWrite += 'module load hdf5-mpi/1.8.22\n'
-        stringToWrite += 'module load netcdf-mpi/4.4.1\n'
-        stringToWrite += 'module load fftw-mpi\n'
-        stringToWrite += 'module load anaconda/3/2020.02\n'
-        stringToWrite += 'module load petsc-real/3.13.5\n'
-        stringToWrite += 'module load mumps-32-noomp/5.1.2\n'
-        stringToWrite += 'module load gcc/11\n'
-        stringToWrite += '\n'
-    
-    else:
-        from os.path import abspath
-        from inspect import getfile, currentframe
-        thisFile = abspath(getfile(currentframe()))
-        _, thisFileName, _, _, _ = getFileInfo(thisFile, 'arbitrary/path', 'arbitrary')
-        errString = 'This machine (as identified by the "{}" environment variable)'.format(machineVar)
-        errString += ' is not recognized. Please add the necessary "module load" commands to {}.'.format(thisFileName)
-        raise OSError(errString)
+    for module in machineProfile['modules']:
+        stringToWrite += 'module load {}\n'.format(module)
+    stringToWrite += '\n'
+
+    # Every job in a campaign reads the same equilibrium file, so it can be staged on the nodes to keep the jobs from all reading it from the shared filesystem
+    if args.stageInputs[0] != 'none':
+        allNodes = 'srun --nodes="$SLURM_JOB_NUM_NODES" --ntasks="$SLURM_JOB_NUM_NODES" --ntasks-per-node=1'
+        stringToWrite += '# Stage the equilibrium file on node-local storage:\n'
+        stringToWrite += 'if [ -f input.namelist.shared ]; then # An earlier job was killed before it could restore input.namelist\n'
+        stringToWrite += '    mv -f input.namelist.shared input.namelist\n'
+        stringToWrite += 'fi\n'
+        stringToWrite += 'eqFile=$(sed -n \'s/^[[:space:]]*equilibriumFile[[:space:]]*=[[:space:]]*"\\([^"]*\\)".*/\\1/Ip\' input.namelist | head -n 1)\n'
+        stringToWrite += 'if [ -n "$eqFile" ]; then\n'
+        stringToWrite += '    export SFINCS_STAGE_SRC="$(realpath "$eqFile")"\n'
+        if args.stageInputs[0] == 'copy':
+            stringToWrite += '    export SFINCS_STAGE_DIR="${TMPDIR:-/tmp}/sfincsStage"\n'
+            stringToWrite += '    export SFINCS_STAGE_SHARED="$SFINCS_STAGE_DIR/$(stat -c %s_%Y "$SFINCS_STAGE_SRC")_$(basename "$SFINCS_STAGE_SRC")"\n'
+            stringToWrite += '    export SFINCS_STAGE_DEST="$SFINCS_STAGE_SHARED.job$SLURM_JOB_ID"\n'
+            stringToWrite += '    stageFile() { # Only the first job on each node copies the file, and each job reads it through its own hard link\n'
+            stringToWrite += '        mkdir -p "$SFINCS_STAGE_DIR" || return 1\n'
+            stringToWrite += '        ( flock 9 && { [ -f "$SFINCS_STAGE_SHARED" ] || { cp "$SFINCS_STAGE_SRC" "$SFINCS_STAGE_SHARED.tmp$$" && mv "$SFINCS_STAGE_SHARED.tmp$$" "$SFINCS_STAGE_SHARED"; }; } && { ln -f "$SFINCS_STAGE_SHARED" "$SFINCS_STAGE_DEST" || cp "$SFINCS_STAGE_SHARED" "$SFINCS_STAGE_DEST"; } ) 9<"$SFINCS_STAGE_DIR"\n'
+            stringToWrite += '    }\n'
+            stringToWrite += '    unstageFile() { # The last job on each node to finish also removes the shared copy\n'
+            stringToWrite += '        ( flock 9 && rm -f "$SFINCS_STAGE_DEST" && { [ "$(stat -c %h "$SFINCS_STAGE_SHARED" 2>/dev/null)" != 1 ] || rm -f "$SFINCS_STAGE_SHARED"; } ) 9<"$SFINCS_STAGE_DIR"\n'
+            stringToWrite += '    }\n'
+            stringToWrite += '    {} bash -c "$(declare -f stageFile); stageFile" || exit 1\n'.format(allNodes)
+            stringToWrite += '    trap \'mv -f input.namelist.shared input.namelist; {} bash -c "$(declare -f unstageFile); unstageFile"\' EXIT\n'.format(allNodes)
+        else:
+            stringToWrite += '    export SFINCS_STAGE_DEST="${TMPDIR:-/tmp}/sfincsStage_${SLURM_JOB_ID}_$(basename "$SFINCS_STAGE_SRC")"\n'
+            stringToWrite += '    sbcast --force "$SFINCS_STAGE_SRC" "$SFINCS_STAGE_DEST" || exit 1\n'
+            stringToWrite += '    trap \'mv -f input.namelist.shared input.namelist; {} rm -f "$SFINCS_STAGE_DEST"\' EXIT\n'.format(allNodes)
+        stringToWrite += '    trap \'exit 1\' TERM INT\n'
+        stringToWrite += '    cp input.namelist input.namelist.shared\n'
+        stringToWrite += '    sed -i "s|^\\([[:space:]]*equilibriumFile[[:space:]]*=[[:space:]]*\\).*|\\1\\"$SFINCS_STAGE_DEST\\"|I" input.namelist\n'
+        stringToWrite += 'fi\n\n'
 
     stringToWrite += '# Run the program:\n'
-    stringToWrite += 'srun {} -ksp_view\n'.format(sfincsLoc)
+    stringToWrite += '{} {} -ksp_view\n'.format(machineProfile['launcher'], sfincsLoc)
 
     # Write job.sfincsScan file
     writeFile(outFile, stringToWrite)
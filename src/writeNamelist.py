@@ -8,7 +8,7 @@ def run(profilesInUse, saveLocUse, eqInUse, bcSymUse):
 
     # Import necessary modules
     from IO import getRunArgs, getFileInfo, cleanStrings, listifyBEAMS3DFile, extractScalarData, radialVarDict, writeFile
-    from dataProc import scaleInputData, findNumCalcs
+    from dataProc import scaleInputData, findNumCalcs, coarsenResolution
 
     # Get command line arguments
     args = getRunArgs()
@@ -43,6 +43,13 @@ def run(profilesInUse, saveLocUse, eqInUse, bcSymUse):
     if len(mHatsList) != len(ZsList):
         raise IOError('It appears that some data is specified incorrectly in {}. The number of species (according to the "Z" and "M" namelist items) must be consistent.'.format(profilesFile))
     numSpecies = len(ZsList)
+
+    if args.RHSMode[0] != 1: # SFINCS only calculates the transport matrix of a single species
+        if args.matrixSpecies[0] > numSpecies:
+            raise IOError('<matrixSpecies> is {}, but only {} species were found using {}.'.format(args.matrixSpecies[0], numSpecies, profilesFile))
+        mHatsList = [mHatsList[args.matrixSpecies[0] - 1]]
+        ZsList = [ZsList[args.matrixSpecies[0] - 1]]
+        numSpecies = 1
     
     mHats = ' '.join(['{:.15e}'.format(mHat).replace('e','d') for mHat in mHatsList])
     Zs = ' '.join([str(Z) for Z in ZsList])
@@ -89,6 +96,11 @@ def run(profilesInUse, saveLocUse, eqInUse, bcSymUse):
     dNHatDer = ' '.join(['{:.15e}'.format(dnHat).replace('e','d') for dnHat in args.defaultDensDer*numSpecies])
     dTHatDer = ' '.join(['{:.15e}'.format(dTHat).replace('e','d') for dTHat in args.defaultTempsDer*numSpecies])
 
+    # Coarse campaigns (see <coarseFactor>) only need to bracket the roots, so the full resolution is only recorded for later
+    fineRes = {'Ntheta':args.Ntheta[0], 'Nzeta':args.Nzeta[0], 'Nxi':args.Nxi[0], 'Nx':args.Nx[0]}
+    useRes = {key:coarsenResolution(val, args.coarseFactor[0], odd=(key in ['Ntheta', 'Nzeta'])) for key, val in fineRes.items()}
+    coarse = args.coarseFactor[0] != 1
+
     NthetaScanVars = findNumCalcs(args.Ntheta[0], args.NthetaScan, powersMode=False)
     NzetaScanVars = findNumCalcs(args.Nzeta[0], args.NzetaScan, powersMode=False)
     NxiScanVars = findNumCalcs(args.Nxi[0], args.NxiScan, powersMode=False)
@@ -109,6 +121,7 @@ def run(profilesInUse, saveLocUse, eqInUse, bcSymUse):
     stringToWrite += '\n'
 
     stringToWrite += '&general\n'
+    stringToWrite += '\tRHSMode = {} ! Type of calculation (1 = fluxes for the given gradients, 2 = transport matrix, 3 = monoenergetic transport coefficients)\n'.format(args.RHSMode[0])
     stringToWrite += '\tambipolarSolve = {} ! Whether or not to determine the ambipolar Er\n'.format(ambipolarSolve)
     stringToWrite += '\tambipolarSolveOption = {} ! Specifies the root-finding algorithm to use\n'.format(ambipolarSolveOption)
     stringToWrite += '\tEr_search_tolerance_f = {} ! Root-finding tolerance (radial current in SFINCS internal units)\n'.format(Er_search_tolerance_f)
@@ -153,23 +166,34 @@ def run(profilesInUse, saveLocUse, eqInUse, bcSymUse):
         stringToWrite += '\tdPhiHatd{} = {} ! Seed value of the radial electric field (proxy) for this flux surface (may be ignored)\n'.format(selectedRadialGradientVar, args.seedEr[0])
     else:
         stringToWrite += '\tEr = {} ! Seed value of the radial electric field for this flux surface (may be ignored)\n'.format(args.seedEr[0])
+    if args.RHSMode[0] == 3:
+        stringToWrite += '\tnuPrime = 1.0 ! Normalized collisionality for monoenergetic calculations (set by scanMonoenergetic.py)\n'
+        stringToWrite += '\tEStar = 0.0 ! Normalized radial electric field for monoenergetic calculations (set by scanMonoenergetic.py)\n'
     stringToWrite += '/\n'
     stringToWrite += '\n'
 
     stringToWrite += '&resolutionParameters\n'
-    stringToWrite += '\tNtheta = {} ! Number of poloidal grid points (should be odd)\n'.format(args.Ntheta[0])
+    stringToWrite += '\tNtheta = {} ! Number of poloidal grid points (should be odd)\n'.format(useRes['Ntheta'])
+    if coarse:
+        stringToWrite += '!fine Ntheta = {} ! Value to use for full-resolution runs\n'.format(fineRes['Ntheta'])
     stringToWrite += '!ss NthetaMinFactor = {}\n'.format(NthetaScanVars['min'])
     stringToWrite += '!ss NthetaMaxFactor = {}\n'.format(NthetaScanVars['max'])
     stringToWrite += '!ss NthetaNumRuns = {}\n'.format(NthetaScanVars['num'])
-    stringToWrite += '\tNzeta = {} ! Number of toroidal grid points per period (should be odd)\n'.format(args.Nzeta[0])
+    stringToWrite += '\tNzeta = {} ! Number of toroidal grid points per period (should be odd)\n'.format(useRes['Nzeta'])
+    if coarse:
+        stringToWrite += '!fine Nzeta = {} ! Value to use for full-resolution runs\n'.format(fineRes['Nzeta'])
     stringToWrite += '!ss NzetaMinFactor = {}\n'.format(NzetaScanVars['min'])
     stringToWrite += '!ss NzetaMaxFactor = {}\n'.format(NzetaScanVars['max'])
     stringToWrite += '!ss NzetaNumRuns = {}\n'.format(NzetaScanVars['num'])
-    stringToWrite += '\tNxi = {} ! Number of Legendre polynomials used to represent the pitch-angle dependence of the distribution function\n'.format(args.Nxi[0])
+    stringToWrite += '\tNxi = {} ! Number of Legendre polynomials used to represent the pitch-angle dependence of the distribution function\n'.format(useRes['Nxi'])
+    if coarse:
+        stringToWrite += '!fine Nxi = {} ! Value to use for full-resolution runs\n'.format(fineRes['Nxi'])
     stringToWrite += '!ss NxiMinFactor = {}\n'.format(NxiScanVars['min'])
     stringToWrite += '!ss NxiMaxFactor = {}\n'.format(NxiScanVars['max'])
     stringToWrite += '!ss NxiNumRuns = {}\n'.format(NxiScanVars['num'])
-    stringToWrite += '\tNx = {} ! Number of grid points in energy used to represent the distribution function\n'.format(args.Nx[0])
+    stringToWrite += '\tNx = {} ! Number of grid points in energy used to represent the distribution function\n'.format(useRes['Nx'])
+    if coarse:
+        stringToWrite += '!fine Nx = {} ! Value to use for full-resolution runs\n'.format(fineRes['Nx'])
     stringToWrite += '!ss NxMinFactor = {}\n'.format(NxScanVars['min'])
     stringToWrite += '!ss NxMaxFactor = {}\n'.format(NxScanVars['max'])
     stringToWrite += '!ss NxNumRuns = {}\n'.format(NxScanVars['num'])
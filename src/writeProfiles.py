@@ -10,8 +10,9 @@ def run(profilesInUse, saveLocUse):
     import numpy as np
     from os.path import join
     from matplotlib.pyplot import subplots
-    from IO import getRunArgs, getFileInfo, cleanStrings, listifyBEAMS3DFile, makeProfileNames, extractProfileData, sortProfileFunctions, generatePreamble, generateDataText, writeFile, messagePrinter, prettyRadialVar
-    from dataProc import findMinMax, scaleInputData, nonlinearInterp
+    from IO import getRunArgs, getFileInfo, cleanStrings, listifyBEAMS3DFile, makeProfileNames, extractProfileData, sortProfileFunctions, generatePreamble, generateDataText, writeFile, messagePrinter, prettyRadialVar, radialVarDict
+    from dataProc import findMinMax, scaleInputData, nonlinearInterp, profileVariation, placeByDensity
+    from rootFinding import predictErWindows
 
     # Get command line arguments
     args = getRunArgs()
@@ -50,6 +51,24 @@ def run(profilesInUse, saveLocUse):
 
     interpolatedData = nonlinearInterp(scaledData, ders, k=3)
     sortedInterpolatedData = sortProfileFunctions(interpolatedData) # Note that "pot" is not included in this output even if it is included in the input
+    if args.RHSMode[0] != 1: # Only the species whose transport matrix is calculated is included (see writeNamelist.py)
+        if 2 * args.matrixSpecies[0] > len(sortedInterpolatedData):
+            raise IOError('<matrixSpecies> is {}, but only {} species were found in {}.'.format(args.matrixSpecies[0], len(sortedInterpolatedData) // 2, inFile))
+        sortedInterpolatedData = sortedInterpolatedData[2*(args.matrixSpecies[0] - 1):2*args.matrixSpecies[0]]
+
+    # Place the flux surfaces for the SFINCS calculations where the profiles change the fastest, if requested
+    if args.adaptiveSurf:
+        radialVarName = radialVarDict()[args.radialVar[0]]
+        radialGrid = np.linspace(args.minRad[0], args.maxRad[0], num=2001)
+        psiNGrid = radialGrid if radialVarName == 'psiN' else radialGrid ** 2
+        if psiNGrid[0] < radialBounds['min'] or psiNGrid[-1] > radialBounds['max']:
+            raise IOError('The range from <minRad> to <maxRad> extends beyond the profile data in {}.'.format(inFile))
+        gradFuncs = [func for key, funcs in nonlinearInterp(scaledData, {key:der + 1 for key, der in ders.items()}, k=3).items() for func in funcs]
+        curvFuncs = [func for key, funcs in nonlinearInterp(scaledData, {key:der + 2 for key, der in ders.items()}, k=3).items() for func in funcs]
+        variation = profileVariation(radialGrid, radialVarName, gradFuncs, curvFuncs, curvWeight=args.adaptiveCurvWeight[0])
+        calcSurfs = placeByDensity(args.numCalcSurf[0], radialGrid, variation, args.adaptiveUniformFrac[0])
+        np.savetxt(join(outDir, 'calcSurfaces.txt'), calcSurfs, header=radialVarName)
+        messagePrinter('The SFINCS calculations will be performed at {} = {}.'.format(radialVarName, calcSurfs))
 
     # Gather the components of profiles file
     radial_coordinate_ID = 1 # Corresponds to normalized toroidal flux, which is "s" in STELLOPT and "psiN" in SFINCS
@@ -62,6 +81,18 @@ def run(profilesInUse, saveLocUse):
     if args.loadPot:
         generalEr_min = lambda x: interpolatedData['pot'][0](x) + args.minSeedEr[0]
         generalEr_max = lambda x: interpolatedData['pot'][0](x) + args.maxSeedEr[0]
+    elif args.prevErDir[0] is not None:
+        ErLabel = 'Er' if args.radialGradientVar[0] == 4 else 'dPhiHatd' + radialVarDict()[args.radialGradientVar[0]]
+        prevMins, prevMaxs = predictErWindows(args.prevErDir[0], radii, ErLabel, args.prevErWidth[0])
+        unknown = np.isnan(prevMins)
+        prevMins[unknown] = args.minSeedEr[0]
+        prevMaxs[unknown] = args.maxSeedEr[0]
+        generalEr_min = lambda x: np.interp(x, radii, prevMins)
+        generalEr_max = lambda x: np.interp(x, radii, prevMaxs)
+        msg = 'The electric field windows were taken from the roots in {}'.format(args.prevErDir[0])
+        if np.any(unknown):
+            msg += ', except where no roots could be predicted'
+        messagePrinter(msg + '.')
     else:
         generalEr_min = lambda x: args.minSeedEr[0]
         generalEr_max = lambda x: args.maxSeedEr[0]
@@ -86,6 +117,10 @@ def run(profilesInUse, saveLocUse):
             leg.append(keyUse)
 
     ax.legend(leg, loc='best')
+
+    if args.adaptiveSurf: # Mark the flux surfaces that were chosen
+        for calcSurf in calcSurfs:
+            ax.axvline(calcSurf if radialVarName == 'psiN' else calcSurf ** 2, c='gray', ls=':', lw=0.5)
     ax.set_xlabel(prettyRadialVar('psiN'))
     ax.set_ylabel('Normalized Value')
 
@@ -0,0 +1,98 @@
+# This script gives every flux surface of a SFINCS campaign its own resolution, based on resolution scans (made with the <resScan> option of run.py) on a few
+# flux surfaces. For each scan and each resolution parameter, the smallest value for which the fluxes and flows agree with those of the highest resolution in
+# the scan (within <tol>) is found. These values are then interpolated linearly along the radius to the flux surfaces of <sfincsDir> (outside the range of the
+# scans, the value of the closest scan is used) and written into the input.namelist file of every run that has not produced an output file yet. Those runs are
+# then submitted together, unless <noRun> is used. The campaign should therefore be set up without being submitted, such as with scanErs.py and its <noRun> option.
+# Keep in mind that the resolution needed on a flux surface also depends on the electric field, so the resolution scans should use a large-magnitude Er (see
+# the <seedEr> option of run.py). Runs set up later by chooseErs.py copy the input.namelist of an existing run on the same flux surface, so they inherit the
+# tailored resolution.
+
+# Load necessary modules
+from os.path import dirname, abspath, join, basename, isfile
+from os import scandir
+from inspect import getfile, currentframe
+import sys
+import numpy as np
+
+thisDir = dirname(abspath(getfile(currentframe())))
+sys.path.append(join(thisDir, 'src/'))
+from dataProc import convergedValue, predictAlongRadius, oddResolution
+from IO import getFileInfo, getTailorResolutionArgs, messagePrinter, namelistText, parseNamelist, patchParsedNamelist, saveTimeStampFile, writeFile
+from jobControl import findRadialDirs
+from resultCache import registerCampaign
+from sfincsOutputLib import sfincsScan, submitRuns
+
+# Get arguments
+args = getTailorResolutionArgs()
+
+# Locally useful functions
+def convergedResolution(ds, param, tol):
+    baseInd = ds.DataDirs.index('baseCase')
+    others = [other for other in ['Ntheta', 'Nzeta', 'Nxi', 'Nx', 'NL', 'solverTolerance'] if other != param]
+    inds = [ind for ind in range(ds.Nruns) if ds.finished[ind] and all([getattr(ds, other)[ind] == getattr(ds, other)[baseInd] for other in others])]
+    fluxTerm = '_vd_rHat' if ds.includePhi1 else '_vm_rHat'
+    quantities = np.column_stack([getattr(ds, name)[inds] for name in ['particleFlux' + fluxTerm, 'heatFlux' + fluxTerm, 'FSABFlow']])
+    vals = getattr(ds, param)[inds]
+    return convergedValue(vals, quantities, tol), np.unique(vals).size
+
+def findRuns(radDir):
+    subdirs = [entry.path for entry in scandir(radDir) if entry.is_dir() and isfile(join(entry.path, 'input.namelist'))]
+    runDirs = sorted(subdirs) if len(subdirs) != 0 else [radDir] # Without an electric field scan, the flux surface directory is the run
+    return [runDir for runDir in runDirs if isfile(join(runDir, 'input.namelist')) and not isfile(join(runDir, 'sfincsOutput.h5'))]
+
+# Sort out directories
+_, _, _, inDir, _ = getFileInfo('/arbitrary/path', args.sfincsDir[0], 'arbitrary')
+radDirs, radVals = findRadialDirs(inDir, excludeDir=join(inDir, 'determineEr'))
+radDirs = [radDir for radDir, radVal in zip(radDirs, radVals) if not np.isnan(radVal)]
+radVals = np.array([radVal for radVal in radVals if not np.isnan(radVal)])
+
+if len(radDirs) == 0:
+    raise IOError('No flux surface subdirectories were found in {}.'.format(inDir))
+radLabel = basename(radDirs[0]).split('_')[0]
+
+# Find the converged resolution in each scan
+scanRadii = []
+scanVals = {param:[] for param in args.params}
+for resScan in args.resScans:
+    try:
+        ds = sfincsScan(resScan, verbose=0)
+    except SystemExit: # sfincsScan exits if it finds something it does not like
+        raise IOError('The resolution scan in {} could not be loaded.'.format(resScan))
+    if 'baseCase' not in ds.DataDirs:
+        raise IOError('No baseCase run was found in {}. Is it a resolution scan?'.format(resScan))
+    scanRadii.append(getattr(ds, radLabel)[ds.DataDirs.index('baseCase')])
+
+    found = {}
+    for param in args.params:
+        converged, numVals = convergedResolution(ds, param, args.tol[0])
+        found[param] = int(converged)
+        if numVals < 2:
+            messagePrinter('{} was not scanned in {}, so its base value will be used there.'.format(param, resScan))
+        scanVals[param].append(found[param])
+    messagePrinter('For {} = {}, the converged resolution is {}.'.format(radLabel, scanRadii[-1], found))
+
+# Interpolate to the flux surfaces of the campaign and modify the runs
+tailored = {param:predictAlongRadius(scanRadii, scanVals[param], radVals) for param in args.params}
+runDirs = []
+for radInd, radDir in enumerate(radDirs):
+    replacements = {param:max(int(np.ceil(tailored[param][radInd])), 1) for param in args.params}
+    replacements.update({param:oddResolution(replacements[param]) for param in ['Ntheta', 'Nzeta'] if param in replacements}) # SFINCS requires odd values
+    theseRuns = findRuns(radDir)
+    for runDir in theseRuns:
+        namelistFile = join(runDir, 'input.namelist')
+        writeFile(namelistFile, namelistText(patchParsedNamelist(parseNamelist(namelistFile), {'resolutionParameters':replacements})))
+    runDirs += theseRuns
+    messagePrinter('For {} = {}, {} run(s) were given the resolution {}.'.format(radLabel, radVals[radInd], len(theseRuns), replacements))
+
+# Add the finished runs to the result cache
+registerCampaign(args.resultCache[0], inDir)
+
+if not args.noRun and len(runDirs) != 0:
+    _ = submitRuns(runDirs, launchCommand=args.launchCommand[0], arrayDir=inDir, cacheFile=args.resultCache[0])
+
+# Write a log file
+logStr = 'The resolutions of the runs in this directory were tailored by tailorResolution.py (using the resolution scans in {}) on:\n'.format(args.resScans)
+saveTimeStampFile(inDir, 'automatedResolutionLog', logStr)
+
+# Closing message
+messagePrinter('{} runs in {} were modified.'.format(len(runDirs), inDir))